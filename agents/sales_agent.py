@@ -1,11 +1,30 @@
 from langchain.agents import Tool, AgentExecutor, create_openai_functions_agent
 from langchain.prompts import ChatPromptTemplate
-from langchain.chat_models import ChatOpenAI
+from utils.registry import registry, get_chat_llm
 from tools.internal_lookup import safe_internal_lookup
 from tools.web_search import get_direct_llm_response
 from tools.sales_pitch import generate_sales_pitch
 
+SALES_AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", 
+     "You are a helpful AI sales assistant.\n"
+     "You can search internal documents, use web search, and generate custom sales proposals.\n"
+     "Use 'draft_sales_proposal' to create a 3-slide sales pitch."),
+    ("human", "{input}"),
+    ("assistant", "{agent_scratchpad}")
+])
+
 def create_sales_agent(openai_api_key, model="gpt-4o", temperature=0.3):
+    """
+    Returns the shared sales agent executor for these settings (built on first use).
+    """
+    return registry.get(
+        "sales_agent",
+        (openai_api_key, model, temperature),
+        lambda: build_sales_agent(openai_api_key, model, temperature)
+    )
+
+def build_sales_agent(openai_api_key, model="gpt-4o", temperature=0.3):
     # Define internal lookup tool
     internal_tool = Tool(
         name="internal_customer_lookup",
@@ -29,21 +48,12 @@ def create_sales_agent(openai_api_key, model="gpt-4o", temperature=0.3):
 
     tools = [internal_tool, web_tool, pitch_tool]
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", 
-         "You are a helpful AI sales assistant.\n"
-         "You can search internal documents, use web search, and generate custom sales proposals.\n"
-         "Use 'draft_sales_proposal' to create a 3-slide sales pitch."),
-        ("human", "{input}"),
-        ("assistant", "{agent_scratchpad}")
-    ])
-
-    llm = ChatOpenAI(model=model, api_key=openai_api_key, temperature=temperature)
+    llm = get_chat_llm(model=model, api_key=openai_api_key, temperature=temperature)
 
     agent = create_openai_functions_agent(
         llm=llm,
         tools=tools,
-        prompt=prompt
+        prompt=SALES_AGENT_PROMPT
     )
 
     executor = AgentExecutor.from_agent_and_tools(
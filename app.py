@@ -1,4 +1,6 @@
 import streamlit as st
+# First, so startup timings count from here (STARTUP_PROFILE=1)
+import utils.startup
 from ui.chat_ui import chatbot
 import warnings
 
@@ -0,0 +1,215 @@
+"""
+Deterministic, network-free stand-ins used by the offline benchmarks:
+a fake ChatOpenAI driven by a routing scenario, hashing embeddings and a stub search tool.
+"""
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from typing import ClassVar
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, FunctionMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FALLBACK_ANSWER = "I don't have information about this company in the available sources."
+
+
+class FakeLLMController:
+    """
+    Shared script for every FakeChatOpenAI instance. scenario picks the routing path to exercise:
+    - "rag":            the enrichment agent returns the RAG answer as-is
+    - "rag+enrichment": the enrichment agent calls web_search and company research first
+    - "sales":          the sales agent looks up internally, then searches the web
+    - "bi":             the sales agent gives up and the BI agent calls its three tools at once
+    """
+    def __init__(self, latency_s=0.0, tokens_per_s=0.0):
+        self.latency_s = latency_s
+        self.tokens_per_s = tokens_per_s
+        self.scenario = "rag"
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+        self._call_ids = 0
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+
+    def _next_call_id(self):
+        with self._lock:
+            self._call_ids += 1
+            return f"call_{self._call_ids}"
+
+    def respond(self, messages, functions=None, tools=None):
+        text = "\n".join(str(message.content) for message in messages)
+        tool_results = sum(isinstance(m, (FunctionMessage, ToolMessage)) for m in messages)
+        tool_results += text.count("FunctionMessage(") + text.count("ToolMessage(")
+
+        if functions:
+            return self._sales_agent_step(text, tool_results)
+        if tools:
+            names = {tool["function"]["name"] for tool in tools}
+            if "draft_sales_proposal" in names:
+                return self._enrichment_agent_step(text, tool_results)
+            return self._bi_agent_step(names, tool_results)
+
+        # Plain completion: question condensing, RAG answer, pitch or direct answer
+        follow_up = re.search(r"Follow Up Input:\s*(.*?)\s*Standalone question:", text, re.S)
+        if follow_up:
+            return AIMessage(content=follow_up.group(1))
+        return AIMessage(content=f"Based on the available records: {self._question(text)}")
+
+    def _question(self, text):
+        match = re.search(r"Question:\s*(.*?)\s*(?:Answer:|$)", text, re.S)
+        question = match.group(1) if match else text.strip().splitlines()[-1]
+        return question[:200]
+
+    def _function_call(self, name, argument):
+        return AIMessage(content="", additional_kwargs={
+            "function_call": {"name": name, "arguments": json.dumps({"__arg1": argument})}
+        })
+
+    def _tool_calls(self, calls):
+        return AIMessage(content="", additional_kwargs={"tool_calls": [
+            {
+                "id": self._next_call_id(),
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps({"__arg1": argument})}
+            }
+            for name, argument in calls
+        ]})
+
+    def _sales_agent_step(self, text, tool_results):
+        if tool_results == 0:
+            return self._function_call("internal_customer_lookup", "benchmark company")
+        if tool_results == 1:
+            return self._function_call("web_search", "benchmark company")
+        if self.scenario == "bi":
+            return AIMessage(content=FALLBACK_ANSWER)
+        return AIMessage(content="Sales summary built from internal lookup and web search.")
+
+    def _enrichment_agent_step(self, text, tool_results):
+        if self.scenario == "rag+enrichment" and tool_results == 0:
+            return self._tool_calls([
+                ("web_search", "benchmark company news"),
+                ("company_research_web_agent", "benchmark company"),
+            ])
+        return AIMessage(content="Enriched answer combining internal documents and web research.")
+
+    def _bi_agent_step(self, names, tool_results):
+        if tool_results == 0:
+            return self._tool_calls([(name, "benchmark company") for name in sorted(names)])
+        return AIMessage(content="Business intelligence report based on internal and web sources.")
+
+    def record(self, messages, content):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += sum(len(str(m.content).split()) for m in messages)
+            self.completion_tokens += len(content.split())
+
+    def delay(self, content):
+        delay = self.latency_s
+        if self.tokens_per_s:
+            delay += len(content.split()) / self.tokens_per_s
+        return delay
+
+
+class FakeChatOpenAI(BaseChatModel):
+    """
+    Drop-in for ChatOpenAI (same constructor keywords) answering from FakeLLMController.
+    """
+    controller: ClassVar[FakeLLMController] = FakeLLMController()
+    model_name: str = "fake-gpt"
+    streaming: bool = False
+
+    def __init__(self, model=None, model_name=None, streaming=False, **kwargs):
+        super().__init__(model_name=model or model_name or "fake-gpt", streaming=streaming)
+
+    @property
+    def _llm_type(self):
+        return "fake-openai-chat"
+
+    def _result(self, messages, kwargs):
+        message = self.controller.respond(messages, kwargs.get("functions"), kwargs.get("tools"))
+        self.controller.record(messages, message.content)
+        return message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._result(messages, kwargs)
+        time.sleep(self.controller.delay(message.content))
+        if self.streaming and run_manager and message.content:
+            for token in message.content.split(" "):
+                run_manager.on_llm_new_token(token + " ")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._result(messages, kwargs)
+        await asyncio.sleep(self.controller.delay(message.content))
+        if self.streaming and run_manager and message.content:
+            for token in message.content.split(" "):
+                await run_manager.on_llm_new_token(token + " ")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic hashing bag-of-words embeddings: texts sharing words get similar vectors.
+    Counts calls and embedded texts (what would be billed).
+    """
+    def __init__(self, dimensions=256, latency_s=0.0):
+        self.dimensions = dimensions
+        self.latency_s = latency_s
+        self.model = "fake-embeddings"
+        self.calls = 0
+        self.texts = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        time.sleep(self.latency_s)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class StubSearchTool:
+    """
+    Stand-in for TavilySearchResults: canned results, configurable latency, call counter.
+    """
+    calls: ClassVar[int] = 0
+    latency_s: ClassVar[float] = 0.0
+
+    def __init__(self, tavily_api_key=None, **kwargs):
+        pass
+
+    def _results(self, query):
+        return [{
+            "url": "https://example.com/" + hashlib.md5(query.encode("utf-8")).hexdigest()[:8],
+            "content": f"Public information related to: {query[:80]}"
+        }]
+
+    def run(self, query, **kwargs):
+        type(self).calls += 1
+        time.sleep(self.latency_s)
+        return self._results(query)
+
+    async def arun(self, query, **kwargs):
+        type(self).calls += 1
+        await asyncio.sleep(self.latency_s)
+        return self._results(query)
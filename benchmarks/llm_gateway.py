@@ -0,0 +1,258 @@
+"""
+LLM gateway benchmark against a local OpenAI-compatible stub server (no network, no API keys).
+The stub answers /v1/chat/completions after a fixed latency and throttles with 429 + Retry-After
+when more than --server-capacity requests are in flight (and at random with --throttle-ratio).
+Many clients send a mix of distinct and repeated prompts, first straight to ChatOpenAI (with the
+client's own retries), then through the gateway; the report compares upstream calls, 429s,
+failures and latency. Exits non-zero when a gateway request fails.
+
+    python -m benchmarks.llm_gateway --requests 200 --clients 32 --distinct 40 --server-capacity 8
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from statistics import quantiles
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+VARIANTS = ("direct", "gateway")
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    """
+    Minimal chat completions endpoint (plain JSON or SSE streaming) with request counters.
+    """
+    daemon_threads = True
+
+    def __init__(self, latency_s=0.05, capacity=8, throttle_ratio=0.0, retry_after_s=0.2, seed=7):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency_s = latency_s
+        self.capacity = capacity
+        self.throttle_ratio = throttle_ratio
+        self.retry_after_s = retry_after_s
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.throttled = 0
+            self.active = 0
+            self.max_active = 0
+
+    def enter(self):
+        """
+        Admits a request, or returns False when it should be throttled.
+        """
+        with self.lock:
+            self.requests += 1
+            if self.active >= self.capacity or self.random.random() < self.throttle_ratio:
+                self.throttled += 1
+                return False
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        server = self.server
+        if not server.enter():
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"Retry-After": str(server.retry_after_s)}
+            )
+            return
+        try:
+            time.sleep(server.latency_s)
+            prompt = request["messages"][-1]["content"]
+            answer = f"Stub answer to: {prompt[:60]}"
+            if request.get("stream"):
+                self._stream(request, answer)
+            else:
+                prompt_tokens, completion_tokens = len(prompt.split()), len(answer.split())
+                self._send_json(200, {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+        finally:
+            server.leave()
+
+    def _stream(self, request, answer):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, word in enumerate(answer.split(" ")):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{
+                    "index": 0,
+                    "delta": {"role": "assistant", "content": (" " if i else "") + word},
+                    "finish_reason": None,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def make_llm(variant, args):
+    from langchain.chat_models import ChatOpenAI
+    from utils.registry import registry, get_chat_llm
+    from utils.llm_gateway import LLMGateway
+
+    if variant == "direct":
+        return ChatOpenAI(model="gpt-3.5-turbo", api_key="sk-stub", temperature=0, streaming=args.stream)
+    registry.invalidate()
+    registry.get("llm_gateway", "default", lambda: LLMGateway(
+        requests_per_minute=args.rpm,
+        max_concurrency=args.concurrency,
+        max_retries=args.max_retries,
+        backoff_base_s=args.backoff_base_ms / 1000
+    ))
+    return get_chat_llm(model="gpt-3.5-turbo", api_key="sk-stub", temperature=0, streaming=args.stream)
+
+
+def run_variant(variant, server, args):
+    from langchain.schema import HumanMessage
+    from utils.llm_gateway import get_gateway
+
+    llm = make_llm(variant, args)
+    server.reset()
+    rng = random.Random(args.seed)
+    prompts = [f"Draft a sales pitch for company {rng.randrange(args.distinct)}" for _ in range(args.requests)]
+
+    def send(prompt):
+        started_at = time.perf_counter()
+        try:
+            llm.invoke([HumanMessage(content=prompt)])
+            return time.perf_counter() - started_at, None
+        except Exception as e:
+            return time.perf_counter() - started_at, f"{type(e).__name__}: {e}"
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        results = list(pool.map(send, prompts))
+    elapsed = time.perf_counter() - started_at
+
+    latencies_ms = [latency * 1000 for latency, _ in results]
+    report = {
+        "wall_s": elapsed,
+        "failed": sum(error is not None for _, error in results),
+        "upstream_requests": server.requests,
+        "throttled_429": server.throttled,
+        "max_concurrent": server.max_active,
+        "p50_ms": quantiles(latencies_ms, n=100, method="inclusive")[49],
+        "p95_ms": quantiles(latencies_ms, n=100, method="inclusive")[94],
+    }
+    if variant == "gateway":
+        gateway = get_gateway().report()
+        report.update(
+            coalesced=gateway["coalesced"],
+            retries=gateway["retries"],
+            avg_queue_ms=gateway["avg_queue_ms"],
+            max_queue_ms=gateway["max_queue_ms"],
+        )
+    errors = [error for _, error in results if error]
+    if errors:
+        report["first_error"] = errors[0]
+    return report
+
+
+def print_report(reports):
+    columns = [
+        ("wall_s", "wall s"), ("failed", "failed"), ("upstream_requests", "upstream"),
+        ("throttled_429", "429s"), ("max_concurrent", "max conc."), ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"),
+        ("coalesced", "coalesced"), ("retries", "retries"), ("avg_queue_ms", "avg queue ms"),
+    ]
+    print(f"{'variant':<10}" + "".join(f"{label:>14}" for _, label in columns))
+    for variant, report in reports.items():
+        cells = [
+            f"{report[key]:>14.1f}" if key in report else f"{'-':>14}"
+            for key, _ in columns
+        ]
+        print(f"{variant:<10}" + "".join(cells))
+    for variant, report in reports.items():
+        if report.get("first_error"):
+            print(f"{variant}: first error: {report['first_error']}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent callers")
+    parser.add_argument("--distinct", type=int, default=40, help="distinct prompts (the rest are repeats)")
+    parser.add_argument("--stream", action="store_true", help="stream responses (SSE)")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="stub latency per request")
+    parser.add_argument("--server-capacity", type=int, default=8, help="in-flight requests before the stub 429s")
+    parser.add_argument("--throttle-ratio", type=float, default=0.0, help="share of requests 429'd at random")
+    parser.add_argument("--retry-after-ms", type=float, default=200.0)
+    parser.add_argument("--concurrency", type=int, default=8, help="gateway concurrency limit")
+    parser.add_argument("--rpm", type=int, default=0, help="gateway requests per minute (0 = unlimited)")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--backoff-base-ms", type=float, default=100.0)
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="comma-separated, from: " + ", ".join(VARIANTS))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    server = StubOpenAIServer(
+        args.latency_ms / 1000, args.server_capacity, args.throttle_ratio, args.retry_after_ms / 1000, args.seed
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # ChatOpenAI reads the endpoint from the environment
+    os.environ["OPENAI_API_BASE"] = server.base_url
+    try:
+        reports = {variant: run_variant(variant, server, args) for variant in args.variants.split(",")}
+    finally:
+        server.shutdown()
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    sys.exit(1 if reports.get("gateway", {}).get("failed") else 0)
+
+
+if __name__ == "__main__":
+    main()
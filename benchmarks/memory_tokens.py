@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: per-turn cost of PatchedSummaryMemory's token accounting as the
+conversation grows. Compares the incremental running total against recounting the
+whole buffer every turn (the previous behaviour). No network calls are made.
+
+    python -m benchmarks.memory_tokens --turns 400
+"""
+import argparse
+import time
+from langchain.chat_models import ChatOpenAI
+from memory.memory import PatchedSummaryMemory
+
+QUESTION = "What do we know about Boli AI and the data platform project we delivered in 2023?"
+ANSWER = (
+    "We delivered a data platform migration for Boli AI in 2023, including an ingestion "
+    "pipeline, a feature store and a churn model. Main contacts were the CTO and the head of data."
+)
+
+
+def build_memory():
+    # High limit: measure accounting only, never trigger a summarization call
+    return PatchedSummaryMemory(
+        llm=ChatOpenAI(model_name="gpt-4", openai_api_key="sk-benchmark"),
+        max_token_limit=10 ** 9,
+        return_messages=True,
+        memory_key="chat_history",
+        output_key="answer",
+        input_key="question"
+    )
+
+
+def run(turns, report_every):
+    memory = build_memory()
+    print(f"{'turn':>6} {'incremental (ms)':>18} {'full recount (ms)':>18} {'buffer tokens':>14}")
+    for turn in range(1, turns + 1):
+        started_at = time.perf_counter()
+        memory.save_context({"question": QUESTION}, {"answer": ANSWER})
+        incremental_ms = (time.perf_counter() - started_at) * 1000
+
+        started_at = time.perf_counter()
+        recount = memory.get_num_tokens(memory.chat_memory.messages)
+        recount_ms = (time.perf_counter() - started_at) * 1000
+
+        assert recount == memory.buffer_tokens
+        if turn == 1 or turn % report_every == 0:
+            print(f"{turn:>6} {incremental_ms:>18.3f} {recount_ms:>18.3f} {recount:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--report-every", type=int, default=50)
+    args = parser.parse_args()
+    run(args.turns, args.report_every)
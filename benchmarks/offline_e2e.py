@@ -0,0 +1,301 @@
+"""
+Offline end-to-end benchmark: ingestion throughput plus per-path turn latency and call counts,
+with a fake ChatOpenAI, fake embeddings and a stub search tool (no network, no API keys).
+Exits non-zero when a regression threshold is exceeded, so it can gate deploys.
+
+    python -m benchmarks.offline_e2e --turns 20 --llm-latency-ms 50 --max-p95-ms 2000
+"""
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import contextlib
+from statistics import quantiles
+from langchain.callbacks.base import BaseCallbackHandler
+
+COMPANIES = ["Boli AI", "Nordwind Logistics", "Kestrel Health", "Atlas Retail"]
+
+# Routing path → (fake LLM scenario, relevance threshold, expected source_type). The fake
+# hashing embeddings can score below 0, so the RAG paths open the gate with -inf
+SCENARIOS = {
+    "rag": ("rag", float("-inf"), "internal+agent"),
+    "rag+enrichment": ("rag+enrichment", float("-inf"), "internal+agent"),
+    "sales": ("sales", 1.01, "internal"),
+    "bi": ("bi", 1.01, "web"),
+}
+
+
+class CountingHandler(BaseCallbackHandler):
+    """
+    Counts LLM and tool calls made during a turn.
+    """
+    def __init__(self):
+        self.llm_calls = 0
+        self.tool_calls = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.llm_calls += 1
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.llm_calls += 1
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.tool_calls += 1
+
+
+def prepare_environment(workdir):
+    """
+    Points every persisted store at workdir. Must run before the app modules are imported,
+    since utils.config reads the environment at import time.
+    """
+    os.environ["CHROMA_PATH"] = os.path.join(workdir, "vectorstore")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    os.environ["WEB_CACHE_PATH"] = os.path.join(workdir, "web_cache.sqlite3")
+    os.environ["TRACE_PATH"] = os.path.join(workdir, "spans.jsonl")
+    os.environ["OFFLINE_MODE"] = "0"
+    os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+
+def write_corpus(workdir, rows_per_file, files_per_company):
+    """
+    Synthetic customer CSVs (one loaded page per row). Returns the file paths.
+    """
+    corpus_dir = os.path.join(workdir, "corpus")
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = []
+    for company in COMPANIES:
+        for n in range(files_per_company):
+            path = os.path.join(corpus_dir, f"{company} - Projects {n}.csv")
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["project", "year", "summary"])
+                for row in range(rows_per_file):
+                    writer.writerow([
+                        f"PRJ-{n}{row:04d}",
+                        2018 + row % 7,
+                        f"{company} engagement {row}: data platform migration, churn model and "
+                        f"dashboard delivery for the {company} analytics team, contract value "
+                        f"{(row + 1) * 1000} EUR, sponsor {company} head of data."
+                    ])
+            paths.append(path)
+    return paths
+
+
+def install_fakes(llm_latency_s, tokens_per_s, embed_latency_s, search_latency_s):
+    """
+    Swaps the OpenAI, embeddings and Tavily clients for fakes and creates a session for the run.
+    Returns (session_state, fake_embeddings).
+    """
+    import retrievers.setup
+    import langchain.chat_models
+    import langchain_community.tools.tavily_search
+    from utils import registry as registry_module
+    from utils.config import EMBEDDING_CACHE_PATH
+    from retrievers.embedding_cache import CachedEmbeddings
+    from service.sessions import new_session_state
+    from benchmarks.fakes import FakeChatOpenAI, FakeLLMController, FakeEmbeddings, StubSearchTool
+
+    FakeChatOpenAI.controller = FakeLLMController(llm_latency_s, tokens_per_s)
+    # The registry imports its client classes on first use, so they are replaced at the source
+    langchain.chat_models.ChatOpenAI = FakeChatOpenAI
+    StubSearchTool.latency_s = search_latency_s
+    langchain_community.tools.tavily_search.TavilySearchResults = StubSearchTool
+    registry_module.registry.invalidate()
+
+    fake_embeddings = FakeEmbeddings(latency_s=embed_latency_s)
+    cached_embeddings = CachedEmbeddings(
+        fake_embeddings, model_key="fake:hashing-256", cache_path=EMBEDDING_CACHE_PATH
+    )
+    retrievers.setup.load_cached_embeddings = lambda provider, api_key=None: cached_embeddings
+
+    state = new_session_state(
+        openai_api_key="sk-offline",
+        tavily_api_key="tvly-offline",
+        embeddings_model="huggingface",
+        selected_model="gpt-4o",
+        temperature=0.2,
+        max_tokens=512,
+        stream_responses=False,
+        use_answer_cache=False,
+        refresh_web_results=True,
+        current_company=COMPANIES[0],
+        on_notice=lambda level, message: None
+    )
+    return state, fake_embeddings
+
+
+def benchmark_ingestion(state, fake_embeddings, file_paths, ingest_workers):
+    from service.assistant import index_documents
+
+    state.ingest_workers = ingest_workers
+    pages = sum(1 for path in file_paths for _ in open(path, encoding="utf-8")) - len(file_paths)
+
+    calls_before = fake_embeddings.texts
+    started_at = time.perf_counter()
+    vectorstore = index_documents(state, file_paths)
+    elapsed = time.perf_counter() - started_at
+    chunks = vectorstore.count()
+    embedded = fake_embeddings.texts - calls_before
+
+    # Re-ingesting unchanged files must not embed anything
+    calls_before = fake_embeddings.texts
+    started_at = time.perf_counter()
+    vectorstore = index_documents(state, file_paths)
+    reingest_elapsed = time.perf_counter() - started_at
+
+    return vectorstore, {
+        "files": len(file_paths),
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "pages_per_s": pages / elapsed if elapsed else 0.0,
+        "chunks_per_s": chunks / elapsed if elapsed else 0.0,
+        "embedded_texts": embedded,
+        "reingest_seconds": reingest_elapsed,
+        "reingest_embedded_texts": fake_embeddings.texts - calls_before,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def benchmark_paths(state, fake_embeddings, vectorstore, turns):
+    from chains.rag_chain import attach_rag_chain
+    from service.assistant import ask
+    from utils.session import use_session
+    from benchmarks.fakes import FakeChatOpenAI, StubSearchTool
+
+    controller = FakeChatOpenAI.controller
+    results = {}
+    for path, (scenario, threshold, expected) in SCENARIOS.items():
+        controller.scenario = scenario
+        state.relevance_threshold = threshold
+        # Fresh chain (and memory) per path
+        with use_session(state):
+            attach_rag_chain(vectorstore)
+
+        latencies, llm_calls, embed_texts, tool_calls, search_calls = [], [], [], [], []
+        wrong_route = 0
+        for turn in range(turns):
+            company = COMPANIES[turn % len(COMPANIES)]
+            question = f"What data platform projects did we deliver for {company} in {2018 + turn % 7}?"
+
+            handler = CountingHandler()
+            controller.reset_counters()
+            embed_before = fake_embeddings.texts
+            search_before = StubSearchTool.calls
+            started_at = time.perf_counter()
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                _, _, source_type = ask(state, question, callbacks=[handler])
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+            llm_calls.append(controller.calls)
+            embed_texts.append(fake_embeddings.texts - embed_before)
+            tool_calls.append(handler.tool_calls)
+            search_calls.append(StubSearchTool.calls - search_before)
+            wrong_route += source_type != expected
+
+        results[path] = {
+            "turns": turns,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "llm_calls_per_turn": sum(llm_calls) / turns,
+            "embedded_texts_per_turn": sum(embed_texts) / turns,
+            "tool_calls_per_turn": sum(tool_calls) / turns,
+            "search_calls_per_turn": sum(search_calls) / turns,
+            "wrong_route": wrong_route,
+        }
+    return results
+
+
+def check_regressions(report, max_p95_ms, max_llm_calls, min_chunks_per_s):
+    failures = []
+    ingestion = report["ingestion"]
+    if ingestion["reingest_embedded_texts"]:
+        failures.append(f"re-ingest embedded {ingestion['reingest_embedded_texts']} texts (expected 0)")
+    if min_chunks_per_s is not None and ingestion["chunks_per_s"] < min_chunks_per_s:
+        failures.append(f"ingestion {ingestion['chunks_per_s']:.1f} chunks/s < {min_chunks_per_s}")
+    for path, stats in report["paths"].items():
+        if stats["wrong_route"]:
+            failures.append(f"{path}: {stats['wrong_route']} turns took a different routing path")
+        if max_p95_ms is not None and stats["p95_ms"] > max_p95_ms:
+            failures.append(f"{path}: p95 {stats['p95_ms']:.0f} ms > {max_p95_ms} ms")
+        if max_llm_calls is not None and stats["llm_calls_per_turn"] > max_llm_calls:
+            failures.append(f"{path}: {stats['llm_calls_per_turn']:.1f} LLM calls/turn > {max_llm_calls}")
+    return failures
+
+
+def print_report(report):
+    ingestion = report["ingestion"]
+    print(
+        f"Ingestion: {ingestion['files']} files, {ingestion['pages']} pages, {ingestion['chunks']} chunks "
+        f"in {ingestion['seconds']:.2f}s → {ingestion['pages_per_s']:.1f} pages/s, "
+        f"{ingestion['chunks_per_s']:.1f} chunks/s; re-ingest {ingestion['reingest_seconds']:.2f}s, "
+        f"{ingestion['reingest_embedded_texts']} texts embedded; peak RSS {ingestion['peak_rss_mb']:.0f} MB"
+    )
+    print(f"\n{'path':<16} {'p50 (ms)':>9} {'p95 (ms)':>9} {'LLM/turn':>9} {'embed/turn':>11} "
+          f"{'tools/turn':>11} {'search/turn':>12}")
+    for path, stats in report["paths"].items():
+        print(
+            f"{path:<16} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['llm_calls_per_turn']:>9.1f} "
+            f"{stats['embedded_texts_per_turn']:>11.1f} {stats['tool_calls_per_turn']:>11.1f} "
+            f"{stats['search_calls_per_turn']:>12.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20, help="turns per routing path")
+    parser.add_argument("--rows-per-file", type=int, default=200)
+    parser.add_argument("--files-per-company", type=int, default=2)
+    parser.add_argument("--ingest-workers", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="fixed latency per LLM call")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="simulated generation speed (0: instant)")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="latency per embedding batch")
+    parser.add_argument("--search-latency-ms", type=float, default=0.0, help="latency per web search")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if any path's p95 latency exceeds this")
+    parser.add_argument("--max-llm-calls", type=float, help="fail if any path averages more LLM calls per turn")
+    parser.add_argument("--min-chunks-per-s", type=float, help="fail if ingestion is slower than this")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary working directory")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="offline_e2e_")
+    prepare_environment(workdir)
+    try:
+        state, fake_embeddings = install_fakes(
+            args.llm_latency_ms / 1000,
+            args.tokens_per_s,
+            args.embed_latency_ms / 1000,
+            args.search_latency_ms / 1000
+        )
+        file_paths = write_corpus(workdir, args.rows_per_file, args.files_per_company)
+        vectorstore, ingestion = benchmark_ingestion(state, fake_embeddings, file_paths, args.ingest_workers)
+        report = {"ingestion": ingestion, "paths": benchmark_paths(state, fake_embeddings, vectorstore, args.turns)}
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_regressions(report, args.max_p95_ms, args.max_llm_calls, args.min_chunks_per_s)
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Vector backend benchmark: build time, query latency, recall and memory of Chroma against the
+memory-mapped float16 / int8 backend, on synthetic embeddings (no network, no API keys).
+Each build and each query run happens in a fresh process, so memory is measured per worker.
+"anon" is resident memory not backed by files: what every additional worker pays again, while
+the pages of a memory-mapped index are shared through the page cache (counted once per box).
+
+    python -m benchmarks.vector_backends --chunks 50000 --dim 1536 --queries 200
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from statistics import quantiles
+
+# variant → (backend, mmap dtype, rescore)
+VARIANTS = {
+    "chroma": ("chroma", None, False),
+    "float16": ("mmap", "float16", True),
+    "int8": ("mmap", "int8", True),
+    "int8-norescore": ("mmap", "int8", False),
+}
+
+
+def row_vector(seed, i, dim):
+    import numpy as np
+    return np.random.default_rng([seed, 0, i]).standard_normal(dim).astype(np.float32)
+
+
+def query_vector(seed, j, chunks, dim, noise=0.6):
+    """
+    A noisy copy of one stored chunk, so each query has a clear nearest neighbour.
+    """
+    import numpy as np
+    target = (j * 7919) % chunks
+    noise_vector = np.random.default_rng([seed, 1, j]).standard_normal(dim).astype(np.float32)
+    return target, row_vector(seed, target, dim) + noise * noise_vector
+
+
+def company_of(i, companies):
+    return f"Company {i % companies}"
+
+
+def make_embeddings(seed, chunks, dim):
+    from langchain.schema.embeddings import Embeddings
+
+    class SyntheticEmbeddings(Embeddings):
+        """
+        "chunk-<i>" and "query-<j>" texts mapped to their synthetic vectors.
+        """
+        def embed_documents(self, texts):
+            return [row_vector(seed, int(text.split("-")[1]), dim).tolist() for text in texts]
+
+        def embed_query(self, text):
+            return query_vector(seed, int(text.split("-")[1]), chunks, dim)[1].tolist()
+
+    return SyntheticEmbeddings()
+
+
+def store_class(variant):
+    # Imported before the memory baseline, so only the index itself is measured
+    if VARIANTS[variant][0] == "chroma":
+        from langchain.vectorstores import Chroma
+        return Chroma
+    from retrievers.mmap_store import MmapVectorStore
+    return MmapVectorStore
+
+
+def open_store(variant, workdir, embeddings):
+    backend, dtype, rescore = VARIANTS[variant]
+    if backend == "chroma":
+        return store_class(variant)(collection_name="bench", persist_directory=workdir, embedding_function=embeddings)
+    return store_class(variant)(os.path.join(workdir, "vectors"), embeddings, dtype=dtype, rescore=rescore)
+
+
+def process_memory_mb():
+    """
+    (rss, anon) in MB; anon excludes file-backed pages (Linux), e.g. a memory-mapped index.
+    """
+    import psutil
+    info = psutil.Process().memory_info()
+    return info.rss / 2**20, (info.rss - getattr(info, "shared", 0)) / 2**20
+
+
+def build(variant, workdir, seed, chunks, dim, companies, batch_size):
+    embeddings = make_embeddings(seed, chunks, dim)
+    store_class(variant)
+    rss_before, anon_before = process_memory_mb()
+    started_at = time.perf_counter()
+    store = open_store(variant, workdir, embeddings)
+    for start in range(0, chunks, batch_size):
+        rows = range(start, min(start + batch_size, chunks))
+        store.add_texts(
+            [f"chunk-{i}" for i in rows],
+            metadatas=[{"company": company_of(i, companies), "chunk_id": f"chunk-{i}"} for i in rows],
+            ids=[f"chunk-{i}" for i in rows]
+        )
+    store.persist()
+    elapsed = time.perf_counter() - started_at
+    rss_after, anon_after = process_memory_mb()
+    disk = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(workdir) for name in names)
+    return {
+        "build_s": elapsed,
+        "build_rss_mb": rss_after - rss_before,
+        "build_anon_mb": anon_after - anon_before,
+        "disk_mb": disk / 2**20,
+    }
+
+
+def run_queries(variant, workdir, seed, chunks, dim, companies, queries, k, filtered):
+    embeddings = make_embeddings(seed, chunks, dim)
+    store_class(variant)
+    query_vector(seed, 0, chunks, dim)
+    rss_before, anon_before = process_memory_mb()
+    store = open_store(variant, workdir, embeddings)
+    latencies, results = [], []
+    for j in range(queries):
+        target, _ = query_vector(seed, j, chunks, dim)
+        search_filter = {"company": company_of(target, companies)} if filtered else None
+        started_at = time.perf_counter()
+        docs = store.similarity_search_with_score(f"query-{j}", k=k, filter=search_filter)
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        results.append([doc.metadata["chunk_id"] for doc, _ in docs])
+    rss_after, anon_after = process_memory_mb()
+    return {
+        "latencies_ms": latencies,
+        "results": results,
+        "query_rss_mb": rss_after - rss_before,
+        "query_anon_mb": anon_after - anon_before,
+    }
+
+
+def exact_neighbours(seed, chunks, dim, companies, queries, k, filtered, block_rows=20000):
+    """
+    Brute-force float32 cosine top-k per query (the recall reference).
+    """
+    import numpy as np
+    query_rows = [query_vector(seed, j, chunks, dim) for j in range(queries)]
+    matrix_q = np.stack([vector / np.linalg.norm(vector) for _, vector in query_rows])
+    scores = np.empty((queries, chunks), dtype=np.float32)
+    for start in range(0, chunks, block_rows):
+        block = np.stack([row_vector(seed, i, dim) for i in range(start, min(start + block_rows, chunks))])
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        scores[:, start:start + len(block)] = matrix_q @ block.T
+    if filtered:
+        row_companies = np.arange(chunks) % companies
+        for j, (target, _) in enumerate(query_rows):
+            scores[j, row_companies != target % companies] = -np.inf
+    return [[f"chunk-{i}" for i in np.argsort(-row)[:k]] for row in scores]
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def benchmark_variant(variant, args, reference):
+    workdir = tempfile.mkdtemp(prefix=f"vector_bench_{variant}_")
+    context = multiprocessing.get_context("spawn")
+    try:
+        with context.Pool(1) as pool:
+            report = pool.apply(
+                build, (variant, workdir, args.seed, args.chunks, args.dim, args.companies, args.batch_size)
+            )
+        for filtered in (False, True):
+            # A fresh process per run: memory is what one more worker would pay
+            with context.Pool(1) as pool:
+                run = pool.apply(run_queries, (
+                    variant, workdir, args.seed, args.chunks, args.dim, args.companies,
+                    args.queries, args.k, filtered
+                ))
+            expected = reference[filtered]
+            recall = sum(
+                len(set(found) & set(truth)) / len(truth) for found, truth in zip(run["results"], expected)
+            ) / len(expected)
+            prefix = "filtered_" if filtered else ""
+            report[prefix + "p50_ms"] = percentile(run["latencies_ms"], 50)
+            report[prefix + "p95_ms"] = percentile(run["latencies_ms"], 95)
+            report[prefix + f"recall_at_{args.k}"] = recall
+            if not filtered:
+                report["query_rss_mb"] = run["query_rss_mb"]
+                report["query_anon_mb"] = run["query_anon_mb"]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(reports, k):
+    columns = [
+        ("build_s", "build s"), ("disk_mb", "disk MB"), ("build_anon_mb", "build anon MB"),
+        ("query_rss_mb", "query RSS MB"), ("query_anon_mb", "query anon MB"),
+        ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"), (f"recall_at_{k}", f"recall@{k}"),
+        ("filtered_p95_ms", "filt. p95 ms"), (f"filtered_recall_at_{k}", f"filt. recall@{k}"),
+    ]
+    print(f"{'variant':<16}" + "".join(f"{label:>17}" for _, label in columns))
+    for variant, report in reports.items():
+        print(f"{variant:<16}" + "".join(f"{report[key]:>17.3f}" for key, _ in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536, help="1536 for OpenAI, 384 for MiniLM")
+    parser.add_argument("--companies", type=int, default=20, help="distinct 'company' values for filtering")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="comma-separated, from: " + ", ".join(VARIANTS))
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    os.environ["ANONYMIZED_TELEMETRY"] = "False"
+    reference = {
+        filtered: exact_neighbours(args.seed, args.chunks, args.dim, args.companies, args.queries, args.k, filtered)
+        for filtered in (False, True)
+    }
+    reports = {variant: benchmark_variant(variant, args, reference) for variant in args.variants.split(",")}
+
+    print_report(reports, args.k)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
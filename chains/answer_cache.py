@@ -0,0 +1,99 @@
+import threading
+import numpy as np
+from utils.registry import registry
+from utils.question_cleaner import get_gazetteer
+from utils.config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_MAX_ENTRIES
+
+GENERAL_SCOPE = "_general"
+
+
+def detect_company_scope(question, companies):
+    """
+    Returns the sorted tuple of known companies mentioned in the question (empty if none).
+    """
+    return get_gazetteer(tuple(companies)).detect(question)
+
+
+class SemanticAnswerCache:
+    """
+    Process-wide cache of final answers keyed by question embeddings.
+    A question hits when its cosine similarity to a cached question of the same company scope
+    clears the threshold. Scopes are dropped when one of their companies is re-indexed.
+    """
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved_s = 0.0
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, scope, vector):
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            entries = self._scopes.get(scope, [])
+            if entries:
+                matrix = np.stack([entry["vector"] for entry in entries])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = entries[best]
+                    self.hits += 1
+                    self.latency_saved_s += entry["latency_s"]
+                    return entry
+            self.misses += 1
+            return None
+
+    def store(self, scope, question, vector, answer, sources, source_type, latency_s):
+        vector = np.asarray(vector, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            entries = self._scopes.setdefault(scope, [])
+            entries.append({
+                "question": question,
+                "vector": vector,
+                "answer": answer,
+                "sources": sources,
+                "source_type": source_type,
+                "latency_s": latency_s,
+            })
+            # Keep the most recent entries per scope
+            del entries[:-self.max_entries]
+
+    def invalidate(self, companies):
+        """
+        Drops every scope mentioning one of the companies, plus the company-agnostic scope.
+        """
+        companies = set(companies)
+        with self._lock:
+            for scope in list(self._scopes):
+                if scope == GENERAL_SCOPE or companies.intersection(scope):
+                    del self._scopes[scope]
+
+    def report(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved_s": self.latency_saved_s,
+                "entries": sum(len(entries) for entries in self._scopes.values()),
+            }
+
+
+def get_answer_cache(embeddings_key):
+    """
+    Shared answer cache for an embeddings model (vectors of different models aren't comparable).
+    """
+    return registry.get("answer_cache", embeddings_key, SemanticAnswerCache)
+
+
+def invalidate_answer_caches(companies):
+    """
+    Invalidates the companies in every live answer cache (called after a vectorstore rebuild).
+    """
+    for cache in registry.instances("answer_cache"):
+        cache.invalidate(companies)
@@ -1,9 +1,53 @@
+import os
 from langchain.chains import ConversationalRetrievalChain
 from langchain.prompts import PromptTemplate
-from langchain.vectorstores import Chroma
-from utils.file_loader import load_and_split_all_documents
-from retrievers.setup import select_embeddings_model, get_company_filtered_retriever
-import streamlit as st
+from langchain.schema import Document
+from utils.file_loader import (
+    iter_load_and_split_documents,
+    iter_file_chunk_batches,
+    iter_with_backpressure,
+    extract_company_from_filename
+)
+from utils.ingestion_manifest import (
+    load_manifest,
+    save_manifest,
+    chunking_signature,
+    plan_incremental_update,
+    make_chunk_id,
+    indexed_companies,
+    widen_to_companies,
+    has_legacy_index
+)
+from utils.chunk_dedup import ChunkDeduplicator, source_reference
+from chains.answer_cache import invalidate_answer_caches
+from retrievers.setup import (
+    select_embeddings_model,
+    get_partitions,
+    drop_legacy_index,
+    PartitionedRetriever
+)
+from retrievers.partitions import CompanyPartitions, PARTITION_LAYOUT, is_current_layout
+from retrievers.rerank import build_reranker, TimedCompressionRetriever
+from chains.turn_context import TurnMemoRetriever
+from memory.memory import create_memory
+from utils.registry import get_chat_llm
+from utils.tracing import trace_run, span
+from utils.config import (
+    CHROMA_PATH,
+    HYBRID_TOP_K,
+    HYBRID_FETCH_K,
+    RERANK_CANDIDATES,
+    RERANK_TOP_N,
+    RERANK_MAX_CONTEXT_TOKENS,
+    INGEST_BATCH_SIZE,
+    INGEST_MAX_PENDING_BATCHES,
+    STREAM_INGEST_MIN_BYTES,
+    CHUNK_SIZE_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    DEDUP_CHUNKS,
+    DEDUP_THRESHOLD
+)
+from utils.session import get_state, notify
 
 def answer_template():
     return PromptTemplate(
@@ -28,29 +72,261 @@ def chain_RAG_blocks(llm, retriever, memory):
         verbose=False
     )
 
-def create_vectorstore_from_uploaded_documents(persist_dir="data/vectorstore"):
-    if "uploaded_file_paths" not in st.session_state or not st.session_state.uploaded_file_paths:
-        st.warning("No uploaded files found.")
-        return None
+def build_retriever(vectorstore):
+    """
+    Hybrid BM25 + vector retriever over the company partitions the question is about, optionally
+    followed by the local reranker selected in the sidebar (retrieve wide, then rerank to a short,
+    token-budgeted context).
+    """
+    reranker = build_reranker(
+        get_state().get("reranker", "lexical"), RERANK_TOP_N, RERANK_MAX_CONTEXT_TOKENS
+    )
+    hybrid_retriever = PartitionedRetriever(
+        partitions=vectorstore,
+        k=RERANK_CANDIDATES if reranker else HYBRID_TOP_K,
+        fetch_k=max(HYBRID_FETCH_K, RERANK_CANDIDATES),
+        session=get_state()
+    )
+    if reranker:
+        return TimedCompressionRetriever(base_compressor=reranker, base_retriever=hybrid_retriever)
+    return hybrid_retriever
+
+def attach_rag_chain(vectorstore, persist_dir=CHROMA_PATH):
+    """
+    Builds the retriever, LLM, memory and ConversationalRetrievalChain for the current session.
+    The vectorstore (company partitions) and LLM client are shared across sessions; the memory is
+    the session's own.
+    """
+    state = get_state()
+    state.vectorstore = vectorstore
+    state.retriever = build_retriever(vectorstore)
+
+    # Build LLM
+    llm = get_chat_llm(
+        model=state.selected_model,
+        api_key=state.openai_api_key,
+        temperature=state.temperature,
+        top_p=state.top_p,
+        max_tokens=state.max_tokens,
+        streaming=state.get("stream_responses", False)
+    )
+
+    # Build memory
+    memory = create_memory(
+        model_name=state.selected_model,
+        api_key=state.openai_api_key,
+        summary_model_name=state.get("summary_model"),
+        deferred=state.get("deferred_summary", False)
+    )
+
+    # Build the full chain; it reuses the chunks the relevance gate retrieved for the same question
+    state.chain = chain_RAG_blocks(llm, TurnMemoRetriever(retriever=state.retriever, session=state), memory)
+    return state.chain
+
+def iter_file_batches(file_paths, chunk_size, chunk_overlap, max_workers=1):
+    """
+    Yields (file_path, chunk_batches, error, stats) for each file to index.
+    Files below STREAM_INGEST_MIN_BYTES are parsed whole in the worker pool; larger files are
+    streamed page by page / row by row in a background thread, at most
+    INGEST_MAX_PENDING_BATCHES batches ahead of the vectorstore writes.
+    """
+    streamed = [path for path in file_paths if os.path.getsize(path) >= STREAM_INGEST_MIN_BYTES]
+    pooled = [path for path in file_paths if path not in streamed]
+
+    for file_path, file_docs, error in iter_load_and_split_documents(
+        pooled, chunk_size, chunk_overlap, max_workers=max_workers
+    ):
+        batches = [file_docs[i:i + INGEST_BATCH_SIZE] for i in range(0, len(file_docs), INGEST_BATCH_SIZE)]
+        yield file_path, batches, error, None
+
+    for file_path in streamed:
+        stats = {}
+        batches = iter_with_backpressure(
+            iter_file_chunk_batches(file_path, chunk_size, chunk_overlap, INGEST_BATCH_SIZE, stats),
+            INGEST_MAX_PENDING_BATCHES
+        )
+        yield file_path, batches, None, stats
 
-    # Load and chunk all uploaded docs
-    docs = load_and_split_all_documents(st.session_state.uploaded_file_paths)
+@trace_run("ingest")
+def create_vectorstore_from_uploaded_documents(persist_dir=CHROMA_PATH, chunk_size=CHUNK_SIZE_TOKENS,
+                                               chunk_overlap=CHUNK_OVERLAP_TOKENS, on_progress=None, removed_files=()):
+    """
+    Incrementally adds the uploaded files to the persisted vectorstore, which all sessions share.
+    Only new or changed files are loaded and embedded; chunks of replaced files and of the file
+    names in removed_files are deleted, files indexed earlier are kept. Unchanged uploads cost
+    no embedding calls.
+    Chunks are written in fixed-size batches, so large files never sit in memory whole.
+    Each company's chunks go to its own partition; a company whose last file is removed
+    has its partition dropped. on_progress(fraction, text) is called after every batch.
+    chunk_size and chunk_overlap are in model tokens. With DEDUP_CHUNKS, exact and near-duplicate
+    chunks of a company are stored once, with back-references to the pages/rows they were dropped from.
+    Returns the CompanyPartitions.
+    """
+    state = get_state()
+    if not state.get("uploaded_file_paths") and not removed_files:
+        notify("warning", "No uploaded files found.")
+        return None
 
     # Select embedding model
     embedding_model = select_embeddings_model()
 
-    # Save to Chroma
-    vectorstore = Chroma.from_documents(
-        documents=docs,
-        embedding=embedding_model,
-        persist_directory=persist_dir
+    manifest = load_manifest(persist_dir)
+    if manifest.get("layout") != PARTITION_LAYOUT:
+        # Single corpus-wide collection from before per-company partitions: rebuild from scratch
+        if has_legacy_index(persist_dir):
+            notify(
+                "warning",
+                "Deleting the index built by an older version; only the documents uploaded now are indexed."
+            )
+        with span("index.drop_legacy", "index"):
+            drop_legacy_index(persist_dir, embedding_model)
+        manifest = {"chunking": None, "files": {}}
+    elif not is_current_layout(manifest):
+        # Vector backend switched: drop the other backend's partitions and rebuild
+        # (re-embedding is served by the embedding cache)
+        previous = CompanyPartitions(
+            persist_dir, embedding_model, indexed_companies(manifest), manifest.get("vector_backend", "chroma")
+        )
+        with span("index.drop_backend", "index", backend=previous.backend):
+            for company in previous.companies:
+                previous.drop(company)
+        manifest = {"chunking": None, "files": {}}
+
+    # Open the shared, persisted per-company partitions (no embedding calls)
+    partitions = get_partitions(persist_dir, embedding_model)
+
+    dedup = ChunkDeduplicator(threshold=DEDUP_THRESHOLD) if DEDUP_CHUNKS else None
+    chunking = chunking_signature(
+        chunk_size, chunk_overlap, state.embeddings_model, dedup.settings() if dedup else None
     )
+    files_to_index, stale_chunks, unchanged_files = plan_incremental_update(
+        manifest, state.uploaded_file_paths, chunking, removed_files
+    )
+    if dedup:
+        # Duplicates are found across all of a company's files, so a changed company is re-indexed
+        # whole (its unchanged files' embeddings come from the embedding cache)
+        touched = {extract_company_from_filename(path) for path in files_to_index} | set(stale_chunks)
+        widen_to_companies(manifest, state.uploaded_file_paths, files_to_index, stale_chunks, unchanged_files, touched)
+
+    indexed_files = {} if manifest.get("chunking") != chunking else dict(manifest["files"])
+    indexed_files = {name: entry for name, entry in indexed_files.items() if name not in removed_files}
+
+    # Drop chunks of removed or replaced files from their companies' partitions
+    stale_count = sum(len(chunk_ids) for chunk_ids in stale_chunks.values())
+    if stale_count:
+        with span("index.delete", "index", chunks=stale_count):
+            for company, chunk_ids in stale_chunks.items():
+                partitions.delete(company, chunk_ids)
 
-    vectorstore.persist()
-    st.success(f"Vectorstore created with {len(docs)} chunks.")
+    # Load, chunk and embed only new or changed files, one batch of chunks at a time
+    added_chunks = 0
+    duplicate_chunks = 0
+    failed_files = []
+    for files_done, (file_path, batches, error, stats) in enumerate(iter_file_batches(
+        list(files_to_index),
+        chunk_size,
+        chunk_overlap,
+        max_workers=state.get("ingest_workers", 1)
+    )):
+        name = os.path.basename(file_path)
+        company = extract_company_from_filename(file_path)
+        content_hash = files_to_index[file_path]
+        chunk_ids = []
+        duplicates = 0
+        with span("ingest.file", "file", file=name, company=company, streamed=stats is not None) as file_span:
+            try:
+                if error:
+                    raise error
+                for batch in batches:
+                    kept, batch_ids = [], []
+                    for doc in batch:
+                        if dedup:
+                            representative, fingerprint = dedup.check(company, doc.page_content)
+                            if representative is not None:
+                                dedup.add_reference(company, representative, source_reference(doc))
+                                duplicates += 1
+                                continue
+                        chunk_id = make_chunk_id(name, content_hash, len(chunk_ids) + len(batch_ids))
+                        doc.metadata["chunk_id"] = chunk_id
+                        if dedup:
+                            dedup.add(company, chunk_id, fingerprint)
+                        kept.append(doc)
+                        batch_ids.append(chunk_id)
+                    if kept:
+                        with span("index.add", "index", file=name, chunks=len(kept)):
+                            partitions.add_documents(company, kept, batch_ids)
+                    chunk_ids.extend(batch_ids)
+                    if on_progress:
+                        on_progress(
+                            files_done / len(files_to_index),
+                            f"{name}: {len(chunk_ids)} chunks written ({files_done}/{len(files_to_index)} files done)"
+                        )
+            except Exception as e:
+                # Drop what was written of this file and leave it out of the manifest so it's retried
+                if chunk_ids:
+                    partitions.delete(company, chunk_ids)
+                if dedup:
+                    dedup.forget_file(company, name, chunk_ids)
+                indexed_files.pop(name, None)
+                failed_files.append(name)
+                notify("warning", f"Could not ingest {name}: {e}")
+                continue
 
-    # Set the filtered retriever scoped to the current company
-    company_name = st.session_state.get("current_company", "Unknown")
-    st.session_state.retriever = get_company_filtered_retriever(vectorstore, company_name)
+            file_span.set_attribute("chunks", len(chunk_ids))
+            file_span.set_attribute("duplicates", duplicates)
+            if stats:
+                # Streamed files are loaded and split in the background, overlapping the writes
+                file_span.set_attribute("pages", stats["pages"])
+                file_span.set_attribute("load_ms", stats["load_ns"] / 1e6)
+                file_span.set_attribute("split_ms", stats["split_ns"] / 1e6)
+
+        indexed_files[name] = {
+            "hash": content_hash,
+            "company": company,
+            # Lets later builds re-read the file when they rebuild the company's partition
+            "path": os.path.abspath(file_path),
+            "chunk_ids": chunk_ids,
+            "duplicates": duplicates,
+        }
+        added_chunks += len(chunk_ids)
+        duplicate_chunks += duplicates
+
+    if on_progress:
+        on_progress(1.0, f"{added_chunks} chunks written")
+
+    # Companies whose partitions changed; those left without files are dropped whole
+    changed_companies = {
+        entry["company"]
+        for name, entry in list(manifest["files"].items()) + list(indexed_files.items())
+        if name not in unchanged_files
+    }
+    companies = indexed_companies({"files": indexed_files})
+    removed_companies = (changed_companies | set(partitions.companies)) - set(companies)
+    with span("index.persist", "index", dropped_partitions=len(removed_companies)):
+        for company in removed_companies:
+            partitions.drop(company)
+        partitions.persist(changed_companies - removed_companies)
+        for company in changed_companies - removed_companies:
+            partitions.save_duplicates(company, dedup.references(company) if dedup else {})
+        save_manifest(persist_dir, {
+            "layout": PARTITION_LAYOUT,
+            "vector_backend": partitions.backend,
+            "chunking": chunking,
+            "files": indexed_files,
+        })
+    partitions.set_companies(companies)
+    state.indexed_companies = companies
+
+    # Cached answers about re-indexed companies are stale now
+    if changed_companies:
+        invalidate_answer_caches(changed_companies)
+
+    notify(
+        "success",
+        f"Vectorstore updated: {added_chunks} new chunks from {len(files_to_index) - len(failed_files)} files, "
+        f"{duplicate_chunks} duplicate chunks skipped, {stale_count} stale chunks removed, "
+        f"{len(unchanged_files)} files unchanged, "
+        f"{len(companies)} company partitions."
+    )
 
-    return vectorstore
\ No newline at end of file
+    return partitions
@@ -0,0 +1,186 @@
+import re
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any
+from langchain.schema import BaseRetriever
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from utils.session import get_state
+
+
+def normalize_query(query):
+    """
+    Normalizes a question so trivially different phrasings share one RAG result.
+    E.g., "What do we know about Boli AI?" → "what do we know about boli ai"
+    """
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.strip(" ?!.")
+
+
+class TurnContext:
+    """
+    Per-turn memo of RAG chain results, shared by the router, the lookup tools and the pitch tool.
+    Each distinct (normalized) query runs retrieval + generation once per turn, so the
+    conversation memory is also written once. Retrieved chunks are memoized too: the relevance
+    gate's search is the one the RAG chain answers from.
+    """
+    def __init__(self, callbacks=None):
+        self.callbacks = callbacks or []
+        self.results = {}
+        self.retrievals = {}
+        self.chain_calls = 0
+        self.llm_calls = 0
+        self.saved_retriever_calls = 0
+        self.saved_llm_calls = 0
+        self._costs = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def has_result(self, query):
+        return normalize_query(query) in self.results
+
+    def retrieve(self, retriever, query, callbacks=None):
+        """
+        Chunks retriever returns for query, searched once per turn.
+        """
+        key = normalize_query(query)
+        docs = self.retrievals.get(key)
+        if docs is not None:
+            self.saved_retriever_calls += 1
+            return list(docs)
+        docs = retriever.get_relevant_documents(query, callbacks=callbacks)
+        self.retrievals[key] = docs
+        return list(docs)
+
+    async def aretrieve(self, retriever, query, callbacks=None):
+        key = normalize_query(query)
+        docs = self.retrievals.get(key)
+        if docs is not None:
+            self.saved_retriever_calls += 1
+            return list(docs)
+        docs = await retriever.aget_relevant_documents(query, callbacks=callbacks)
+        self.retrievals[key] = docs
+        return list(docs)
+
+    def _claim(self, chain, key):
+        """
+        Returns (result, future, owner): the memoized result, or the in-flight future for key.
+        owner is True when the caller must run the chain and resolve the future.
+        """
+        with self._lock:
+            if key in self.results or key in self._pending:
+                self.saved_retriever_calls += 1
+                self.saved_llm_calls += self._costs[key]
+                return self.results.get(key), self._pending.get(key), False
+            # With chat history the chain condenses the question first: one extra LLM call
+            has_history = bool(chain.memory and chain.memory.chat_memory.messages)
+            self._costs[key] = 2 if has_history else 1
+            future = self._pending[key] = Future()
+            return None, future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            self._pending.pop(key, None)
+            if error is None:
+                self.results[key] = result
+                self.chain_calls += 1
+                self.llm_calls += self._costs[key]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def invoke_chain(self, chain, query):
+        key = normalize_query(query)
+        result, future, owner = self._claim(chain, key)
+        if not owner:
+            return result if future is None else future.result()
+        try:
+            result = chain.invoke({"question": query}, config={"callbacks": self.callbacks})
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def ainvoke_chain(self, chain, query):
+        """
+        Async variant used by concurrent tools. Concurrent calls for the same query, sync or async,
+        share one run.
+        """
+        key = normalize_query(query)
+        result, future, owner = self._claim(chain, key)
+        if not owner:
+            return result if future is None else await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await chain.ainvoke({"question": query}, config={"callbacks": self.callbacks})
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def report(self):
+        return {
+            "rag_chain_calls": self.chain_calls,
+            "rag_llm_calls": self.llm_calls,
+            "saved_retriever_calls": self.saved_retriever_calls,
+            "saved_llm_calls": self.saved_llm_calls,
+        }
+
+
+class TurnMemoRetriever(BaseRetriever):
+    """
+    The session retriever as seen by the RAG chain: a query already searched this turn
+    (by the relevance gate) is answered from the session's TurnContext instead of searched again.
+    """
+    retriever: BaseRetriever
+    session: Any = None
+
+    def _turn_context(self):
+        return self.session.get("turn_context") if self.session is not None else None
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        turn_context = self._turn_context()
+        if turn_context is None:
+            return self.retriever.get_relevant_documents(query, callbacks=run_manager.get_child())
+        return turn_context.retrieve(self.retriever, query, callbacks=run_manager.get_child())
+
+    async def _aget_relevant_documents(self, query, *, run_manager: AsyncCallbackManagerForRetrieverRun):
+        turn_context = self._turn_context()
+        if turn_context is None:
+            return await self.retriever.aget_relevant_documents(query, callbacks=run_manager.get_child())
+        return await turn_context.aretrieve(self.retriever, query, callbacks=run_manager.get_child())
+
+
+def start_turn(callbacks=None):
+    """
+    Starts a fresh retrieval/answer context for the current chat turn.
+    callbacks (e.g. a streaming handler) are attached to every chain/LLM call made in the turn.
+    """
+    get_state().turn_context = TurnContext(callbacks)
+    return get_state().turn_context
+
+
+def get_turn_context():
+    if get_state().get("turn_context") is None:
+        return start_turn()
+    return get_state().turn_context
+
+
+def get_turn_callbacks():
+    """
+    Callbacks of the current turn, for tools that call LLMs outside the agent's own run.
+    """
+    return get_turn_context().callbacks
+
+
+def invoke_rag_chain(query):
+    """
+    Runs the session's RAG chain for query, reusing the result if this turn already asked it.
+    """
+    return get_turn_context().invoke_chain(get_state().chain, query)
+
+
+async def ainvoke_rag_chain(query):
+    return await get_turn_context().ainvoke_chain(get_state().chain, query)
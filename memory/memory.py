@@ -1,41 +1,181 @@
+import threading
 import tiktoken
+from typing import Any
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from langchain.pydantic_v1 import PrivateAttr
 from langchain.memory import (
     ConversationBufferMemory,
     ConversationSummaryBufferMemory
 )
-from langchain.chat_models import ChatOpenAI
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.schema import get_buffer_string
+from utils.registry import get_chat_llm
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name):
+    """
+    tiktoken encoder, resolved once per model (unknown models use cl100k_base).
+    """
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
 
 
 class PatchedSummaryMemory(ConversationSummaryBufferMemory):
     """
     Custom memory class that overrides LangChain's broken token counting
     by using tiktoken directly (works with GPT-4o and cl100k_base).
+    Each message is encoded once when it enters the buffer; pruning keeps a running
+    total, so checking the token budget is O(1) instead of O(history).
     """
-    def get_num_tokens(self, messages):
-        encoding = tiktoken.encoding_for_model(self.llm.model_name)
-        num_tokens = 0
-        for message in messages:
-            num_tokens += 4  # per-message overhead
-            for key, value in message.dict().items():
-                if isinstance(value, str):
-                    num_tokens += len(encoding.encode(value))
-        num_tokens += 2  # priming
+    _message_tokens: deque = PrivateAttr(default_factory=deque)
+    _buffer_tokens: int = PrivateAttr(default=0)
+
+    def count_message_tokens(self, message):
+        encoding = get_encoding(self.llm.model_name)
+        num_tokens = 4  # per-message overhead
+        for key, value in message.dict().items():
+            if isinstance(value, str):
+                num_tokens += len(encoding.encode(value))
         return num_tokens
 
+    def get_num_tokens(self, messages):
+        return sum(self.count_message_tokens(message) for message in messages) + 2  # priming
+
+    def _sync_token_counts(self):
+        """
+        Counts only the messages appended since the last check.
+        """
+        messages = self.chat_memory.messages
+        if len(self._message_tokens) > len(messages):
+            # Buffer was replaced outside of this class: recount from scratch
+            self._message_tokens.clear()
+            self._buffer_tokens = 0
+        for message in messages[len(self._message_tokens):]:
+            num_tokens = self.count_message_tokens(message)
+            self._message_tokens.append(num_tokens)
+            self._buffer_tokens += num_tokens
+
+    @property
+    def buffer_tokens(self):
+        self._sync_token_counts()
+        return self._buffer_tokens + 2  # priming
+
+    def prune(self):
+        if self.buffer_tokens <= self.max_token_limit:
+            return
+        buffer = self.chat_memory.messages
+        pruned_memory = []
+        while buffer and self._buffer_tokens + 2 > self.max_token_limit:
+            pruned_memory.append(buffer.pop(0))
+            self._buffer_tokens -= self._message_tokens.popleft()
+        self.moving_summary_buffer = self.predict_new_summary(
+            pruned_memory, self.moving_summary_buffer
+        )
+
+    def clear(self):
+        super().clear()
+        self._message_tokens.clear()
+        self._buffer_tokens = 0
+
+
+# Background pool shared by every deferred memory; per-memory ordering comes from its prune lock
+_summary_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="memory-summary")
 
-def create_memory(model_name="gpt-4o", memory_max_token=4096, api_key=None):
+
+class DeferredSummaryMemory(PatchedSummaryMemory):
+    """
+    PatchedSummaryMemory that keeps summarization off the response critical path.
+    save_context only appends the turn; pruning and the summary LLM call run in a background
+    worker. Messages being summarized stay visible until their summary lands, so every
+    load_memory_variables call sees a consistent snapshot, and prunes of one memory are
+    serialized so overlapping turns never lose an update.
+    """
+    _state_lock: Any = PrivateAttr(default_factory=threading.RLock)
+    _prune_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _summarizing: list = PrivateAttr(default_factory=list)
+    _pending: Any = PrivateAttr(default=None)
+
+    def save_context(self, inputs, outputs):
+        with self._state_lock:
+            # Append the turn without the inline prune of ConversationSummaryBufferMemory
+            BaseChatMemory.save_context(self, inputs, outputs)
+            over_budget = self.buffer_tokens > self.max_token_limit
+        if over_budget:
+            self._pending = _summary_executor.submit(self._prune_in_background)
+
+    def _prune_in_background(self):
+        with self._prune_lock:
+            with self._state_lock:
+                if self.buffer_tokens <= self.max_token_limit:
+                    return
+                buffer = self.chat_memory.messages
+                while buffer and self._buffer_tokens + 2 > self.max_token_limit:
+                    self._summarizing.append(buffer.pop(0))
+                    self._buffer_tokens -= self._message_tokens.popleft()
+                pruned_memory = list(self._summarizing)
+                previous_summary = self.moving_summary_buffer
+
+            new_summary = self.predict_new_summary(pruned_memory, previous_summary)
+
+            with self._state_lock:
+                self.moving_summary_buffer = new_summary
+                del self._summarizing[:len(pruned_memory)]
+
+    def load_memory_variables(self, inputs):
+        with self._state_lock:
+            buffer = list(self._summarizing) + list(self.chat_memory.messages)
+            summary = self.moving_summary_buffer
+        if summary != "":
+            buffer = [self.summary_message_cls(content=summary)] + buffer
+        if self.return_messages:
+            final_buffer = buffer
+        else:
+            final_buffer = get_buffer_string(
+                buffer, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix
+            )
+        return {self.memory_key: final_buffer}
+
+    def flush(self):
+        """
+        Blocks until the background summarization (if any) has finished.
+        """
+        if self._pending is not None:
+            self._pending.result()
+
+    def clear(self):
+        self.flush()
+        with self._state_lock:
+            super().clear()
+            self._summarizing.clear()
+
+
+def create_memory(
+    model_name="gpt-4o",
+    memory_max_token=4096,
+    api_key=None,
+    summary_model_name=None,
+    deferred=False
+):
     """
     Dynamically selects the most appropriate memory class based on model support.
     - Uses token-aware PatchedSummaryMemory for gpt-3.5 / gpt-4
     - Falls back to ConversationBufferMemory for unsupported models (or you can reverse this)
+    - summary_model_name lets a cheaper model write the summaries (defaults to model_name)
+    - deferred=True summarizes in the background instead of inside save_context
     """
     summary_safe_models = ["gpt-3.5-turbo", "gpt-4", "gpt-4-turbo"]
 
     if model_name in summary_safe_models:
-        return PatchedSummaryMemory(
-            llm=ChatOpenAI(
-                model_name=model_name,
-                openai_api_key=api_key,
+        memory_cls = DeferredSummaryMemory if deferred else PatchedSummaryMemory
+        return memory_cls(
+            llm=get_chat_llm(
+                model=summary_model_name or model_name,
+                api_key=api_key,
                 temperature=0.1
             ),
             max_token_limit=memory_max_token,
@@ -50,4 +190,4 @@ def create_memory(model_name="gpt-4o", memory_max_token=4096, api_key=None):
             memory_key="chat_history",
             output_key="answer",
             input_key="question"
-        )
\ No newline at end of file
+        )
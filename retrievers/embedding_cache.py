@@ -0,0 +1,148 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from langchain.embeddings.base import Embeddings
+from utils.tracing import span
+
+
+def normalize_text(text):
+    """
+    Collapses whitespace so trivially different copies of a chunk share one cache entry.
+    """
+    return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper backed by a local SQLite cache keyed by (model, normalized text hash).
+    Cache misses are embedded in size-bounded batches; least recently used entries are
+    evicted once the cache grows past max_entries.
+    """
+    def __init__(self, base, model_key, cache_path, batch_size=64, max_entries=200_000):
+        self.base = base
+        self.model_key = model_key
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL, PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # Running entry count, so eviction checks stay off the per-query path
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def _key(self, text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay below SQLite's host parameter limit
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model_key, *batch]
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = array("f", blob).tolist()
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, self.model_key, key) for key in found]
+            )
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        # A key stored meanwhile by another thread already holds the same vector
+        cursor = self._conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+            [(self.model_key, key, array("f", vector).tobytes(), now) for key, vector in items]
+        )
+        self._count += cursor.rowcount
+
+    def _evict(self):
+        if self._count > self.max_entries:
+            cursor = self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (self._count - self.max_entries,)
+            )
+            self._count -= cursor.rowcount
+
+    def embed_documents(self, texts):
+        with span("embed documents", "embed", texts=len(texts)) as current:
+            vectors, hits, misses = self._embed_documents(texts)
+            current.set_attribute("embed.cache_hits", hits)
+            current.set_attribute("embed.cache_misses", misses)
+            return vectors
+
+    def _embed_documents(self, texts):
+        normalized = [normalize_text(text) for text in texts]
+        keys = [self._key(text) for text in normalized]
+
+        with self._lock:
+            vectors = self._lookup(keys)
+
+        # Embed each distinct missing text once, in bounded batches
+        missing = {}
+        for key, text in zip(keys, normalized):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        hits = len(keys) - sum(1 for key in keys if key in missing)
+        self.hits += hits
+        self.misses += len(missing)
+
+        missing_items = list(missing.items())
+        for start in range(0, len(missing_items), self.batch_size):
+            batch = missing_items[start:start + self.batch_size]
+            embedded = self.base.embed_documents([text for _, text in batch])
+            new_items = [(key, vector) for (key, _), vector in zip(batch, embedded)]
+            vectors.update(new_items)
+            with self._lock:
+                self._store(new_items)
+
+        with self._lock:
+            if missing:
+                self._evict()
+            self._conn.commit()
+
+        return [vectors[key] for key in keys], hits, len(missing)
+
+    def embed_query(self, text):
+        with span("embed query", "embed") as current:
+            vector, hit = self._embed_query(text)
+            current.set_attribute("embed.cache_hits", int(hit))
+            return vector
+
+    def _embed_query(self, text):
+        normalized = normalize_text(text)
+        key = self._key(normalized)
+        with self._lock:
+            cached = self._lookup([key])
+            self._conn.commit()
+        if key in cached:
+            self.hits += 1
+            return cached[key], True
+
+        self.misses += 1
+        vector = self.base.embed_query(normalized)
+        with self._lock:
+            self._store([(key, vector)])
+            self._evict()
+            self._conn.commit()
+        return vector, False
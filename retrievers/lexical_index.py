@@ -0,0 +1,168 @@
+import os
+import re
+import gzip
+import json
+import math
+import threading
+from collections import Counter
+
+LEXICAL_INDEX_FILENAME = "lexical_index.json.gz"
+
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "has", "have",
+    "how", "i", "in", "is", "it", "know", "me", "of", "on", "or", "our", "tell", "that", "the",
+    "their", "this", "to", "us", "was", "we", "what", "when", "where", "which", "who", "with", "you"
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """
+    Lowercased terms without stopwords. Codes like 'PRJ-2041' or 'SKU_99' are kept whole
+    and also split into their parts, so 'PRJ 2041' still matches.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+class LexicalIndex:
+    """
+    Compact BM25 inverted index over the same chunks (and chunk ids) as the vectorstore.
+    Only postings, lengths and filterable metadata are kept; chunk text lives in the vectorstore.
+    Each chunk's terms are remembered so deleting or re-adding it drops its postings right away.
+    """
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = {}
+        self.doc_metadata = {}
+        self.doc_terms = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.postings = {}
+            self.doc_lengths = {}
+            self.doc_metadata = {}
+            self.doc_terms = {}
+            self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add_documents(self, docs, ids):
+        """
+        Indexes docs under ids. An id that is already indexed is replaced: chunk ids are reused
+        when a file is re-chunked, with different content.
+        """
+        with self._lock:
+            for doc, chunk_id in zip(docs, ids):
+                self._remove(chunk_id)
+                terms = Counter(tokenize(doc.page_content))
+                for term, tf in terms.items():
+                    self.postings.setdefault(term, {})[chunk_id] = tf
+                length = sum(terms.values())
+                self.doc_lengths[chunk_id] = length
+                self.doc_metadata[chunk_id] = {
+                    "company": doc.metadata.get("company"),
+                    "source_file": doc.metadata.get("source_file"),
+                }
+                self.doc_terms[chunk_id] = list(terms)
+                self.total_length += length
+
+    def delete(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                self._remove(chunk_id)
+
+    def _remove(self, chunk_id):
+        length = self.doc_lengths.pop(chunk_id, None)
+        if length is None:
+            return
+        self.doc_metadata.pop(chunk_id, None)
+        self.total_length -= length
+        for term in self.doc_terms.pop(chunk_id, ()):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(chunk_id, None)
+            if not postings:
+                del self.postings[term]
+
+    def _matches(self, chunk_id, filter):
+        if not filter:
+            return True
+        metadata = self.doc_metadata.get(chunk_id, {})
+        return all(metadata.get(key) == value for key, value in filter.items())
+
+    def search(self, query, k=10, filter=None):
+        """
+        Returns [(chunk_id, bm25_score)] best first.
+        """
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for chunk_id, tf in postings.items():
+                    if not self._matches(chunk_id, filter):
+                        continue
+                    length = self.doc_lengths[chunk_id]
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, persist_dir):
+        with self._lock:
+            payload = json.dumps({
+                "k1": self.k1,
+                "b": self.b,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+                "doc_metadata": self.doc_metadata,
+            }, separators=(",", ":"))
+        os.makedirs(persist_dir, exist_ok=True)
+        path = os.path.join(persist_dir, LEXICAL_INDEX_FILENAME)
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, persist_dir):
+        """
+        Loads the index persisted next to the vectorstore (empty index if missing).
+        """
+        path = os.path.join(persist_dir, LEXICAL_INDEX_FILENAME)
+        if not os.path.exists(path):
+            return cls()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls(k1=payload["k1"], b=payload["b"])
+        index.doc_lengths = payload["doc_lengths"]
+        index.doc_metadata = payload["doc_metadata"]
+        index.total_length = sum(index.doc_lengths.values())
+        # The per-chunk term lists are not stored: rebuild them from the postings
+        for term, postings in payload["postings"].items():
+            live = {cid: tf for cid, tf in postings.items() if cid in index.doc_lengths}
+            if not live:
+                continue
+            index.postings[term] = live
+            for chunk_id in live:
+                index.doc_terms.setdefault(chunk_id, []).append(term)
+        return index
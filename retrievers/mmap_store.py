@@ -0,0 +1,403 @@
+import os
+import json
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain.schema import Document
+from langchain.schema.vectorstore import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one writer per partition
+    fcntl = None
+
+MMAP_DTYPES = ("float16", "int8")
+CURRENT_FILENAME = "current.json"
+LOCK_FILENAME = "writer.lock"
+
+
+def normalize(vectors):
+    """
+    Unit-normalized float32 rows (cosine similarity becomes a dot product).
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors, dtype):
+    """
+    Unit float32 rows → (stored rows, per-row int8 scales or None for float16).
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Vector store kept as quantized (float16 or int8) unit embeddings in memory-mapped .npy files,
+    so every process on the box shares one copy through the page cache instead of each holding
+    float32 vectors and an HNSW graph. A query is a blocked NumPy dot-product scan; with rescore,
+    the best k * rescore_factor candidates are re-scored exactly against float32 vectors that stay
+    on disk. Writes are buffered and published as a new generation by persist(); other processes
+    pick it up on their next query, so the last keep_generations generations stay on disk for
+    readers that have not switched yet. Writers in several processes publish under a file lock,
+    each merging its writes into the latest generation. Distances and relevance scores match
+    Chroma's default l2 space.
+    """
+    def __init__(self, path, embedding_function, dtype="float16", rescore=True, rescore_factor=4,
+                 block_bytes=8 << 20, keep_generations=2):
+        if dtype not in MMAP_DTYPES:
+            raise ValueError(f"Unsupported mmap vector dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        # Rows are scanned in float32 blocks of about this size, whatever the index size
+        self.block_bytes = block_bytes
+        self.keep_generations = max(1, keep_generations)
+        self._embedding = embedding_function
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._deleted = set()
+        self._load()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    # --- Generations on disk ---
+
+    def _current_path(self):
+        return os.path.join(self.path, CURRENT_FILENAME)
+
+    def _load(self):
+        """
+        Maps the latest published generation (or starts empty).
+        """
+        current_path = self._current_path()
+        try:
+            self._mtime = os.stat(current_path).st_mtime_ns
+            with open(current_path, encoding="utf-8") as f:
+                current = json.load(f)
+        except FileNotFoundError:
+            self._mtime = None
+            current = {"generation": None, "count": 0, "dtype": self.dtype, "companies": []}
+
+        self._generation = current["generation"]
+        self._stored_dtype = current["dtype"]
+        self._companies = current["companies"]
+        count = current["count"]
+        if not count:
+            self._ids, self._rows = [], {}
+            self._vectors = self._scales = self._full = self._company_codes = None
+            self._offsets = self._doc_bytes = None
+            self._live = np.zeros(0, dtype=bool)
+            return
+
+        directory = os.path.join(self.path, self._generation)
+        with open(os.path.join(directory, "ids.json"), encoding="utf-8") as f:
+            self._ids = json.load(f)
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        scales_path = os.path.join(directory, "scales.npy")
+        self._scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+        full_path = os.path.join(directory, "full.npy")
+        self._full = np.load(full_path, mmap_mode="r") if os.path.exists(full_path) else None
+        self._company_codes = np.load(os.path.join(directory, "company_codes.npy"), mmap_mode="r")
+        self._offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        self._doc_bytes = np.memmap(os.path.join(directory, "docs.bin"), dtype=np.uint8, mode="r")
+        self._live = np.ones(count, dtype=bool)
+        for chunk_id in self._deleted:
+            row = self._rows.get(chunk_id)
+            if row is not None:
+                self._live[row] = False
+
+    @contextmanager
+    def _writer_lock(self):
+        """
+        Serializes read-merge-publish across the processes writing to this store.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILENAME), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """
+        Re-maps when another process (or persist()) published a newer generation.
+        """
+        try:
+            mtime = os.stat(self._current_path()).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self._load()
+
+    def _document(self, row):
+        record = json.loads(bytes(self._doc_bytes[self._offsets[row]:self._offsets[row + 1]]).decode("utf-8"))
+        return record["text"], record["metadata"]
+
+    def _stored_rows_as_float(self, rows):
+        if self._full is not None:
+            return np.asarray(self._full[rows], dtype=np.float32)
+        vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self._scales is not None:
+            vectors *= np.asarray(self._scales[rows])[:, None]
+        return normalize(vectors)
+
+    # --- Writes ---
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"{time.time_ns()}-{i}" for i in range(len(texts))]
+        vectors = normalize(self._embedding.embed_documents(texts))
+        with self._lock:
+            for chunk_id, vector, text, metadata in zip(ids, vectors, texts, metadatas):
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    # Upsert: the stored copy is superseded
+                    self._live[row] = False
+                    self._deleted.add(chunk_id)
+                self._pending[chunk_id] = (vector, text, dict(metadata or {}))
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        with self._lock:
+            for chunk_id in ids or []:
+                self._pending.pop(chunk_id, None)
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    self._live[row] = False
+                    self._deleted.add(chunk_id)
+        return True
+
+    def persist(self):
+        """
+        Publishes live stored rows plus buffered writes as a new generation. The rows are those of
+        the latest published generation, so writes published meanwhile by another process are kept.
+        """
+        with self._lock, self._writer_lock():
+            if not self._pending and not self._deleted:
+                return
+            self._refresh()
+            for chunk_id in self._pending:
+                # Upserts of ids the other writer published since this store last mapped
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    self._live[row] = False
+            live_rows = np.flatnonzero(self._live)
+            pending = list(self._pending.items())
+            count = len(live_rows) + len(pending)
+
+            generation = f"gen-{time.time_ns()}"
+            directory = os.path.join(self.path, generation)
+            os.makedirs(directory, exist_ok=True)
+
+            ids = [self._ids[row] for row in live_rows] + [chunk_id for chunk_id, _ in pending]
+            metadatas = []
+            offsets = np.zeros(count + 1, dtype=np.int64)
+            with open(os.path.join(directory, "docs.bin"), "wb") as f:
+                position = 0
+                for i, row in enumerate(live_rows):
+                    blob = bytes(self._doc_bytes[self._offsets[row]:self._offsets[row + 1]])
+                    metadatas.append(json.loads(blob.decode("utf-8"))["metadata"])
+                    f.write(blob)
+                    position += len(blob)
+                    offsets[i + 1] = position
+                for i, (_, (_, text, metadata)) in enumerate(pending, start=len(live_rows)):
+                    blob = json.dumps({"text": text, "metadata": metadata}).encode("utf-8")
+                    metadatas.append(metadata)
+                    f.write(blob)
+                    position += len(blob)
+                    offsets[i + 1] = position
+            np.save(os.path.join(directory, "offsets.npy"), offsets)
+
+            companies = sorted({str(metadata.get("company")) for metadata in metadatas})
+            codes = {company: code for code, company in enumerate(companies)}
+            np.save(
+                os.path.join(directory, "company_codes.npy"),
+                np.array([codes[str(metadata.get("company"))] for metadata in metadatas], dtype=np.int32)
+            )
+
+            if count:
+                dim = len(pending[0][1][0]) if pending else self._vectors.shape[1]
+                stored = np.lib.format.open_memmap(
+                    os.path.join(directory, "vectors.npy"), mode="w+", dtype=self.dtype, shape=(count, dim)
+                )
+                scales = np.lib.format.open_memmap(
+                    os.path.join(directory, "scales.npy"), mode="w+", dtype=np.float32, shape=(count,)
+                ) if self.dtype == "int8" else None
+                full = np.lib.format.open_memmap(
+                    os.path.join(directory, "full.npy"), mode="w+", dtype=np.float32, shape=(count, dim)
+                ) if self.rescore else None
+
+                def write(start, vectors):
+                    end = start + len(vectors)
+                    stored[start:end], block_scales = quantize(vectors, self.dtype)
+                    if scales is not None:
+                        scales[start:end] = block_scales
+                    if full is not None:
+                        full[start:end] = vectors
+
+                # Copy surviving rows block by block, so the old generation is never loaded whole
+                block_rows = max(1, self.block_bytes // (4 * dim))
+                for start in range(0, len(live_rows), block_rows):
+                    write(start, self._stored_rows_as_float(live_rows[start:start + block_rows]))
+                if pending:
+                    write(len(live_rows), np.stack([vector for _, (vector, _, _) in pending]))
+                for array in (stored, scales, full):
+                    if array is not None:
+                        array.flush()
+                del stored, scales, full
+
+            with open(os.path.join(directory, "ids.json"), "w", encoding="utf-8") as f:
+                json.dump(ids, f)
+
+            # Publishing the pointer file is the atomic switch to the new generation
+            tmp_path = self._current_path() + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"generation": generation, "count": count, "dtype": self.dtype, "companies": companies}, f)
+            os.replace(tmp_path, self._current_path())
+
+            self._pending = {}
+            self._deleted = set()
+            self._load()
+
+            # Other processes may still be mapping (or about to map) the previous generation until
+            # their next query: only generations older than the last keep_generations are removed
+            generations = sorted(
+                (name for name in os.listdir(self.path) if name.startswith("gen-")),
+                key=lambda name: int(name[len("gen-"):])
+            )
+            for name in generations[:-self.keep_generations]:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def delete_collection(self):
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._pending = {}
+            self._deleted = set()
+            self._load()
+
+    # --- Reads ---
+
+    def __len__(self):
+        with self._lock:
+            return int(self._live.sum()) + len(self._pending)
+
+    def get(self, ids=None, include=None, **kwargs):
+        """
+        Chroma-style get by ids: {"ids", "documents", "metadatas"}.
+        """
+        result = {"ids": [], "documents": [], "metadatas": []}
+        with self._lock:
+            self._refresh()
+            for chunk_id in ids or []:
+                if chunk_id in self._pending:
+                    _, text, metadata = self._pending[chunk_id]
+                else:
+                    row = self._rows.get(chunk_id)
+                    if row is None or not self._live[row]:
+                        continue
+                    text, metadata = self._document(row)
+                result["ids"].append(chunk_id)
+                result["documents"].append(text)
+                result["metadatas"].append(metadata)
+        return result
+
+    def _block_rows(self):
+        return max(1, self.block_bytes // (4 * self._vectors.shape[1]))
+
+    def _filter_mask(self, filter):
+        mask = self._live.copy()
+        for key, value in (filter or {}).items():
+            if key == "company":
+                if str(value) not in self._companies:
+                    return np.zeros_like(mask)
+                mask &= np.asarray(self._company_codes) == self._companies.index(str(value))
+            else:
+                # Other keys are rare: decode metadata of the rows still in the running
+                for row in np.flatnonzero(mask):
+                    if self._document(row)[1].get(key) != value:
+                        mask[row] = False
+        return mask
+
+    def _scan(self, query, k, filter):
+        """
+        Returns [(row, cosine)] of the best stored rows, best first.
+        """
+        if not len(self._ids):
+            return []
+        mask = self._filter_mask(filter)
+        candidates = min(int(mask.sum()), k * self.rescore_factor if self.rescore and self._full is not None else k)
+        if not candidates:
+            return []
+
+        # Selective filters (e.g. one company out of many) only read the matching rows
+        rows = np.flatnonzero(mask)
+        selective = len(rows) < len(self._ids) // 2
+        count = len(rows) if selective else len(self._ids)
+        scores = np.empty(count, dtype=np.float32)
+        block_rows = self._block_rows()
+        for start in range(0, count, block_rows):
+            index = rows[start:start + block_rows] if selective else slice(start, start + block_rows)
+            block = np.asarray(self._vectors[index], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        if self._scales is not None:
+            scores *= self._scales[rows] if selective else self._scales
+        if not selective:
+            scores[~mask] = -np.inf
+
+        best = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = rows[best] if selective else best
+        scores = scores[best]
+        if self.rescore and self._full is not None:
+            # Exact float32 scores for the short list only (a few pages read from disk)
+            scores = dict(zip(top.tolist(), (np.asarray(self._full[top]) @ query).tolist()))
+        else:
+            scores = dict(zip(top.tolist(), scores.tolist()))
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        query = normalize(embedding)[0]
+        with self._lock:
+            self._refresh()
+            hits = [(self._document(row), float(score)) for row, score in self._scan(query, k, filter)]
+            for _, (vector, text, metadata) in self._pending.items():
+                if all(metadata.get(key) == value for key, value in (filter or {}).items()):
+                    hits.append(((text, metadata), float(vector @ query)))
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        # Squared l2 distance between unit vectors, as Chroma reports it
+        return [
+            (Document(page_content=text, metadata=dict(metadata)), 2.0 - 2.0 * cosine)
+            for (text, metadata), cosine in hits[:k]
+        ]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path=None, **kwargs):
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
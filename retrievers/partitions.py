@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import threading
+from langchain.vectorstores import Chroma
+from retrievers.lexical_index import LexicalIndex
+from retrievers.mmap_store import MmapVectorStore
+from utils.config import (
+    VECTOR_BACKEND,
+    MMAP_VECTOR_DTYPE,
+    MMAP_RESCORE,
+    MMAP_RESCORE_FACTOR,
+    MMAP_KEEP_GENERATIONS
+)
+
+# Stored in the ingestion manifest; an index without it predates per-company partitions
+PARTITION_LAYOUT = "company_partitions"
+PARTITIONS_DIRNAME = "partitions"
+DUPLICATES_FILENAME = "duplicates.json"
+VECTOR_BACKENDS = ("chroma", "mmap")
+
+
+def partition_name(company):
+    """
+    Stable Chroma collection name for a company (3-63 chars of [a-z0-9-]).
+    E.g., 'Boli Ai' → 'company-boli-ai-566fe180'
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", company.lower()).strip("-")[:40] or "unknown"
+    digest = hashlib.sha1(company.encode("utf-8")).hexdigest()[:8]
+    return f"company-{slug}-{digest}"
+
+
+def is_current_layout(manifest):
+    """
+    True when the indexed data was written per company with the configured vector backend.
+    """
+    return (
+        manifest.get("layout") == PARTITION_LAYOUT
+        and manifest.get("vector_backend", "chroma") == VECTOR_BACKEND
+    )
+
+
+class CompanyPartitions:
+    """
+    One Chroma collection and one lexical index per company, all under persist_dir, so a search
+    only touches the partitions of the companies it is about and stays small as clients are added.
+    A partition is created by its company's first chunk and dropped with its last file.
+    backend is "chroma" (one collection per company) or "mmap" (MmapVectorStore files per company).
+    """
+    def __init__(self, persist_dir, embedding_model, companies=(), backend=VECTOR_BACKEND):
+        if backend not in VECTOR_BACKENDS:
+            raise ValueError(f"Unknown vector backend: {backend}")
+        self.persist_dir = persist_dir
+        self.embedding_model = embedding_model
+        self.backend = backend
+        self.companies = tuple(sorted(companies))
+        self._collections = {}
+        self._lexical_indexes = {}
+        self._duplicates = {}
+        self._lock = threading.Lock()
+
+    def set_companies(self, companies):
+        self.companies = tuple(sorted(companies))
+
+    def _partition_dir(self, company):
+        return os.path.join(self.persist_dir, PARTITIONS_DIRNAME, partition_name(company))
+
+    def collection(self, company):
+        with self._lock:
+            if company not in self._collections:
+                if self.backend == "mmap":
+                    self._collections[company] = MmapVectorStore(
+                        os.path.join(self._partition_dir(company), "vectors"),
+                        self.embedding_model,
+                        dtype=MMAP_VECTOR_DTYPE,
+                        rescore=MMAP_RESCORE,
+                        rescore_factor=MMAP_RESCORE_FACTOR,
+                        keep_generations=MMAP_KEEP_GENERATIONS
+                    )
+                else:
+                    self._collections[company] = Chroma(
+                        collection_name=partition_name(company),
+                        persist_directory=self.persist_dir,
+                        embedding_function=self.embedding_model
+                    )
+            return self._collections[company]
+
+    def lexical_index(self, company):
+        with self._lock:
+            if company not in self._lexical_indexes:
+                self._lexical_indexes[company] = LexicalIndex.load(self._partition_dir(company))
+            return self._lexical_indexes[company]
+
+    def add_documents(self, company, docs, ids):
+        self.collection(company).add_documents(docs, ids=ids)
+        self.lexical_index(company).add_documents(docs, ids)
+
+    def delete(self, company, ids):
+        self.collection(company).delete(ids=ids)
+        self.lexical_index(company).delete(ids)
+
+    def drop(self, company):
+        """
+        Removes a company's collection and lexical index.
+        """
+        self.collection(company).delete_collection()
+        with self._lock:
+            self._collections.pop(company, None)
+            self._lexical_indexes.pop(company, None)
+            self._duplicates.pop(company, None)
+        shutil.rmtree(self._partition_dir(company), ignore_errors=True)
+
+    def persist(self, companies):
+        for company in companies:
+            self.collection(company).persist()
+            self.lexical_index(company).save(self._partition_dir(company))
+
+    def save_duplicates(self, company, references):
+        """
+        Stores {representative chunk id: [back-references]} of a company's deduplicated chunks.
+        """
+        path = os.path.join(self._partition_dir(company), DUPLICATES_FILENAME)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(references, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._duplicates[company] = references
+
+    def duplicate_refs(self, company):
+        """
+        Back-references of a company's deduplicated chunks (empty if none were dropped).
+        """
+        with self._lock:
+            if company not in self._duplicates:
+                path = os.path.join(self._partition_dir(company), DUPLICATES_FILENAME)
+                references = {}
+                if os.path.exists(path):
+                    with open(path, encoding="utf-8") as f:
+                        references = json.load(f)
+                self._duplicates[company] = references
+            return self._duplicates[company]
+
+    def count(self, company=None):
+        """
+        Number of stored chunks of one company, or of every partition.
+        """
+        companies = [company] if company else self.companies
+        if self.backend == "mmap":
+            return sum(len(self.collection(name)) for name in companies)
+        return sum(self.collection(name)._collection.count() for name in companies)
@@ -0,0 +1,153 @@
+import abc
+import math
+import time
+from functools import lru_cache
+from typing import Optional
+import tiktoken
+from langchain.retrievers import ContextualCompressionRetriever
+from langchain.retrievers.document_compressors.base import BaseDocumentCompressor
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain.pydantic_v1 import Field
+from retrievers.lexical_index import tokenize
+
+
+@lru_cache(maxsize=None)
+def get_token_encoder(encoding_name="cl100k_base"):
+    return tiktoken.get_encoding(encoding_name)
+
+
+@lru_cache(maxsize=None)
+def load_cross_encoder(model_name):
+    """
+    Loads a sentence-transformers cross-encoder once per process (optional dependency).
+    """
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name)
+
+
+class BudgetedReranker(BaseDocumentCompressor):
+    """
+    Scores all candidates in one batch, then keeps the best top_n chunks that fit in
+    max_context_tokens. Subclasses implement score().
+    """
+    top_n: int = 4
+    max_context_tokens: int = 1500
+
+    @abc.abstractmethod
+    def score(self, query, documents):
+        """
+        One relevance score per document, higher is better.
+        """
+
+    def compress_documents(self, documents, query, callbacks=None):
+        if not documents:
+            return []
+        scores = self.score(query, documents)
+        ranked = sorted(zip(documents, scores), key=lambda item: item[1], reverse=True)
+
+        encoder = get_token_encoder()
+        kept, used_tokens = [], 0
+        for doc, score in ranked:
+            if len(kept) >= self.top_n:
+                break
+            tokens = len(encoder.encode(doc.page_content))
+            # Always keep the best chunk, even if it alone exceeds the budget
+            if kept and used_tokens + tokens > self.max_context_tokens:
+                continue
+            doc.metadata["rerank_score"] = float(score)
+            kept.append(doc)
+            used_tokens += tokens
+        return kept
+
+
+class LexicalOverlapReranker(BudgetedReranker):
+    """
+    Network-free reranker: BM25-style query-term overlap with idf computed over the candidates.
+    """
+    k1: float = 1.2
+
+    def score(self, query, documents):
+        query_terms = set(tokenize(query))
+        doc_terms = [tokenize(doc.page_content) for doc in documents]
+        n_docs = len(documents)
+        avg_length = (sum(len(terms) for terms in doc_terms) / n_docs) or 1.0
+
+        scores = []
+        for terms in doc_terms:
+            score = 0.0
+            for term in query_terms:
+                tf = terms.count(term)
+                if not tf:
+                    continue
+                df = sum(1 for other in doc_terms if term in other)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                score += idf * tf * (self.k1 + 1) / (tf + self.k1 * len(terms) / avg_length)
+            scores.append(score)
+        return scores
+
+
+class CrossEncoderReranker(BudgetedReranker):
+    """
+    Local cross-encoder reranker (sentence-transformers), scoring all (query, chunk) pairs in one batch.
+    """
+    model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+    def score(self, query, documents):
+        model = load_cross_encoder(self.model_name)
+        return model.predict([(query, doc.page_content) for doc in documents]).tolist()
+
+
+class TimedCompressionRetriever(ContextualCompressionRetriever):
+    """
+    Retrieve wide, then rerank to a short context. Records per-stage timings of the last call.
+    """
+    last_timings: dict = Field(default_factory=dict)
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        started_at = time.perf_counter()
+        candidates = self.base_retriever.get_relevant_documents(
+            query, callbacks=run_manager.get_child()
+        )
+        retrieved_at = time.perf_counter()
+        docs = self.base_compressor.compress_documents(candidates, query, callbacks=run_manager.get_child())
+        self._record_timings(started_at, retrieved_at, candidates, docs)
+        return list(docs)
+
+    async def _aget_relevant_documents(self, query, *, run_manager: AsyncCallbackManagerForRetrieverRun):
+        started_at = time.perf_counter()
+        candidates = await self.base_retriever.aget_relevant_documents(
+            query, callbacks=run_manager.get_child()
+        )
+        retrieved_at = time.perf_counter()
+        docs = await self.base_compressor.acompress_documents(
+            candidates, query, callbacks=run_manager.get_child()
+        )
+        self._record_timings(started_at, retrieved_at, candidates, docs)
+        return list(docs)
+
+    def _record_timings(self, started_at, retrieved_at, candidates, docs):
+        finished_at = time.perf_counter()
+        encoder = get_token_encoder()
+        self.last_timings = {
+            "retrieve_ms": (retrieved_at - started_at) * 1000,
+            "rerank_ms": (finished_at - retrieved_at) * 1000,
+            "candidates": len(candidates),
+            "kept": len(docs),
+            "context_tokens": sum(len(encoder.encode(doc.page_content)) for doc in docs),
+        }
+
+
+def build_reranker(kind, top_n, max_context_tokens) -> Optional[BudgetedReranker]:
+    """
+    kind: "lexical", "cross-encoder" or "none". Falls back to lexical when
+    sentence-transformers is not installed.
+    """
+    if kind == "none":
+        return None
+    if kind == "cross-encoder":
+        try:
+            import sentence_transformers  # noqa: F401
+            return CrossEncoderReranker(top_n=top_n, max_context_tokens=max_context_tokens)
+        except ImportError:
+            pass
+    return LexicalOverlapReranker(top_n=top_n, max_context_tokens=max_context_tokens)
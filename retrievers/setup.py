@@ -1,35 +1,246 @@
-import streamlit as st
+import os
+from utils.session import get_state
+from typing import Any, List, Optional
+from functools import lru_cache
 from langchain.vectorstores import Chroma
 from langchain.embeddings import HuggingFaceEmbeddings, OpenAIEmbeddings
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import CohereRerank
+from langchain.schema import BaseRetriever, Document
+from langchain.schema.vectorstore import VectorStore
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from retrievers.embedding_cache import CachedEmbeddings
+from retrievers.lexical_index import LexicalIndex, LEXICAL_INDEX_FILENAME
+from retrievers.partitions import CompanyPartitions
+from utils.ingestion_manifest import load_manifest, indexed_companies
+from utils.question_cleaner import get_gazetteer
+from utils.registry import registry
+from utils.tracing import span
+from chains.turn_context import get_turn_context
+from utils.config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    RELEVANCE_THRESHOLD,
+    VECTOR_BACKEND
+)
 
-def select_embeddings_model():
-    if st.session_state.embeddings_model == "openai":
-        return OpenAIEmbeddings(openai_api_key=st.session_state.openai_api_key)
+@lru_cache(maxsize=None)
+def load_base_embeddings(provider, api_key=None):
+    """
+    Builds the raw embeddings model once per process (keeps the MiniLM weights loaded).
+    """
+    if provider == "openai":
+        return OpenAIEmbeddings(openai_api_key=api_key)
     else:
         return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
-def is_question_covered_by_docs(query):
-    retriever = st.session_state.retriever
-    results = retriever.get_relevant_documents(query)
-    return any(results)
+def embeddings_args(provider, api_key=None):
+    """
+    Arguments of load_base_embeddings / load_cached_embeddings for a provider. Every caller passes
+    exactly these, so they share one lru_cache entry (only OpenAI takes the API key).
+    """
+    return (provider, api_key) if provider == "openai" else (provider,)
 
-def is_low_relevance(query, threshold=0.35):
-    retriever = st.session_state.retriever
-    results = retriever.get_relevant_documents(query)
-    return all(doc.metadata.get("score", 1.0) < threshold for doc in results)
+@lru_cache(maxsize=None)
+def load_cached_embeddings(provider, api_key=None):
+    """
+    Wraps the process-wide embeddings model with the persistent embedding cache.
+    """
+    base = load_base_embeddings(*embeddings_args(provider, api_key))
+    model_name = base.model if provider == "openai" else base.model_name
+    return CachedEmbeddings(
+        base,
+        model_key=f"{provider}:{model_name}",
+        cache_path=EMBEDDING_CACHE_PATH,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES
+    )
 
-def get_company_filtered_retriever(vectorstore, company_name=None, top_k=10):
+def get_partitions(persist_dir, embedding_model):
     """
-    Returns a retriever scoped to a specific company using metadata filtering.
+    Process-wide per-company partitions of a persist dir for an embeddings model and the
+    configured vector backend, shared by all sessions.
     """
-    if not company_name:
-        company_name = st.session_state.get("current_company", "Unknown")
+    return registry.get(
+        "partitions",
+        (os.path.abspath(persist_dir), embedding_model.model_key, VECTOR_BACKEND),
+        lambda: CompanyPartitions(
+            persist_dir, embedding_model, indexed_companies(load_manifest(persist_dir)), VECTOR_BACKEND
+        )
+    )
+
+def drop_legacy_index(persist_dir, embedding_model):
+    """
+    Deletes the single corpus-wide collection and lexical index used before per-company partitions.
+    """
+    Chroma(persist_directory=persist_dir, embedding_function=embedding_model).delete_collection()
+    legacy_lexical_path = os.path.join(persist_dir, LEXICAL_INDEX_FILENAME)
+    if os.path.exists(legacy_lexical_path):
+        os.remove(legacy_lexical_path)
+
+def select_embeddings_model():
+    state = get_state()
+    return load_cached_embeddings(*embeddings_args(state.embeddings_model, state.openai_api_key))
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses dense (vectorstore) and lexical (BM25) rankings with reciprocal rank fusion.
+    Both sides fetch fetch_k candidates; the best k fused chunks are returned, so exact
+    matches on codes, SKUs and names surface without raising k.
+    metadata["score"] is the dense relevance score (0-1) and is only set for chunks the dense side
+    returned; the raw BM25 score of lexical hits is in metadata["lexical_score"].
+    """
+    vectorstore: VectorStore
+    lexical_index: LexicalIndex
+    k: int = 6
+    fetch_k: int = 20
+    rrf_k: int = 60
+    filter: Optional[dict] = None
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        dense_docs = retrieve_with_scores(self.vectorstore, query, k=self.fetch_k, filter=self.filter)
+        lexical_hits = self.lexical_index.search(query, k=self.fetch_k, filter=self.filter)
+
+        fused = {}
+        docs_by_key = {}
+        for rank, doc in enumerate(dense_docs):
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            docs_by_key[key] = doc
+            fused[key] = fused.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+
+        lexical_scores = dict(lexical_hits)
+        for rank, (chunk_id, bm25) in enumerate(lexical_hits):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+            if chunk_id in docs_by_key:
+                docs_by_key[chunk_id].metadata["lexical_score"] = bm25
+
+        top_keys = sorted(fused, key=fused.get, reverse=True)[:self.k]
+
+        # Lexical-only hits: fetch their text from the vectorstore by id
+        missing = [key for key in top_keys if key not in docs_by_key]
+        if missing:
+            stored = self.vectorstore.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                # BM25 is not on the dense 0-1 scale: the relevance gate ignores it
+                metadata = dict(metadata or {}, lexical_score=lexical_scores[chunk_id])
+                docs_by_key[chunk_id] = Document(page_content=text, metadata=metadata)
 
-    retriever = vectorstore.as_retriever(search_kwargs={
-        "k": top_k,
-        "filter": {"company": company_name}
-    })
+        docs = []
+        for key in top_keys:
+            if key in docs_by_key:
+                doc = docs_by_key[key]
+                doc.metadata["fusion_score"] = fused[key]
+                docs.append(doc)
+        return docs
 
-    return retriever
\ No newline at end of file
+class PartitionedRetriever(BaseRetriever):
+    """
+    Hybrid retrieval over per-company partitions. The companies a question names (found by the
+    gazetteer) select the partitions to search, and their names are stripped from the search
+    query. A question naming none searches the session's current company, otherwise every
+    partition. Results from several partitions are merged on their fusion scores.
+    """
+    partitions: Any
+    k: int = 6
+    fetch_k: int = 20
+    # Pinned scope (get_company_filtered_retriever); None routes by question
+    companies: Optional[List[str]] = None
+    session: Any = None
+
+    def route(self, query):
+        """
+        Returns (companies to search, search query).
+        """
+        known = self.partitions.companies
+        gazetteer = get_gazetteer(known)
+        if self.companies:
+            return [company for company in self.companies if company in known], gazetteer.strip(query)
+        mentioned = gazetteer.detect(query)
+        if mentioned:
+            return list(mentioned), gazetteer.strip(query)
+        current = self.session.get("current_company") if self.session is not None else None
+        if current in known:
+            return [current], query
+        return list(known), query
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        companies, search_query = self.route(query)
+        docs = []
+        for company in companies:
+            partition_retriever = HybridRetriever(
+                vectorstore=self.partitions.collection(company),
+                lexical_index=self.partitions.lexical_index(company),
+                k=self.k,
+                fetch_k=self.fetch_k
+            )
+            partition_docs = partition_retriever.get_relevant_documents(
+                search_query, callbacks=run_manager.get_child(), metadata={"company": company}
+            )
+            # Pages/rows whose duplicate chunks were dropped in favour of these at ingestion
+            duplicates = self.partitions.duplicate_refs(company)
+            for doc in partition_docs:
+                references = duplicates.get(doc.metadata.get("chunk_id"))
+                if references:
+                    doc.metadata["duplicate_sources"] = references
+            docs.extend(partition_docs)
+        if len(companies) > 1:
+            docs.sort(key=lambda doc: doc.metadata.get("fusion_score", 0.0), reverse=True)
+        return docs[:self.k]
+
+def retrieve_with_scores(vectorstore, query, k=10, filter=None):
+    """
+    Similarity search that returns documents with metadata["score"] populated.
+    """
+    results = vectorstore.similarity_search_with_relevance_scores(query, k=k, filter=filter)
+    docs = []
+    for doc, score in results:
+        doc.metadata["score"] = score
+        docs.append(doc)
+    return docs
+
+def best_relevance_score(query):
+    """
+    Best dense relevance score among the chunks retrieved for query (None if the dense search
+    returned none of them; lexical-only hits carry no comparable score).
+    The chunks are kept in the turn's context for the RAG chain to answer from.
+    """
+    retriever = get_state().get("retriever")
+    if retriever is None:
+        return None
+    with span("retrieval", "retrieval") as current:
+        docs = get_turn_context().retrieve(retriever, query)
+        current.set_attribute("retrieval.documents", len(docs))
+    scores = [doc.metadata["score"] for doc in docs if doc.metadata.get("score") is not None]
+    return max(scores) if scores else None
+
+def passes_relevance_gate(query, threshold=None):
+    """
+    Pre-generation gate: True when the best retrieved chunk clears the relevance threshold.
+    Lets callers skip the RAG LLM call for out-of-corpus questions.
+    """
+    if threshold is None:
+        threshold = get_state().get("relevance_threshold", RELEVANCE_THRESHOLD)
+    best_score = best_relevance_score(query)
+    return best_score is not None and best_score >= threshold
+
+async def apasses_relevance_gate(query, threshold=None):
+    """
+    Async variant of passes_relevance_gate (the search itself runs in an executor thread).
+    """
+    if threshold is None:
+        threshold = get_state().get("relevance_threshold", RELEVANCE_THRESHOLD)
+    retriever = get_state().get("retriever")
+    if retriever is None:
+        return False
+    with span("retrieval", "retrieval") as current:
+        docs = await get_turn_context().aretrieve(retriever, query)
+        current.set_attribute("retrieval.documents", len(docs))
+    scores = [doc.metadata["score"] for doc in docs if doc.metadata.get("score") is not None]
+    return bool(scores) and max(scores) >= threshold
+
+def get_company_filtered_retriever(partitions, company_name=None, top_k=10):
+    """
+    Returns a hybrid (BM25 + vector) retriever scoped to a specific company's partition.
+    """
+    if not company_name:
+        company_name = get_state().get("current_company", "Unknown")
+    return PartitionedRetriever(partitions=partitions, k=top_k, companies=[company_name])
@@ -0,0 +1,276 @@
+import os
+import json
+import shutil
+import asyncio
+from typing import Optional
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from service.sessions import SessionManager, DEFAULT_SETTINGS
+from service.assistant import ask, index_documents, attach_existing_index, serialize_sources
+from utils.streaming import StreamEventHandler
+from utils.startup import start_warmup
+from utils.llm_gateway import get_gateway
+from utils.ingestion_manifest import manifest_summary, has_legacy_index
+from utils.config import UPLOAD_DIR, SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, CHROMA_PATH
+
+
+def upload_dir(session_id):
+    return os.path.join(UPLOAD_DIR, session_id)
+
+
+def remove_uploads(session_id):
+    # Indexed documents stay in the shared vectorstore; only the session's upload copies go
+    shutil.rmtree(upload_dir(session_id), ignore_errors=True)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Turns block on LLM and tool calls: run them on a bounded pool of worker threads
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=SERVICE_WORKERS))
+    # Embeddings model, tiktoken and the persisted partitions load before the first request needs them
+    start_warmup(DEFAULT_SETTINGS["embeddings_model"], DEFAULT_SETTINGS["openai_api_key"])
+    yield
+
+
+app = FastAPI(title="EffectiveSoft Sales Assistant API", lifespan=lifespan)
+sessions = SessionManager(on_drop=remove_uploads)
+
+
+class SessionSettings(BaseModel):
+    selected_model: str = DEFAULT_SETTINGS["selected_model"]
+    embeddings_model: str = DEFAULT_SETTINGS["embeddings_model"]
+    temperature: float = DEFAULT_SETTINGS["temperature"]
+    max_tokens: int = DEFAULT_SETTINGS["max_tokens"]
+    top_p: float = DEFAULT_SETTINGS["top_p"]
+    use_answer_cache: bool = DEFAULT_SETTINGS["use_answer_cache"]
+    refresh_web_results: bool = DEFAULT_SETTINGS["refresh_web_results"]
+    relevance_threshold: float = DEFAULT_SETTINGS["relevance_threshold"]
+    reranker: str = DEFAULT_SETTINGS["reranker"]
+    summary_model: Optional[str] = DEFAULT_SETTINGS["summary_model"]
+    deferred_summary: bool = DEFAULT_SETTINGS["deferred_summary"]
+    current_company: Optional[str] = None
+    openai_api_key: Optional[str] = None
+    tavily_api_key: Optional[str] = None
+
+
+class Question(BaseModel):
+    question: str
+
+
+def get_session(session_id):
+    """
+    (state, lock) of the session; 404 if it is unknown or expired.
+    """
+    state, lock = sessions.get_with_lock(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return state, lock
+
+
+def run_turn(state, lock, question, callbacks=None, on_notice=None):
+    """
+    One turn of a session, run in a worker thread. Turns of the same session are serialized.
+    """
+    with lock:
+        state.on_notice = on_notice
+        try:
+            answer, sources, source_type = ask(state, question, callbacks=callbacks)
+        finally:
+            state.on_notice = None
+        state.messages.append({"role": "user", "content": question})
+        state.messages.append({"role": "assistant", "content": answer})
+    return {
+        "answer": answer,
+        "sources": serialize_sources(sources),
+        "source_type": source_type,
+        "answer_cache_hit": bool(state.get("answer_cache_hit")),
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "sessions": len(sessions), "llm_gateway": get_gateway().report()}
+
+
+@app.post("/sessions")
+async def create_session(settings: Optional[SessionSettings] = None):
+    settings = settings or SessionSettings()
+    session_id, state = sessions.create(**settings.model_dump())
+    # Reuse whatever is already indexed; uploading documents is only needed to add or change files
+    vectorstore = await asyncio.to_thread(attach_existing_index, state)
+    return {
+        "session_id": session_id,
+        "rag_ready": vectorstore is not None,
+        "index": manifest_summary(CHROMA_PATH),
+        # An index from an older version is not reopened; the next /index call deletes it
+        "legacy_index": has_legacy_index(CHROMA_PATH),
+    }
+
+
+@app.get("/sessions/{session_id}")
+async def describe_session(session_id: str):
+    state, _ = get_session(session_id)
+    return {
+        "session_id": session_id,
+        "settings": {key: state.get(key) for key in DEFAULT_SETTINGS if not key.endswith("api_key")},
+        "rag_ready": state.get("chain") is not None,
+        "indexed_companies": state.get("indexed_companies") or [],
+        "index": manifest_summary(CHROMA_PATH),
+        "legacy_index": has_legacy_index(CHROMA_PATH),
+        "turns": len(state.messages) // 2,
+    }
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """
+    Drops the session and its uploads. Documents it indexed stay in the shared vectorstore.
+    """
+    if not await run_in_threadpool(sessions.delete, session_id):
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return {"deleted": session_id}
+
+
+@app.put("/sessions/{session_id}/documents/{filename}")
+async def upload_document(session_id: str, filename: str, request: Request):
+    """
+    Uploads one PDF or CSV as the raw request body.
+    """
+    get_session(session_id)
+    filename = os.path.basename(filename)
+    if not filename.lower().endswith((".pdf", ".csv")):
+        raise HTTPException(status_code=415, detail="Only PDF and CSV documents are supported")
+
+    os.makedirs(upload_dir(session_id), exist_ok=True)
+    path = os.path.join(upload_dir(session_id), filename)
+    size = 0
+    f = await run_in_threadpool(open, path, "wb")
+    try:
+        async for block in request.stream():
+            await run_in_threadpool(f.write, block)
+            size += len(block)
+    finally:
+        await run_in_threadpool(f.close)
+    return {"filename": filename, "bytes": size}
+
+
+@app.delete("/sessions/{session_id}/documents/{filename}")
+async def delete_document(session_id: str, filename: str):
+    """
+    Removes a document from the shared vectorstore (whichever session indexed it) and from the
+    session's uploads.
+    """
+    state, lock = get_session(session_id)
+    filename = os.path.basename(filename)
+    path = os.path.join(upload_dir(session_id), filename)
+    notices = []
+
+    def run():
+        with lock:
+            if os.path.exists(path):
+                os.remove(path)
+            state.on_notice = lambda level, message: notices.append({"level": level, "message": message})
+            try:
+                return index_documents(state, [], removed_files=[filename])
+            finally:
+                state.on_notice = None
+
+    vectorstore = await asyncio.to_thread(run)
+    return {
+        "deleted": filename,
+        "rag_ready": vectorstore is not None,
+        "indexed_companies": state.get("indexed_companies") or [],
+        "notices": notices,
+    }
+
+
+@app.post("/sessions/{session_id}/index")
+async def index_session_documents(session_id: str):
+    """
+    Adds the session's uploaded documents to the shared vectorstore. Documents indexed by other
+    sessions are kept; remove one with DELETE /sessions/{id}/documents/{filename}.
+    """
+    state, lock = get_session(session_id)
+    directory = upload_dir(session_id)
+    file_paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+    ) if os.path.isdir(directory) else []
+    if not file_paths:
+        raise HTTPException(status_code=400, detail="Upload documents first")
+
+    notices = []
+
+    def run():
+        with lock:
+            state.on_notice = lambda level, message: notices.append({"level": level, "message": message})
+            try:
+                return index_documents(state, file_paths)
+            finally:
+                state.on_notice = None
+
+    vectorstore = await asyncio.to_thread(run)
+    return {
+        "rag_ready": vectorstore is not None,
+        "indexed_companies": state.get("indexed_companies") or [],
+        "notices": notices,
+    }
+
+
+@app.post("/sessions/{session_id}/ask")
+async def ask_question(session_id: str, body: Question):
+    state, lock = get_session(session_id)
+    return await asyncio.to_thread(run_turn, state, lock, body.question)
+
+
+@app.post("/sessions/{session_id}/ask/stream")
+async def ask_question_stream(session_id: str, body: Question):
+    """
+    Server-sent events: "token" and "status" while the turn runs, then one "answer" (or "error") event.
+    """
+    state, lock = get_session(session_id)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def sink(event):
+        # Called from the worker thread running the turn
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def produce():
+        try:
+            result = await asyncio.to_thread(
+                run_turn,
+                state,
+                lock,
+                body.question,
+                [StreamEventHandler(sink)],
+                lambda level, message: sink({"type": "status", "text": message})
+            )
+            await events.put({"type": "answer", **result})
+        except Exception as e:
+            await events.put({"type": "error", "detail": str(e)})
+        finally:
+            await events.put(None)
+
+    async def stream():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            # Client gone: the turn still finishes (and is remembered), its events are dropped
+            if not task.done():
+                task.add_done_callback(lambda t: t.exception())
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=SERVICE_HOST, port=SERVICE_PORT)
@@ -0,0 +1,95 @@
+import os
+import threading
+from utils.session import use_session
+from utils.registry import registry
+from utils.llm_handler import get_response_from_LLM
+from utils.ingestion_manifest import load_manifest, indexed_companies, indexed_embeddings_model
+from chains.turn_context import start_turn
+from tools.sales_pitch import generate_sales_pitch
+from chains.rag_chain import create_vectorstore_from_uploaded_documents, attach_rag_chain
+from retrievers.setup import select_embeddings_model, get_partitions
+from retrievers.partitions import is_current_layout
+from utils.config import CHROMA_PATH
+
+
+def get_ingest_lock(persist_dir=CHROMA_PATH):
+    """
+    One ingestion at a time per vectorstore: the manifest and partitions are rewritten together.
+    """
+    return registry.get("ingest_lock", os.path.abspath(persist_dir), threading.Lock)
+
+
+def ask(state, question, callbacks=None):
+    """
+    Answers question in the given session (st.session_state for the Streamlit UI, a SessionState
+    for API clients). Returns (answer, source_docs, source_type).
+    """
+    with use_session(state):
+        return get_response_from_LLM(question, callbacks=callbacks)
+
+
+def pitch(state, company_name, callbacks=None):
+    """
+    Drafts the 3-slide sales pitch for company_name in the given session, as draft_sales_proposal does.
+    """
+    with use_session(state):
+        start_turn(callbacks)
+        try:
+            return generate_sales_pitch(company_name)
+        finally:
+            state.turn_context = None
+
+
+def index_documents(state, file_paths, on_progress=None, persist_dir=CHROMA_PATH, removed_files=()):
+    """
+    Adds file_paths to the shared vectorstore (new or changed files replace their earlier version;
+    files indexed by other sessions are kept), deletes the file names in removed_files, then
+    attaches the session's RAG chain. Returns the vectorstore (None when there was nothing to index).
+    """
+    with use_session(state), get_ingest_lock(persist_dir):
+        state.uploaded_file_paths = list(file_paths)
+        vectorstore = create_vectorstore_from_uploaded_documents(
+            persist_dir, on_progress=on_progress, removed_files=set(removed_files)
+        )
+        if vectorstore:
+            attach_rag_chain(vectorstore, persist_dir)
+    return vectorstore
+
+
+def attach_existing_index(state, persist_dir=CHROMA_PATH):
+    """
+    Gives a new session a RAG chain over the already-built shared vectorstore (no re-ingestion).
+    Returns the vectorstore, or None if nothing has been indexed yet, only in an older layout
+    or with another vector backend (the next ingestion rebuilds it), or with another embeddings
+    model than the session's.
+    """
+    with use_session(state):
+        manifest = load_manifest(persist_dir)
+        if not manifest["files"] or not is_current_layout(manifest):
+            return None
+        if indexed_embeddings_model(manifest) != state.embeddings_model:
+            # The session's query vectors would not be comparable with the stored ones
+            return None
+        vectorstore = get_partitions(persist_dir, select_embeddings_model())
+        state.indexed_companies = indexed_companies(manifest)
+        attach_rag_chain(vectorstore, persist_dir)
+    return vectorstore
+
+
+def serialize_sources(source_docs, max_chars=300):
+    """
+    JSON-friendly view of the source documents of an answer.
+    """
+    return [
+        {
+            "source_file": doc.metadata.get("source_file"),
+            "company": doc.metadata.get("company"),
+            "page": doc.metadata.get("page"),
+            "row": doc.metadata.get("row"),
+            "score": doc.metadata.get("score"),
+            "lexical_score": doc.metadata.get("lexical_score"),
+            "duplicate_sources": doc.metadata.get("duplicate_sources", []),
+            "excerpt": doc.page_content[:max_chars],
+        }
+        for doc in source_docs
+    ]
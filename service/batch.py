@@ -0,0 +1,211 @@
+"""
+Bulk questions or sales pitches over a JSONL workload.
+
+    python -m service.batch questions.jsonl answers.jsonl --mode ask --workers 8 --rpm 300 --tpm 150000
+    python -m service.batch companies.jsonl pitches.jsonl --mode pitch --resume
+
+Input lines are {"id": ..., "question": ...} (ask) or {"id": ..., "company": ...} (pitch); a bare
+JSON string is accepted too, and a missing id defaults to the line number. Each result is appended
+to the output file as soon as it is ready, so an interrupted run can be continued with --resume:
+ids that already have a successful result are skipped, failed ones are retried.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from service.sessions import new_session_state
+from service.assistant import ask, pitch, attach_existing_index, serialize_sources
+from tools.internal_lookup import SharedLookups
+from utils.llm_gateway import get_gateway
+from utils.config import BATCH_WORKERS, BATCH_RPM, BATCH_TPM, DEFAULT_MODEL
+
+INPUT_FIELDS = {"ask": "question", "pitch": "company"}
+
+
+def load_items(input_path, mode):
+    """
+    Workload items as {"id", "index", "text"}, in file order.
+    """
+    field = INPUT_FIELDS[mode]
+    items = []
+    with open(input_path, encoding="utf-8") as f:
+        for index, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {field: record}
+            text = (record.get(field) or "").strip()
+            if not text:
+                raise ValueError(f"{input_path}:{index}: missing '{field}'")
+            items.append({"id": str(record.get("id", index)), "index": index, "text": text})
+    return items
+
+
+def load_completed_ids(output_path):
+    """
+    Ids with a successful result in a previous (possibly interrupted) run.
+    A truncated last line is ignored and its item runs again.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and not record.get("error"):
+                completed.add(str(record.get("id")))
+    return completed
+
+
+class ResultWriter:
+    """
+    Appends result records to the output JSONL from any worker thread, flushing each one.
+    """
+    def __init__(self, output_path, append):
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        self._file = open(output_path, "a" if append else "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        if append and self._file.tell():
+            # An interrupted write may have left a partial line behind
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run_item(item, mode, settings, shared_lookups):
+    """
+    Runs one question or pitch in a fresh session over the shared vectorstore and returns its record.
+    """
+    state = new_session_state(**settings)
+    state.shared_lookups = shared_lookups
+    state.on_notice = lambda level, message: None
+
+    record = {"id": item["id"], "index": item["index"], "mode": mode, "input": item["text"]}
+    started_at = time.perf_counter()
+    try:
+        attach_existing_index(state)
+        if mode == "pitch":
+            record.update(answer=pitch(state, item["text"]), source_type="pitch", sources=[])
+        else:
+            answer, sources, source_type = ask(state, item["text"])
+            if source_type == "error":
+                # ask() reports a failed turn as its answer instead of raising
+                record["error"] = answer
+            else:
+                record.update(answer=answer, source_type=source_type, sources=serialize_sources(sources))
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_s"] = round(time.perf_counter() - started_at, 3)
+    return record
+
+
+def run_batch(input_path, output_path, mode="ask", workers=BATCH_WORKERS, requests_per_minute=BATCH_RPM,
+              tokens_per_minute=BATCH_TPM, resume=False, settings=None, on_result=None):
+    """
+    Runs the workload with `workers` concurrent sessions. All LLM calls go through the process-wide
+    LLM gateway, which enforces the requests/tokens-per-minute budget and sends identical in-flight
+    prompts once; all sessions share internal lookups, so prompts about the same company retrieve
+    and summarize it once. Returns a summary dict.
+    """
+    items = load_items(input_path, mode)
+    completed = load_completed_ids(output_path) if resume else set()
+    pending = [item for item in items if item["id"] not in completed]
+
+    gateway = get_gateway()
+    # The run's budget applies only while it runs: other users of the process keep theirs
+    previous_limiter = gateway.limiter
+    if requests_per_minute or tokens_per_minute:
+        gateway.set_limits(requests_per_minute, tokens_per_minute)
+    shared_lookups = SharedLookups()
+    writer = ResultWriter(output_path, append=resume)
+    failed = 0
+    started_at = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [
+                pool.submit(run_item, item, mode, settings or {}, shared_lookups)
+                for item in pending
+            ]
+            for future in as_completed(futures):
+                record = future.result()
+                writer.write(record)
+                failed += bool(record.get("error"))
+                if on_result:
+                    on_result(record)
+    finally:
+        writer.close()
+        gateway.limiter = previous_limiter
+
+    llm = gateway.report()
+    return {
+        "items": len(items),
+        "skipped": len(items) - len(pending),
+        "completed": len(pending) - failed,
+        "failed": failed,
+        "elapsed_s": round(time.perf_counter() - started_at, 2),
+        "shared_lookup_hits": shared_lookups.hits,
+        "llm_calls": llm["upstream_calls"],
+        "llm_coalesced": llm["coalesced"],
+        "llm_retries": llm["retries"],
+        "llm_queue_s": round(llm["queue_s"], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk questions or sales pitches over a JSONL workload.")
+    parser.add_argument("input", help="JSONL file of questions or company names")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument("--mode", choices=sorted(INPUT_FIELDS), default="ask")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--rpm", type=int, default=BATCH_RPM, help="LLM requests per minute (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=BATCH_TPM, help="LLM tokens per minute (0 = unlimited)")
+    parser.add_argument("--resume", action="store_true", help="Skip ids already answered in the output file")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--embeddings-model", default="openai")
+    args = parser.parse_args()
+
+    settings = {
+        "selected_model": args.model,
+        "embeddings_model": args.embeddings_model,
+        # Answers go to a file: no token streaming
+        "stream_responses": False,
+    }
+
+    def report(record):
+        status = "failed: " + record["error"] if record.get("error") else f"{record['latency_s']:.1f}s"
+        print(f"[{record['id']}] {record['input'][:60]} — {status}", file=sys.stderr)
+
+    summary = run_batch(
+        args.input,
+        args.output,
+        mode=args.mode,
+        workers=args.workers,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        resume=args.resume,
+        settings=settings,
+        on_result=report
+    )
+    print(json.dumps(summary, indent=2))
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from utils.session import SessionState
+from utils.config import (
+    DEFAULT_MODEL,
+    RELEVANCE_THRESHOLD,
+    SUMMARY_MODEL,
+    DEFERRED_SUMMARY,
+    INGEST_WORKERS,
+    SESSION_TTL_S,
+    MAX_SESSIONS
+)
+
+DEFAULT_SETTINGS = {
+    "selected_model": DEFAULT_MODEL,
+    "embeddings_model": "openai",
+    "temperature": 0.3,
+    "max_tokens": 1024,
+    "top_p": 1.0,
+    "stream_responses": True,
+    "refresh_web_results": False,
+    "use_answer_cache": True,
+    "relevance_threshold": RELEVANCE_THRESHOLD,
+    "reranker": "lexical",
+    "summary_model": SUMMARY_MODEL,
+    "deferred_summary": DEFERRED_SUMMARY,
+    "ingest_workers": INGEST_WORKERS,
+    "current_company": None,
+    "openai_api_key": None,
+    "tavily_api_key": None,
+}
+
+
+def new_session_state(**settings):
+    """
+    Fresh per-session state with the sidebar defaults (same keys the Streamlit UI sets).
+    """
+    state = SessionState(DEFAULT_SETTINGS)
+    state.update({key: value for key, value in settings.items() if value is not None})
+    state.update(chain=None, retriever=None, vectorstore=None, messages=[])
+    return state
+
+
+class SessionManager:
+    """
+    In-process registry of API sessions. Idle sessions expire after ttl_s; the least recently
+    used ones are dropped beyond max_sessions. Each session has a lock so its turns
+    (and memory writes) run one at a time, while different sessions run concurrently.
+    on_drop(session_id) is called, outside the registry lock, for every expired, evicted or deleted session.
+    """
+    def __init__(self, ttl_s=SESSION_TTL_S, max_sessions=MAX_SESSIONS, on_drop=None):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self.on_drop = on_drop
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, **settings):
+        session_id = uuid.uuid4().hex
+        state = new_session_state(**settings)
+        state.session_id = session_id
+        with self._lock:
+            dropped = self._evict()
+            self._sessions[session_id] = {"state": state, "lock": threading.Lock(), "used_at": time.time()}
+            while len(self._sessions) > self.max_sessions:
+                dropped.append(self._sessions.popitem(last=False)[0])
+        self._dropped(dropped)
+        return session_id, state
+
+    def get(self, session_id):
+        state, _ = self.get_with_lock(session_id)
+        return state
+
+    def get_with_lock(self, session_id):
+        """
+        (state, lock) of a live session, or (None, None) if it is unknown or expired.
+        """
+        with self._lock:
+            dropped = self._evict()
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry["used_at"] = time.time()
+                self._sessions.move_to_end(session_id)
+        self._dropped(dropped)
+        if entry is None:
+            return None, None
+        return entry["state"], entry["lock"]
+
+    def delete(self, session_id):
+        with self._lock:
+            deleted = self._sessions.pop(session_id, None) is not None
+        if deleted:
+            self._dropped([session_id])
+        return deleted
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_s
+        expired = [sid for sid, entry in self._sessions.items() if entry["used_at"] < cutoff]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return expired
+
+    def _dropped(self, session_ids):
+        if self.on_drop:
+            for session_id in session_ids:
+                self.on_drop(session_id)
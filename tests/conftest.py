@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import pytest
+
+# utils.config reads the environment at import time: point every persisted store at a scratch
+# directory before any app module is imported
+WORKDIR = tempfile.mkdtemp(prefix="sales-assistant-tests-")
+os.environ.update({
+    "CHROMA_PATH": os.path.join(WORKDIR, "vectorstore"),
+    "UPLOAD_DIR": os.path.join(WORKDIR, "uploads"),
+    "EMBEDDING_CACHE_PATH": os.path.join(WORKDIR, "embedding_cache.sqlite3"),
+    "WEB_CACHE_PATH": os.path.join(WORKDIR, "web_cache.sqlite3"),
+    "FIXTURES_DIR": os.path.join(WORKDIR, "fixtures"),
+    "TRACE_PATH": os.path.join(WORKDIR, "spans.jsonl"),
+    "WARMUP": "0",
+    "ANONYMIZED_TELEMETRY": "False",
+})
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """
+    Offline hashing embeddings instead of OpenAI/HuggingFace, on an empty vectorstore.
+    """
+    import retrievers.setup
+    from chromadb.api.client import SharedSystemClient
+    from utils.registry import registry
+    from utils.config import CHROMA_PATH, UPLOAD_DIR, EMBEDDING_CACHE_PATH
+    from retrievers.embedding_cache import CachedEmbeddings
+    from benchmarks.fakes import FakeEmbeddings
+
+    registry.invalidate()
+    # Chroma keeps one client per path open for the process
+    SharedSystemClient.clear_system_cache()
+    for path in (CHROMA_PATH, UPLOAD_DIR):
+        shutil.rmtree(path, ignore_errors=True)
+    embeddings = CachedEmbeddings(FakeEmbeddings(), model_key="fake:hashing-256", cache_path=EMBEDDING_CACHE_PATH)
+    monkeypatch.setattr(retrievers.setup, "load_cached_embeddings", lambda provider, api_key=None: embeddings)
+    yield embeddings
+    registry.invalidate()
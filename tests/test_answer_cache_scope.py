@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+from langchain.memory import ConversationBufferMemory
+from utils.session import use_session
+from service.sessions import new_session_state
+from chains.answer_cache import GENERAL_SCOPE
+from utils.llm_handler import answer_cache_scope, remember_cached_turn
+
+
+def scope_for(mentioned, current_company=None, history=()):
+    state = new_session_state(current_company=current_company)
+    state.chain = SimpleNamespace(memory=SimpleNamespace(chat_memory=SimpleNamespace(messages=list(history))))
+    with use_session(state):
+        return answer_cache_scope(mentioned)
+
+
+def test_named_companies_are_the_scope():
+    assert scope_for(("Acme Corp",), current_company="Boli Ai") == ("Acme Corp",)
+
+
+def test_follow_up_is_scoped_to_the_current_company():
+    assert scope_for((), current_company="Acme Corp") == ("Acme Corp",)
+    assert scope_for((), current_company="Boli Ai") == ("Boli Ai",)
+
+
+def test_follow_up_without_a_company_is_not_cached():
+    assert scope_for((), history=["What did we deliver?", "A data platform."]) is None
+
+
+def test_opening_question_without_a_company_is_general():
+    assert scope_for(()) == GENERAL_SCOPE
+
+
+def test_cached_answers_are_remembered_for_follow_ups():
+    state = new_session_state()
+    state.chain = SimpleNamespace(memory=ConversationBufferMemory(
+        return_messages=True, memory_key="chat_history", output_key="answer", input_key="question"
+    ))
+    with use_session(state):
+        remember_cached_turn("What did we build for Acme Corp?", "A data platform.")
+        assert answer_cache_scope(()) is None
+    assert [message.content for message in state.chain.memory.chat_memory.messages] == [
+        "What did we build for Acme Corp?", "A data platform."
+    ]
@@ -0,0 +1,77 @@
+import os
+from fastapi.testclient import TestClient
+from service.api import app, upload_dir
+from service.sessions import SessionManager
+
+ACME_CSV = b"project,summary\nPRJ-1,Acme data platform migration\nPRJ-2,Acme churn model\n"
+BOLI_CSV = b"project,summary\nPRJ-7,Boli dashboard delivery\n"
+
+
+def create_session(client):
+    response = client.post("/sessions", json={"embeddings_model": "huggingface", "openai_api_key": "sk-test"})
+    assert response.status_code == 200
+    return response.json()["session_id"]
+
+
+def upload_and_index(client, session_id, filename, content):
+    assert client.put(f"/sessions/{session_id}/documents/{filename}", content=content).status_code == 200
+    response = client.post(f"/sessions/{session_id}/index")
+    assert response.status_code == 200
+    return response.json()
+
+
+def indexed_files(client, session_id):
+    index = client.get(f"/sessions/{session_id}").json()["index"] or {"companies": {}}
+    return {company: entry["files"] for company, entry in index["companies"].items()}
+
+
+def test_indexing_from_another_session_keeps_earlier_documents(fake_embeddings):
+    client = TestClient(app)
+    session_a, session_b = create_session(client), create_session(client)
+
+    upload_and_index(client, session_a, "Acme Corp - Projects.csv", ACME_CSV)
+    result = upload_and_index(client, session_b, "Boli Ai - Projects.csv", BOLI_CSV)
+
+    assert result["indexed_companies"] == ["Acme Corp", "Boli Ai"]
+    assert indexed_files(client, session_a) == {
+        "Acme Corp": ["Acme Corp - Projects.csv"],
+        "Boli Ai": ["Boli Ai - Projects.csv"],
+    }
+
+
+def test_documents_are_removed_only_on_request(fake_embeddings):
+    client = TestClient(app)
+    session_a, session_b = create_session(client), create_session(client)
+    upload_and_index(client, session_a, "Acme Corp - Projects.csv", ACME_CSV)
+    upload_and_index(client, session_b, "Boli Ai - Projects.csv", BOLI_CSV)
+
+    response = client.delete(f"/sessions/{session_b}/documents/Acme Corp - Projects.csv")
+
+    assert response.status_code == 200
+    assert response.json()["indexed_companies"] == ["Boli Ai"]
+    assert indexed_files(client, session_a) == {"Boli Ai": ["Boli Ai - Projects.csv"]}
+
+
+def test_deleted_session_is_a_404_and_its_uploads_are_removed(fake_embeddings):
+    client = TestClient(app)
+    session_id = create_session(client)
+    assert client.put(f"/sessions/{session_id}/documents/Acme Corp - Projects.csv", content=ACME_CSV).json() == {
+        "filename": "Acme Corp - Projects.csv", "bytes": len(ACME_CSV)
+    }
+
+    assert client.delete(f"/sessions/{session_id}").status_code == 200
+
+    assert not os.path.exists(upload_dir(session_id))
+    assert client.post(f"/sessions/{session_id}/ask", json={"question": "Acme?"}).status_code == 404
+    assert client.post(f"/sessions/{session_id}/index").status_code == 404
+
+
+def test_evicted_sessions_drop_their_uploads():
+    dropped = []
+    manager = SessionManager(max_sessions=1, on_drop=dropped.append)
+    first, _ = manager.create()
+    second, _ = manager.create()
+
+    assert dropped == [first]
+    assert manager.get_with_lock(first) == (None, None)
+    assert manager.get_with_lock(second)[0] is not None
@@ -0,0 +1,55 @@
+import json
+import service.batch as batch
+
+
+def fake_ask(failing):
+    def ask(state, question):
+        if question in failing:
+            return "❌ LLM Error: upstream timeout", [], "error"
+        return f"Answer to {question}", [], "internal"
+    return ask
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_failed_turns_are_recorded_as_errors_and_retried_on_resume(tmp_path, monkeypatch):
+    input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    input_path.write_text(
+        "\n".join(json.dumps({"id": id_, "question": f"Question {id_}"}) for id_ in ("a", "b", "c")) + "\n",
+        encoding="utf-8"
+    )
+    monkeypatch.setattr(batch, "attach_existing_index", lambda state: None)
+
+    monkeypatch.setattr(batch, "ask", fake_ask({"Question b"}))
+    summary = batch.run_batch(str(input_path), str(output_path), workers=2)
+
+    assert summary["failed"] == 1 and summary["completed"] == 2
+    failed = [record for record in read_records(output_path) if record.get("error")]
+    assert [record["id"] for record in failed] == ["b"]
+    assert "answer" not in failed[0]
+    assert batch.load_completed_ids(str(output_path)) == {"a", "c"}
+
+    asked = []
+    succeed = fake_ask(set())
+    monkeypatch.setattr(batch, "ask", lambda state, question: asked.append(question) or succeed(state, question))
+    summary = batch.run_batch(str(input_path), str(output_path), workers=2, resume=True)
+
+    assert asked == ["Question b"]
+    assert summary["skipped"] == 2 and summary["failed"] == 0
+    assert batch.load_completed_ids(str(output_path)) == {"a", "b", "c"}
+
+
+
+def test_run_limits_do_not_outlive_the_run(tmp_path, monkeypatch):
+    input_path = tmp_path / "questions.jsonl"
+    input_path.write_text(json.dumps({"id": "a", "question": "Question a"}) + "\n", encoding="utf-8")
+    monkeypatch.setattr(batch, "attach_existing_index", lambda state: None)
+    monkeypatch.setattr(batch, "ask", fake_ask(set()))
+    limiter = batch.get_gateway().limiter
+
+    batch.run_batch(str(input_path), str(tmp_path / "answers.jsonl"), requests_per_minute=60, tokens_per_minute=1000)
+
+    assert batch.get_gateway().limiter is limiter
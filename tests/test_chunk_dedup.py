@@ -0,0 +1,60 @@
+from utils.chunk_dedup import ChunkDeduplicator, normalize_chunk
+
+
+def index(dedup, company, texts):
+    """
+    Feeds texts through the deduplicator like ingestion does; returns the kept chunk ids.
+    """
+    kept = []
+    for i, text in enumerate(texts):
+        representative, fingerprint = dedup.check(company, text)
+        if representative is None:
+            dedup.add(company, f"chunk-{i}", fingerprint)
+            kept.append(f"chunk-{i}")
+        else:
+            dedup.add_reference(company, representative, {"source_file": "report.csv", "row": i})
+    return kept
+
+
+def test_normalize_keeps_numbers():
+    assert normalize_chunk("Quarter: Q1, Revenue: 1200") == "quarter q1 revenue 1200"
+
+
+def test_rows_differing_only_by_amount_or_id_are_all_kept():
+    dedup = ChunkDeduplicator()
+    rows = [
+        "Quarter: Q1, Revenue: 1200, Project PRJ-2041",
+        "Quarter: Q2, Revenue: 1500, Project PRJ-2042",
+        "Quarter: Q2, Revenue: 1500, Project PRJ-2043",
+    ]
+    assert len(index(dedup, "Acme", rows)) == 3
+    assert dedup.exact_duplicates == dedup.near_duplicates == 0
+
+
+def test_long_rows_differing_by_one_amount_are_kept():
+    dedup = ChunkDeduplicator()
+    description = "Managed cloud migration for the retail division including monitoring and support " * 3
+    rows = [f"{description} Invoice total: {amount} USD" for amount in (1200, 1250)]
+    assert len(index(dedup, "Acme", rows)) == 2
+
+
+def test_repeated_boilerplate_is_dropped_with_back_reference():
+    dedup = ChunkDeduplicator()
+    footer = (
+        "Confidential. This document is provided to Acme Corp for evaluation purposes only and may not "
+        "be shared with third parties without the written consent of EffectiveSoft. Prices exclude taxes "
+        "and are subject to change; delivery dates are estimates and depend on the scope agreed in the "
+        "statement of work signed by both parties."
+    )
+    texts = [footer, footer.upper(), footer.replace("both parties", "both sides")]
+    kept = index(dedup, "Acme", texts)
+    assert kept == ["chunk-0"]
+    assert dedup.exact_duplicates == 1 and dedup.near_duplicates == 1
+    assert [ref["row"] for ref in dedup.references("Acme")["chunk-0"]] == [1, 2]
+
+
+def test_duplicates_are_per_company():
+    dedup = ChunkDeduplicator()
+    text = "Standard terms and conditions of the master services agreement apply."
+    assert index(dedup, "Acme", [text]) == ["chunk-0"]
+    assert index(dedup, "Boli", [text]) == ["chunk-0"]
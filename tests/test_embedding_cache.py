@@ -0,0 +1,21 @@
+from benchmarks.fakes import FakeEmbeddings
+from retrievers.embedding_cache import CachedEmbeddings
+
+
+def count_rows(embeddings):
+    (count,) = embeddings._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    return count
+
+
+def test_running_count_bounds_the_cache(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    embeddings = CachedEmbeddings(FakeEmbeddings(), model_key="fake", cache_path=path, max_entries=3)
+    embeddings.embed_documents(["alpha", "beta", "beta", "gamma"])
+    embeddings.embed_query("delta")
+    embeddings.embed_query("epsilon")
+    assert embeddings._count == count_rows(embeddings) == 3
+
+    reopened = CachedEmbeddings(FakeEmbeddings(), model_key="fake", cache_path=path, max_entries=3)
+    assert reopened._count == 3
+    reopened.embed_query("epsilon")
+    assert reopened.hits == 1
@@ -0,0 +1,20 @@
+import json
+from utils.ingestion_manifest import has_legacy_index, MANIFEST_FILENAME
+
+
+def test_collection_without_manifest_is_legacy(tmp_path):
+    (tmp_path / "chroma.sqlite3").write_bytes(b"")
+    assert has_legacy_index(str(tmp_path))
+
+
+def test_manifest_without_layout_is_legacy(tmp_path):
+    manifest = {"chunking": {}, "files": {"Acme Corp - Projects.csv": {"company": "Acme Corp", "chunk_ids": []}}}
+    (tmp_path / MANIFEST_FILENAME).write_text(json.dumps(manifest), encoding="utf-8")
+    assert has_legacy_index(str(tmp_path))
+
+
+def test_partitioned_or_empty_index_is_not_legacy(tmp_path):
+    assert not has_legacy_index(str(tmp_path))
+    (tmp_path / "chroma.sqlite3").write_bytes(b"")
+    (tmp_path / MANIFEST_FILENAME).write_text(json.dumps({"layout": "company_partitions", "files": {}}), encoding="utf-8")
+    assert not has_legacy_index(str(tmp_path))
@@ -0,0 +1,51 @@
+from langchain.schema import Document
+from retrievers.lexical_index import LexicalIndex
+
+
+def chunk(text, company="Acme Corp"):
+    return Document(page_content=text, metadata={"company": company, "source_file": "Acme Corp - Projects.csv"})
+
+
+def test_readded_id_drops_its_old_postings():
+    index = LexicalIndex()
+    index.add_documents([chunk("disclaimer boilerplate alpha"), chunk("quarterly report")], ["f-0", "f-1"])
+    index.delete(["f-0"])
+    index.add_documents([chunk("project PRJ-2041 budget")], ["f-0"])
+
+    assert index.search("disclaimer") == []
+    assert [cid for cid, _ in index.search("PRJ-2041 budget")] == ["f-0"]
+    assert "disclaimer" not in index.postings
+
+
+def test_add_replaces_an_indexed_id():
+    index = LexicalIndex()
+    index.add_documents([chunk("disclaimer boilerplate alpha")], ["f-0"])
+    index.add_documents([chunk("project PRJ-2041 budget")], ["f-0"])
+
+    assert index.search("disclaimer") == []
+    assert index.total_length == index.doc_lengths["f-0"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = LexicalIndex()
+    index.add_documents(
+        [chunk("disclaimer boilerplate alpha"), chunk("project PRJ-2041 budget"), chunk("Boli dashboard", "Boli Ai")],
+        ["f-0", "f-1", "b-0"]
+    )
+    index.delete(["f-0"])
+    index.save(str(tmp_path))
+
+    loaded = LexicalIndex.load(str(tmp_path))
+    assert len(loaded) == 2
+    assert loaded.search("PRJ 2041") == index.search("PRJ 2041")
+    assert loaded.search("dashboard", filter={"company": "Acme Corp"}) == []
+    assert [cid for cid, _ in loaded.search("dashboard", filter={"company": "Boli Ai"})] == ["b-0"]
+    assert loaded.search("disclaimer") == []
+
+    # Term lists are rebuilt on load, so deletes after a restart drop the postings too
+    loaded.delete(["f-1"])
+    assert loaded.search("budget") == [] and "budget" not in loaded.postings
+
+
+def test_missing_index_loads_empty(tmp_path):
+    assert len(LexicalIndex.load(str(tmp_path))) == 0
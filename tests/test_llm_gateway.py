@@ -0,0 +1,205 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import utils.llm_gateway as llm_gateway
+from utils.llm_gateway import LLMGateway
+
+
+class APIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+def failing(*errors, result="ok"):
+    """
+    send() raising the given errors in turn, then returning result. Counts its calls.
+    """
+    calls = []
+
+    def send():
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    send.calls = calls
+    return send
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(llm_gateway.time, "sleep", delays.append)
+    return delays
+
+
+def test_retries_throttled_and_transient_errors(sleeps):
+    gateway = LLMGateway(max_retries=3, backoff_base_s=0.01, backoff_max_s=0.05)
+    send = failing(APIError(429), APIError(503))
+    assert gateway.call(None, 0, send) == "ok"
+    assert len(send.calls) == 3
+    report = gateway.report()
+    assert report["retries"] == 2 and report["throttled"] == 1 and report["errors"] == 0
+    assert all(0 <= delay <= 0.05 for delay in sleeps)
+
+
+def test_waits_at_least_retry_after(sleeps):
+    gateway = LLMGateway(max_retries=2, backoff_base_s=0.01, backoff_max_s=0.05)
+    assert gateway.call(None, 0, failing(APIError(429, retry_after=1.5))) == "ok"
+    assert sleeps == [1.5]
+
+
+def test_gives_up_on_client_errors_and_after_max_retries(sleeps):
+    gateway = LLMGateway(max_retries=2, backoff_base_s=0.0)
+    send = failing(APIError(400))
+    with pytest.raises(APIError):
+        gateway.call(None, 0, send)
+    assert len(send.calls) == 1
+
+    send = failing(APIError(500), APIError(500), APIError(500))
+    with pytest.raises(APIError):
+        gateway.call(None, 0, send)
+    assert len(send.calls) == 3
+    assert gateway.report()["errors"] == 2
+
+
+def slow_send(calls, delay_s=0.2, result=None):
+    def send():
+        calls.append(threading.get_ident())
+        time.sleep(delay_s)
+        return result if result is not None else {"answer": "ok"}
+    return send
+
+
+def test_identical_concurrent_requests_share_one_call():
+    gateway = LLMGateway()
+    calls = []
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: gateway.call("same", 0, slow_send(calls)), range(5)))
+    assert len(calls) == 1
+    assert results == [{"answer": "ok"}] * 5
+    # Every caller gets its own copy
+    assert len({id(result) for result in results}) == 5
+    assert gateway.report()["coalesced"] == 4
+
+
+def test_concurrency_limit_is_enforced():
+    gateway = LLMGateway(max_concurrency=2, coalesce=False)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def send():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        assert list(pool.map(lambda _: gateway.call(None, 0, send), range(6))) == ["ok"] * 6
+    assert peak[0] == 2
+
+
+def test_async_callers_share_the_concurrency_limit():
+    gateway = LLMGateway(max_concurrency=2, coalesce=False)
+    active, peak = [0], [0]
+
+    async def send():
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.05)
+        active[0] -= 1
+        return "ok"
+
+    async def run():
+        return await asyncio.gather(*(gateway.acall(None, 0, send) for _ in range(6)))
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert peak[0] == 2
+    # Every slot was released
+    assert all(gateway._slots.acquire(blocking=False) for _ in range(2))
+
+
+def test_cancelled_leader_hands_the_request_to_a_waiter():
+    gateway = LLMGateway()
+    sent = []
+
+    async def send():
+        sent.append(1)
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    async def run():
+        leader = asyncio.ensure_future(gateway.acall("same", 0, send))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(gateway.acall("same", 0, send))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "ok"
+    assert len(sent) == 2
+    assert gateway.report()["in_flight"] == 0
+
+
+def test_cancelled_follower_leaves_the_shared_request_alone():
+    gateway = LLMGateway()
+
+    async def send():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        leader = asyncio.ensure_future(gateway.acall("same", 0, send))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(gateway.acall("same", 0, send))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_failures_are_forwarded_to_waiters():
+    gateway = LLMGateway(max_retries=0)
+
+    def send():
+        time.sleep(0.1)
+        raise APIError(400)
+
+    def call(_):
+        try:
+            return gateway.call("same", 0, send)
+        except APIError as e:
+            return e.status_code
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        assert list(pool.map(call, range(3))) == [400, 400, 400]
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    gateway = LLMGateway(max_concurrency=1, coalesce=False)
+
+    async def send():
+        return "ok"
+
+    async def run():
+        gateway._slots.acquire()
+        waiter = asyncio.ensure_future(gateway.acall(None, 0, send))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        gateway._slots.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.05)
+        return await asyncio.wait_for(gateway.acall(None, 0, send), timeout=1)
+
+    assert asyncio.run(run()) == "ok"
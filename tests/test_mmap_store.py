@@ -0,0 +1,50 @@
+import os
+from retrievers.mmap_store import MmapVectorStore
+from benchmarks.fakes import FakeEmbeddings
+
+
+def generations(path):
+    return sorted(name for name in os.listdir(path) if name.startswith("gen-"))
+
+
+def test_previous_generation_survives_the_next_persist(tmp_path):
+    path = str(tmp_path / "vectors")
+    embeddings = FakeEmbeddings()
+    writer = MmapVectorStore(path, embeddings)
+    writer.add_texts(["Acme Corp data platform"], metadatas=[{"company": "Acme Corp"}], ids=["c0"])
+    writer.persist()
+
+    # Another process maps the generation published so far
+    reader = MmapVectorStore(path, embeddings)
+    mapped = os.path.join(path, reader._generation)
+
+    writer.add_texts(["Acme Corp churn model"], metadatas=[{"company": "Acme Corp"}], ids=["c1"])
+    writer.persist()
+    assert os.path.isdir(mapped)
+    assert len(generations(path)) == 2
+
+    writer.add_texts(["Acme Corp dashboard"], metadatas=[{"company": "Acme Corp"}], ids=["c2"])
+    writer.persist()
+    assert not os.path.exists(mapped)
+    assert writer._generation in generations(path)
+    assert len(generations(path)) == 2
+
+    # The reader switches to the latest generation on its next query
+    assert len(reader.similarity_search("Acme Corp dashboard", k=3)) == 3
+
+
+def test_writers_in_two_processes_keep_each_others_vectors(tmp_path):
+    path = str(tmp_path / "vectors")
+    embeddings = FakeEmbeddings()
+    first, second = MmapVectorStore(path, embeddings), MmapVectorStore(path, embeddings)
+
+    first.add_texts(["Acme Corp data platform"], metadatas=[{"company": "Acme Corp"}], ids=["c0"])
+    second.add_texts(["Acme Corp churn model", "Acme Corp draft"], metadatas=[{"company": "Acme Corp"}] * 2,
+                     ids=["c1", "c0"])
+    first.persist()
+    second.persist()
+
+    reader = MmapVectorStore(path, embeddings)
+    assert sorted(reader.get(ids=["c0", "c1"])["ids"]) == ["c0", "c1"]
+    assert reader.get(ids=["c0"])["documents"] == ["Acme Corp draft"]
+    assert len(reader) == 2
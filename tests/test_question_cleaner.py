@@ -0,0 +1,14 @@
+from utils.question_cleaner import CompanyGazetteer
+
+
+def test_strip_removes_only_whole_word_mentions():
+    gazetteer = CompanyGazetteer(["Co", "Nova"])
+    assert gazetteer.strip("What is the contract cost for Co?") == "What is the contract cost for ?"
+    assert gazetteer.strip("Nova supernova renovation budget") == "supernova renovation budget"
+
+
+def test_strip_drops_a_trailing_with():
+    gazetteer = CompanyGazetteer(["Boli Ai", "Acme Corp"])
+    assert gazetteer.strip("Tell me about our project with boli-ai") == "Tell me about our project"
+    assert gazetteer.strip("acme budget") == "budget"
+    assert gazetteer.strip("Acme Corp") == "Acme Corp"
@@ -0,0 +1,55 @@
+from langchain.vectorstores import Chroma
+from langchain.schema import Document
+from utils.session import use_session
+from service.sessions import new_session_state
+from chains.turn_context import start_turn
+from retrievers.setup import HybridRetriever, passes_relevance_gate
+from retrievers.lexical_index import LexicalIndex
+from benchmarks.fakes import FakeEmbeddings
+from tests.test_turn_context import CountingRetriever
+
+# The dense side ranks "data platform" first; BM25 ranks the rare project ID first
+TEXTS = [
+    "data platform",
+    "data platform roadmap",
+    "PRJ-2041 renewal invoice",
+]
+
+
+def test_lexical_only_hits_carry_no_dense_score():
+    docs = [Document(page_content=text, metadata={"chunk_id": f"c{i}"}) for i, text in enumerate(TEXTS)]
+    ids = [doc.metadata["chunk_id"] for doc in docs]
+    vectorstore = Chroma(collection_name="hybrid_test", embedding_function=FakeEmbeddings())
+    vectorstore.add_documents(docs, ids=ids)
+    lexical_index = LexicalIndex()
+    lexical_index.add_documents(docs, ids)
+
+    retriever = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical_index, k=3, fetch_k=1)
+    results = {doc.page_content: doc.metadata for doc in retriever.get_relevant_documents("data platform PRJ-2041")}
+
+    assert results["data platform"]["score"] > 0
+    assert "score" not in results["PRJ-2041 renewal invoice"]
+    assert results["PRJ-2041 renewal invoice"]["lexical_score"] > 1
+
+
+class LexicalOnlyRetriever(CountingRetriever):
+    def _get_relevant_documents(self, query, *, run_manager):
+        self.calls.append(query)
+        return [Document(page_content="PRJ-2041", metadata={"lexical_score": 12.5})]
+
+
+def gate(retriever, threshold):
+    state = new_session_state(relevance_threshold=threshold)
+    state.retriever = retriever
+    with use_session(state):
+        start_turn()
+        return passes_relevance_gate("PRJ-2041")
+
+
+def test_gate_ignores_lexical_scores():
+    assert not gate(LexicalOnlyRetriever(calls=[]), 0.5)
+
+
+def test_gate_uses_dense_scores():
+    assert gate(CountingRetriever(calls=[]), 0.5)
+    assert not gate(CountingRetriever(calls=[]), 0.95)
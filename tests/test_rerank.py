@@ -0,0 +1,31 @@
+import asyncio
+import pytest
+from langchain.schema import BaseRetriever, Document
+from retrievers.rerank import BudgetedReranker, LexicalOverlapReranker, TimedCompressionRetriever
+
+
+class StaticRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager):
+        return [
+            Document(page_content="Acme Corp data platform migration"),
+            Document(page_content="Boli AI dashboard delivery"),
+            Document(page_content="Acme Corp churn model"),
+        ]
+
+
+def test_budgeted_reranker_requires_a_scorer():
+    with pytest.raises(TypeError):
+        BudgetedReranker()
+
+
+def test_async_retrieval_records_rerank_timings():
+    retriever = TimedCompressionRetriever(
+        base_retriever=StaticRetriever(),
+        base_compressor=LexicalOverlapReranker(top_n=2)
+    )
+    docs = asyncio.run(retriever.aget_relevant_documents("Acme churn"))
+
+    assert docs[0].page_content == "Acme Corp churn model"
+    assert retriever.last_timings["candidates"] == 3
+    assert retriever.last_timings["kept"] == 2
+    assert "rerank_ms" in retriever.last_timings
@@ -0,0 +1,30 @@
+import time
+from tools.result_cache import ResultCache
+
+
+def test_expired_results_are_purged_on_open(tmp_path):
+    path = str(tmp_path / "web_cache.sqlite3")
+    cache = ResultCache(path, ttl_s=60, max_entries=10)
+    cache.set("web_search", "Boli AI funding", ["fresh"])
+    cache.set("web_search", "Acme Corp news", ["stale"])
+    cache._conn.execute(
+        "UPDATE results SET created_at = ? WHERE key = ?", (time.time() - 120, "acme corp news")
+    )
+    cache._conn.commit()
+
+    reopened = ResultCache(path, ttl_s=60, max_entries=10)
+    keys = [key for (key,) in reopened._conn.execute("SELECT key FROM results")]
+    assert keys == ["boli ai funding"]
+    assert reopened.get("web_search", "Boli AI funding?") == ["fresh"]
+
+
+def test_exported_fixtures_serve_offline_runs(tmp_path):
+    path = str(tmp_path / "web_cache.sqlite3")
+    fixtures_dir = str(tmp_path / "fixtures")
+    online = ResultCache(path, ttl_s=60, max_entries=10, fixtures_dir=fixtures_dir)
+    online.cached_call("company_research", "Boli AI", lambda: ["funding round"])
+    assert online.namespaces() == ["company_research"]
+    online.export_fixtures("company_research")
+
+    offline = ResultCache(path, ttl_s=60, max_entries=10, offline=True, fixtures_dir=fixtures_dir)
+    assert offline.cached_call("company_research", "boli ai", lambda: 1 / 0) == ["funding round"]
@@ -0,0 +1,50 @@
+import json
+import pytest
+import retrievers.setup as setup
+from utils import startup
+from utils.session import use_session
+from utils.ingestion_manifest import MANIFEST_FILENAME
+from retrievers.partitions import PARTITION_LAYOUT
+from service.sessions import new_session_state
+from benchmarks.fakes import FakeEmbeddings
+
+
+class FakeHuggingFaceEmbeddings(FakeEmbeddings):
+    built = 0
+
+    def __init__(self, model_name):
+        super().__init__()
+        self.model_name = model_name
+        FakeHuggingFaceEmbeddings.built += 1
+
+
+@pytest.fixture
+def embeddings_caches(monkeypatch):
+    monkeypatch.setattr(setup, "HuggingFaceEmbeddings", FakeHuggingFaceEmbeddings)
+    FakeHuggingFaceEmbeddings.built = 0
+    setup.load_base_embeddings.cache_clear()
+    setup.load_cached_embeddings.cache_clear()
+    yield
+    setup.load_base_embeddings.cache_clear()
+    setup.load_cached_embeddings.cache_clear()
+
+
+def test_session_reuses_the_embeddings_loaded_by_the_warm_up(tmp_path, monkeypatch, embeddings_caches):
+    manifest = {
+        "layout": PARTITION_LAYOUT,
+        "vector_backend": "chroma",
+        "chunking": {"embeddings_model": "huggingface"},
+        "files": {"Acme Corp - Projects.csv": {"company": "Acme Corp", "chunk_ids": ["c0"], "hash": "h"}},
+    }
+    (tmp_path / MANIFEST_FILENAME).write_text(json.dumps(manifest), encoding="utf-8")
+    opened = []
+    monkeypatch.setattr(setup, "get_partitions", lambda persist_dir, embeddings: opened.append(embeddings) or
+                        type("Partitions", (), {"companies": []})())
+
+    startup._warm_up("huggingface", None, str(tmp_path))
+    with use_session(new_session_state(embeddings_model="huggingface", openai_api_key="sk-test")):
+        embeddings = setup.select_embeddings_model()
+
+    assert opened == [embeddings]
+    assert setup.load_cached_embeddings.cache_info().currsize == 1
+    assert FakeHuggingFaceEmbeddings.built == 1
@@ -0,0 +1,69 @@
+import os
+import uuid
+from types import SimpleNamespace
+from langchain.schema import HumanMessage, ChatGeneration, AIMessage, LLMResult
+import utils.tracing as tracing
+from utils.tracing import TracingCallbackHandler, JsonlSpanExporter
+
+
+class FakeSpan:
+    def __init__(self, name):
+        self.name = name
+
+    def to_json(self, indent=None):
+        return '{"name": "%s", "padding": "%s"}' % (self.name, "x" * 100)
+
+
+def llm_result(text, token_usage=None):
+    return LLMResult(
+        generations=[[ChatGeneration(message=AIMessage(content=text))]],
+        llm_output={"token_usage": token_usage} if token_usage else None
+    )
+
+
+def run_llm_call(monkeypatch, result):
+    encoded = []
+
+    def get_encoding(model):
+        encoded.append(model)
+        return SimpleNamespace(encode=str.split)
+    monkeypatch.setattr(tracing, "get_encoding", get_encoding)
+
+    handler = TracingCallbackHandler()
+    run_id = uuid.uuid4()
+    handler.on_chat_model_start(
+        {"kwargs": {"model_name": "gpt-4o"}}, [[HumanMessage(content="What did we deliver for Acme Corp?")]],
+        run_id=run_id
+    )
+    assert encoded == []
+    current = handler._spans[run_id]
+    handler.on_llm_end(result, run_id=run_id)
+    return current.attributes, encoded
+
+
+def test_token_counts_come_from_the_reported_usage(monkeypatch):
+    usage = {"prompt_tokens": 42, "completion_tokens": 7, "total_tokens": 49}
+    attributes, encoded = run_llm_call(monkeypatch, llm_result("A data platform.", usage))
+    assert attributes["llm.prompt_tokens"] == 42 and attributes["llm.completion_tokens"] == 7
+    assert attributes["llm.tokens_estimated"] is False
+    assert encoded == []
+
+
+def test_streamed_calls_without_usage_are_estimated_at_the_end(monkeypatch):
+    attributes, encoded = run_llm_call(monkeypatch, llm_result("A data platform."))
+    assert attributes["llm.tokens_estimated"] is True
+    assert attributes["llm.prompt_tokens"] > 0 and attributes["llm.completion_tokens"] > 0
+    assert encoded
+
+
+def test_span_file_is_rotated_at_max_bytes(tmp_path):
+    path = str(tmp_path / "spans.jsonl")
+    exporter = JsonlSpanExporter(path, max_bytes=500, backups=2)
+    for i in range(20):
+        exporter.export([FakeSpan(f"span-{i}")])
+
+    assert sorted(os.listdir(tmp_path)) == ["spans.jsonl", "spans.jsonl.1", "spans.jsonl.2"]
+    for name in os.listdir(tmp_path):
+        assert os.path.getsize(tmp_path / name) < 500 + 200
+    with open(path, encoding="utf-8") as f:
+        assert "span-19" in f.read()
@@ -0,0 +1,100 @@
+import time
+import asyncio
+import threading
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from langchain.schema import BaseRetriever, Document
+from utils.session import use_session
+from service.sessions import new_session_state
+from chains.turn_context import start_turn, TurnContext, TurnMemoRetriever
+from retrievers.setup import passes_relevance_gate
+from tools.internal_lookup import _internal_lookup
+
+
+class CountingRetriever(BaseRetriever):
+    calls: List[str] = []
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        self.calls.append(query)
+        return [Document(page_content="Acme Corp data platform migration in 2021", metadata={"score": 0.9})]
+
+
+def session_with(retriever):
+    state = new_session_state(relevance_threshold=0.5)
+    state.retriever = retriever
+    return state
+
+
+def test_chain_reuses_the_relevance_gate_retrieval():
+    retriever = CountingRetriever(calls=[])
+    state = session_with(retriever)
+    with use_session(state):
+        start_turn()
+        assert passes_relevance_gate("What did we build for Acme Corp?")
+        docs = TurnMemoRetriever(retriever=retriever, session=state).get_relevant_documents(
+            "what did we build for acme corp"
+        )
+    assert len(retriever.calls) == 1
+    assert docs[0].page_content.startswith("Acme Corp")
+    assert state.turn_context.saved_retriever_calls == 1
+
+
+def test_each_turn_retrieves_again():
+    retriever = CountingRetriever(calls=[])
+    state = session_with(retriever)
+    with use_session(state):
+        for _ in range(2):
+            start_turn()
+            passes_relevance_gate("What did we build for Acme Corp?")
+    assert len(retriever.calls) == 2
+
+
+def test_lookup_skips_the_gate_when_the_turn_already_has_the_answer():
+    retriever = CountingRetriever(calls=[])
+    state = session_with(retriever)
+    state.chain = object()
+    with use_session(state):
+        turn_context = start_turn()
+        # As if the router's RAG chain call had answered it
+        turn_context.results["what did we build for acme corp"] = {"answer": "A data platform."}
+        turn_context._costs["what did we build for acme corp"] = 1
+        assert _internal_lookup("What did we build for Acme Corp?") == "A data platform."
+    assert retriever.calls == []
+
+
+class SlowChain:
+    memory = None
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def invoke(self, inputs, config=None):
+        self.calls.append(inputs["question"])
+        self.started.set()
+        self.release.wait(5)
+        return {"answer": inputs["question"]}
+
+    async def ainvoke(self, inputs, config=None):
+        self.calls.append(inputs["question"])
+        return {"answer": inputs["question"]}
+
+
+def test_sync_and_async_calls_share_one_chain_run():
+    chain = SlowChain()
+    turn_context = TurnContext()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        owner = pool.submit(turn_context.invoke_chain, chain, "What did we build for Acme Corp?")
+        assert chain.started.wait(5)
+        # Another query is not held up by the call in flight
+        assert asyncio.run(turn_context.ainvoke_chain(chain, "Boli AI renewal"))["answer"] == "Boli AI renewal"
+        waiter = pool.submit(asyncio.run, turn_context.ainvoke_chain(chain, "what did we build for acme corp"))
+        while not turn_context.saved_llm_calls:
+            time.sleep(0.01)
+        assert not owner.done()
+        chain.release.set()
+        assert owner.result(5) == waiter.result(5) == {"answer": "What did we build for Acme Corp?"}
+    assert chain.calls == ["What did we build for Acme Corp?", "Boli AI renewal"]
+    assert turn_context.chain_calls == 2
+    assert turn_context.saved_llm_calls == 1
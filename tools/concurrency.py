@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import contextvars
+
+
+def with_timeout(coroutine_fn, timeout, tool_name):
+    """
+    Wraps an async tool so a slow call returns a short notice instead of blocking the turn.
+    """
+    async def run(*args, **kwargs):
+        try:
+            return await asyncio.wait_for(coroutine_fn(*args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            return f"{tool_name} did not answer within {timeout:.0f}s; no result from this source."
+    return run
+
+
+def run_async(coroutine):
+    """
+    Runs a coroutine to completion from synchronous code (e.g. the Streamlit script thread).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    # Already inside an event loop: run on a private loop in a helper thread,
+    # carrying over context variables (e.g. the bound API session)
+    result = {}
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            result["value"] = context.run(asyncio.run, coroutine)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
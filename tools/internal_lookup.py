@@ -1,18 +1,98 @@
-import streamlit as st
+import asyncio
+import threading
+from concurrent.futures import Future
+from utils.session import get_state
+from chains.turn_context import invoke_rag_chain, ainvoke_rag_chain, normalize_query, get_turn_context
+from retrievers.setup import passes_relevance_gate, apasses_relevance_gate
+
+FALLBACK_PHRASES = [
+    "no relevant", "i do not know", "context does not",
+    "i'm sorry", "not found", "not enough info", "cannot provide"
+]
+
+def filter_internal_answer(answer):
+    """Replaces non-answers from the RAG chain with a clear 'no data' message."""
+    if any(phrase in answer.lower() for phrase in FALLBACK_PHRASES):
+        return "No relevant internal data found."
+    return answer
+
+class SharedLookups:
+    """
+    Internal lookup results shared by the sessions of a batch run. The first prompt about a
+    company runs the lookup; concurrent and later prompts with the same (normalized) query wait
+    for and reuse that result. Failed lookups are not kept.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _claim(self, query):
+        key = normalize_query(query)
+        with self._lock:
+            future = self._results.get(key)
+            if future is not None:
+                self.hits += 1
+                return key, future, False
+            future = self._results[key] = Future()
+            self.misses += 1
+            return key, future, True
+
+    def _fail(self, key, future, error):
+        with self._lock:
+            self._results.pop(key, None)
+        future.set_exception(error)
+
+    def get(self, query, lookup):
+        key, future, owner = self._claim(query)
+        if owner:
+            try:
+                future.set_result(lookup(query))
+            except Exception as e:
+                self._fail(key, future, e)
+        return future.result()
+
+    async def aget(self, query, alookup):
+        key, future, owner = self._claim(query)
+        if owner:
+            try:
+                future.set_result(await alookup(query))
+            except Exception as e:
+                self._fail(key, future, e)
+        return await asyncio.wrap_future(future)
 
 def safe_internal_lookup(query):
     """RAG-based lookup tool with hallucination filtering."""
-    if not st.session_state.chain:
+    shared = get_state().get("shared_lookups")
+    if shared is not None:
+        return shared.get(query, _internal_lookup)
+    return _internal_lookup(query)
+
+def _internal_lookup(query):
+    if not get_state().chain:
         return "Internal knowledge base is not loaded."
 
-    result = st.session_state.chain.invoke({"question": query})
-    answer = result.get("answer", "")
+    # Nothing relevant retrieved: don't pay for a RAG answer (unless this turn already has it)
+    if not get_turn_context().has_result(query) and not passes_relevance_gate(query):
+        return "No relevant internal data found."
+
+    result = invoke_rag_chain(query)
+    return filter_internal_answer(result.get("answer", ""))
 
-    fallback_phrases = [
-        "no relevant", "i do not know", "context does not",
-        "i'm sorry", "not found", "not enough info", "cannot provide"
-    ]
+async def asafe_internal_lookup(query):
+    """Async counterpart of safe_internal_lookup for concurrent tool execution."""
+    shared = get_state().get("shared_lookups")
+    if shared is not None:
+        return await shared.aget(query, _ainternal_lookup)
+    return await _ainternal_lookup(query)
 
-    if any(phrase in answer.lower() for phrase in fallback_phrases):
+async def _ainternal_lookup(query):
+    if not get_state().chain:
+        return "Internal knowledge base is not loaded."
+
+    if not get_turn_context().has_result(query) and not await apasses_relevance_gate(query):
         return "No relevant internal data found."
-    return answer
\ No newline at end of file
+
+    result = await ainvoke_rag_chain(query)
+    return filter_internal_answer(result.get("answer", ""))
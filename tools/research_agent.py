@@ -1,6 +1,7 @@
-import streamlit as st
+from utils.session import get_secret
 from langchain.tools import Tool
-from langchain.tools.tavily_search import TavilySearchResults
+from utils.registry import registry, get_search_tool
+from tools.result_cache import get_result_cache, force_web_refresh, is_search_result
 
 def get_company_research_prompt(company_name: str) -> str:
     return f"""
@@ -39,10 +40,35 @@ Company Name: {company_name}
 """
 
 def create_company_research_tool():
-    tavily = TavilySearchResults(tavily_api_key=st.secrets["TAVILY_API_KEY"])
+    tavily_api_key = get_secret("TAVILY_API_KEY")
 
-    return Tool(
-        name="company_research_web_agent",
-        description="Conduct detailed web research on a company for basic info, financials, leadership, and digital presence.",
-        func=lambda company_name: tavily.run(get_company_research_prompt(company_name)),
-    )
\ No newline at end of file
+    def build():
+        tavily = get_search_tool(tavily_api_key)
+
+        # Research prompt is a fixed template per company: cache by company name
+        def research(company_name):
+            return get_result_cache().cached_call(
+                "company_research",
+                company_name,
+                lambda: tavily.run(get_company_research_prompt(company_name)),
+                refresh=force_web_refresh(),
+                cache_if=is_search_result
+            )
+
+        async def aresearch(company_name):
+            return await get_result_cache().acached_call(
+                "company_research",
+                company_name,
+                lambda: tavily.arun(get_company_research_prompt(company_name)),
+                refresh=force_web_refresh(),
+                cache_if=is_search_result
+            )
+
+        return Tool(
+            name="company_research_web_agent",
+            description="Conduct detailed web research on a company for basic info, financials, leadership, and digital presence.",
+            func=research,
+            coroutine=aresearch,
+        )
+
+    return registry.get("company_research_tool", tavily_api_key, build)
\ No newline at end of file
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import argparse
+import time
+import sqlite3
+import threading
+from utils.session import get_state
+from chains.turn_context import normalize_query
+from utils.registry import registry
+from utils.config import (
+    WEB_CACHE_PATH,
+    WEB_CACHE_TTL_S,
+    WEB_CACHE_MAX_ENTRIES,
+    OFFLINE_MODE,
+    FIXTURES_DIR
+)
+
+
+class ResultCache:
+    """
+    Persistent TTL cache for web search and company research results, keyed by
+    (namespace, normalized query or company name). Oldest entries are evicted past max_entries,
+    and expired ones are purged whenever the cache is opened.
+
+    In offline mode results come only from the fixture store (FIXTURES_DIR/<namespace>.json,
+    a {normalized key: result} map) and the network is never called. export_fixtures records
+    the store from results cached by online runs.
+    """
+    def __init__(self, path, ttl_s, max_entries, offline=False, fixtures_dir=FIXTURES_DIR):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.offline = offline
+        self.fixtures_dir = fixtures_dir
+        self.hits = 0
+        self.misses = 0
+        self._fixtures = {}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON results (created_at)")
+        self._conn.commit()
+        self.purge_expired()
+
+    def get(self, namespace, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM results WHERE namespace = ? AND key = ?",
+                (namespace, normalize_query(key))
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_s:
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                (namespace, normalize_query(key), json.dumps(value), time.time())
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM results WHERE rowid IN "
+                    "(SELECT rowid FROM results ORDER BY created_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl_s,))
+            self._conn.commit()
+
+    def load_fixture(self, namespace, key):
+        if namespace not in self._fixtures:
+            path = os.path.join(self.fixtures_dir, f"{namespace}.json")
+            fixtures = {}
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    fixtures = {normalize_query(k): v for k, v in json.load(f).items()}
+            self._fixtures[namespace] = fixtures
+        return self._fixtures[namespace].get(
+            normalize_query(key),
+            f"[offline] No recorded result for '{key}'."
+        )
+
+    def namespaces(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT namespace FROM results ORDER BY namespace")]
+
+    def export_fixtures(self, namespace):
+        """
+        Writes the unexpired cached results of a namespace to the fixture store, for offline runs.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM results WHERE namespace = ? AND created_at >= ?",
+                (namespace, time.time() - self.ttl_s)
+            ).fetchall()
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+        path = os.path.join(self.fixtures_dir, f"{namespace}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({key: json.loads(value) for key, value in rows}, f, indent=2, sort_keys=True)
+        return path
+
+    def cached_call(self, namespace, key, fn, refresh=False, cache_if=bool):
+        """
+        Returns the cached result for key, or calls fn() and caches it. refresh=True bypasses the cache.
+        Results for which cache_if(result) is false (e.g. error strings) are returned but not stored.
+        """
+        if self.offline:
+            return self.load_fixture(namespace, key)
+        if not refresh:
+            cached = self.get(namespace, key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+        self.misses += 1
+        value = fn()
+        if cache_if(value):
+            self.set(namespace, key, value)
+        return value
+
+    async def acached_call(self, namespace, key, coroutine_fn, refresh=False, cache_if=bool):
+        """
+        Async variant of cached_call; coroutine_fn() is awaited on a miss.
+        """
+        if self.offline:
+            return self.load_fixture(namespace, key)
+        if not refresh:
+            cached = self.get(namespace, key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+        self.misses += 1
+        value = await coroutine_fn()
+        if cache_if(value):
+            self.set(namespace, key, value)
+        return value
+
+
+def is_search_result(value):
+    """
+    Tavily returns a list of results on success and an error string on failure.
+    """
+    return isinstance(value, list) and len(value) > 0
+
+
+def force_web_refresh():
+    """
+    True when the user asked to bypass cached web results for this session.
+    """
+    return get_state().get("refresh_web_results", False)
+
+
+def get_result_cache():
+    """
+    Process-wide web result cache for the configured path, TTL and size.
+    """
+    key = (WEB_CACHE_PATH, WEB_CACHE_TTL_S, WEB_CACHE_MAX_ENTRIES, OFFLINE_MODE)
+    return registry.get(
+        "web_result_cache",
+        key,
+        lambda: ResultCache(WEB_CACHE_PATH, WEB_CACHE_TTL_S, WEB_CACHE_MAX_ENTRIES, offline=OFFLINE_MODE)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Records cached web results as offline fixtures.")
+    parser.add_argument("namespaces", nargs="*", help="Namespaces to export (default: all cached ones)")
+    args = parser.parse_args()
+
+    cache = ResultCache(WEB_CACHE_PATH, WEB_CACHE_TTL_S, WEB_CACHE_MAX_ENTRIES)
+    for namespace in args.namespaces or cache.namespaces():
+        print(f"{namespace} → {cache.export_fixtures(namespace)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
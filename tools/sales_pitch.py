@@ -1,16 +1,11 @@
-from langchain.chat_models import ChatOpenAI
-from tools.internal_lookup import safe_internal_lookup
-import streamlit as st
+from utils.registry import get_chat_llm
+from tools.internal_lookup import safe_internal_lookup, asafe_internal_lookup
+from chains.turn_context import get_turn_callbacks
+from utils.session import get_state
 
 
-def generate_sales_pitch(company_name: str) -> str:
-    # Try to get internal knowledge from the retriever first
-    try:
-        internal_summary = safe_internal_lookup(f"What do we know about {company_name}?")
-    except:
-        internal_summary = "No internal data available."
-
-    prompt = f"""
+def build_sales_pitch_prompt(company_name: str, internal_summary: str) -> str:
+    return f"""
         You are preparing a 3-slide sales pitch for {company_name}.
         Optionally uses a reference company (e.g., a known project) as inspiration.
 
@@ -28,10 +23,33 @@ def generate_sales_pitch(company_name: str) -> str:
         Always include tool outputs in the final answer.
         """
 
-    llm = ChatOpenAI(
-        api_key=st.session_state.openai_api_key,
-        model='gpt-4o',
+def get_pitch_llm():
+    return get_chat_llm(
+        model="gpt-4o",
+        api_key=get_state().openai_api_key,
         temperature=0.1,
-        model_kwargs={"top_p": st.session_state.top_p},
+        top_p=get_state().top_p,
+        streaming=get_state().get("stream_responses", False)
     )
-    return "### 🧾 Sales Proposal\n\n" + llm.invoke(prompt).content
\ No newline at end of file
+
+def generate_sales_pitch(company_name: str) -> str:
+    # Try to get internal knowledge from the retriever first
+    try:
+        internal_summary = safe_internal_lookup(f"What do we know about {company_name}?")
+    except:
+        internal_summary = "No internal data available."
+
+    prompt = build_sales_pitch_prompt(company_name, internal_summary)
+    response = get_pitch_llm().invoke(prompt, config={"callbacks": get_turn_callbacks()})
+    return "### 🧾 Sales Proposal\n\n" + response.content
+
+async def agenerate_sales_pitch(company_name: str) -> str:
+    """Async counterpart of generate_sales_pitch."""
+    try:
+        internal_summary = await asafe_internal_lookup(f"What do we know about {company_name}?")
+    except:
+        internal_summary = "No internal data available."
+
+    prompt = build_sales_pitch_prompt(company_name, internal_summary)
+    response = await get_pitch_llm().ainvoke(prompt, config={"callbacks": get_turn_callbacks()})
+    return "### 🧾 Sales Proposal\n\n" + response.content
@@ -1,13 +1,45 @@
-import streamlit as st
-from langchain.chat_models import ChatOpenAI
+from utils.session import get_state
+from utils.registry import get_chat_llm, get_search_tool
+from tools.result_cache import get_result_cache, force_web_refresh, is_search_result
+from chains.turn_context import get_turn_callbacks
+
+def create_cached_web_search(tavily_api_key):
+    """
+    Returns (search, asearch): Tavily search backed by the persistent web result cache.
+    """
+    search_tool = get_search_tool(tavily_api_key)
+
+    def search(query):
+        return get_result_cache().cached_call(
+            "web_search",
+            query,
+            lambda: search_tool.run(query),
+            refresh=force_web_refresh(),
+            cache_if=is_search_result
+        )
+
+    async def asearch(query):
+        return await get_result_cache().acached_call(
+            "web_search",
+            query,
+            lambda: search_tool.arun(query),
+            refresh=force_web_refresh(),
+            cache_if=is_search_result
+        )
+
+    return search, asearch
+
+def get_direct_llm():
+    return get_chat_llm(
+        model=get_state().selected_model,
+        api_key=get_state().openai_api_key,
+        temperature=get_state().temperature,
+        top_p=get_state().top_p,
+        max_tokens=get_state().max_tokens,
+        streaming=get_state().get("stream_responses", False)
+    )
 
 def get_direct_llm_response(prompt):
     """Fallback to direct LLM response (no retrieval)."""
-    llm = ChatOpenAI(
-        api_key=st.session_state.openai_api_key,
-        model=st.session_state.selected_model,
-        temperature=st.session_state.temperature,
-        max_tokens=st.session_state.max_tokens,
-        model_kwargs={"top_p": st.session_state.top_p},
-    )
-    return llm.invoke(prompt).content
\ No newline at end of file
+    llm = get_direct_llm()
+    return llm.invoke(prompt, config={"callbacks": get_turn_callbacks()}).content
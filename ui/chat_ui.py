@@ -1,7 +1,25 @@
 print("✅ chat_ui.py loaded")
+import time
 import streamlit as st
 from ui.sidebar import sidebar_and_documentChooser
-from utils.llm_handler import get_response_from_LLM
+from ui.streaming import ChatStreamRenderer
+from utils.startup import profile, lazy_import, start_warmup
+from utils.ingestion_manifest import manifest_summary
+from utils.config import CHROMA_PATH
+
+def attach_saved_index():
+    """
+    Assembles the session's RAG chain from the index persisted by an earlier run (no re-upload,
+    no re-embedding), once per embeddings model selection. The saved index is only used when it
+    was built with the selected embeddings model.
+    """
+    state = st.session_state
+    if state.get("chain") is not None or state.get("saved_index_checked") == state.embeddings_model:
+        return
+    state.saved_index_checked = state.embeddings_model
+    summary = manifest_summary(CHROMA_PATH)
+    if summary and summary["embeddings_model"] == state.embeddings_model:
+        lazy_import("service.assistant").attach_existing_index(state)
 
 def chatbot():
     st.title("🤖 EffectiveSoft Sales Assistant")
@@ -9,6 +27,9 @@ def chatbot():
     # Sidebar upload and config
     sidebar_and_documentChooser()
 
+    # Agents, LangChain, Chroma and the embeddings model load in the background meanwhile
+    start_warmup(st.session_state.embeddings_model, st.session_state.openai_api_key)
+
     # Initialize message history
     if "messages" not in st.session_state:
         st.session_state.messages = []
@@ -23,13 +44,31 @@ def chatbot():
         st.chat_message("user").markdown(prompt)
         st.session_state.messages.append({"role": "user", "content": prompt})
 
-        # Call the full fallback logic from handler
-        answer, sources, source_type = get_response_from_LLM(prompt)
-
         # Display assistant response
         with st.chat_message("assistant"):
             st.markdown("### 🤖 Answer")
+
+            # Call the full fallback logic from handler, streaming tokens and tool events
+            callbacks = []
+            if st.session_state.get("stream_responses"):
+                renderer = ChatStreamRenderer()
+                stream_handler = lazy_import("utils.streaming").StreamEventHandler(renderer)
+                callbacks.append(stream_handler)
+
+            started_at = time.perf_counter()
+            attach_saved_index()
+            ask = lazy_import("service.assistant").ask
+            answer, sources, source_type = ask(st.session_state, prompt, callbacks=callbacks)
+            profile.record("latency", "first_response", (time.perf_counter() - started_at) * 1000)
+            profile.mark("first_response")
+
+            if callbacks:
+                renderer.finish()
             st.markdown(answer)
+            if st.session_state.get("answer_cache_hit"):
+                st.caption("⚡ Served from the semantic answer cache")
+            elif callbacks and stream_handler.time_to_first_token is not None:
+                st.caption(f"⚡ First token after {stream_handler.time_to_first_token:.1f}s")
 
             # Show source docs if available
         if source_type:
@@ -41,5 +80,19 @@ def chatbot():
             readable_label = label_map.get(source_type, source_type.capitalize())
             st.markdown(f"#### 📚 Source: **{readable_label}**")
 
+        # Show how much work the per-turn RAG memo saved
+        turn_context = st.session_state.get("turn_context")
+        if turn_context and turn_context.saved_retriever_calls:
+            report = turn_context.report()
+            st.caption(
+                f"♻️ RAG chain ran {report['rag_chain_calls']}x this turn; reuse saved "
+                f"{report['saved_retriever_calls']} retriever and {report['saved_llm_calls']} LLM calls."
+            )
+
         # Save assistant reply in history
-        st.session_state.messages.append({"role": "assistant", "content": answer})
\ No newline at end of file
+        st.session_state.messages.append({"role": "assistant", "content": answer})
+
+    profile.mark("first_render")
+
+    # After the page is drawn: reopen the persisted index so the first question needs no rebuild
+    attach_saved_index()
@@ -1,10 +1,17 @@
+import os
 import streamlit as st
-from utils.config import OPENAI_API_KEY, TAVILY_API_KEY
-from utils.file_loader import delte_temp_files
-from chains.rag_chain import create_vectorstore_from_uploaded_documents, chain_RAG_blocks
-from retrievers.setup import select_embeddings_model
-from memory.memory import create_memory
-from langchain.chat_models import ChatOpenAI
+from utils.config import (
+    OPENAI_API_KEY,
+    TAVILY_API_KEY,
+    INGEST_WORKERS,
+    RELEVANCE_THRESHOLD,
+    SUMMARY_MODEL,
+    DEFERRED_SUMMARY,
+    CHROMA_PATH
+)
+from utils.ingestion_manifest import manifest_summary, has_legacy_index
+from utils.registry import registry
+from utils.startup import profile, lazy_import
 
 def sidebar_and_documentChooser():
     st.sidebar.title("⚙️ Settings")
@@ -22,6 +29,20 @@ def sidebar_and_documentChooser():
         "Model", ["gpt-4o", "gpt-3.5-turbo"]
     )
 
+    # Conversation summaries can use a cheaper model and run in the background
+    summary_options = ["same as answer model", "gpt-3.5-turbo", "gpt-4"]
+    if SUMMARY_MODEL and SUMMARY_MODEL not in summary_options:
+        summary_options.append(SUMMARY_MODEL)
+    summary_model = st.sidebar.selectbox(
+        "Summary Model",
+        summary_options,
+        index=summary_options.index(SUMMARY_MODEL) if SUMMARY_MODEL else 0
+    )
+    st.session_state.summary_model = None if summary_model == "same as answer model" else summary_model
+    st.session_state.deferred_summary = st.sidebar.checkbox(
+        "Summarize memory in background", value=DEFERRED_SUMMARY
+    )
+
     # ✅ NEW: Embedding model selector
     st.session_state.embeddings_model = st.sidebar.selectbox(
         "Embedding Model", ["openai", "huggingface"], index=0
@@ -30,9 +51,28 @@ def sidebar_and_documentChooser():
     st.session_state.temperature = st.sidebar.slider("Temperature", 0.0, 1.0, 0.3)
     st.session_state.max_tokens = st.sidebar.slider("Max Tokens", 256, 4096, 1024)
     st.session_state.top_p = st.sidebar.slider("Top P", 0.1, 1.0, 1.0)
+    st.session_state.stream_responses = st.sidebar.toggle("Stream Responses", value=True)
+    st.session_state.refresh_web_results = st.sidebar.checkbox(
+        "Force refresh web results", value=False
+    )
+    st.session_state.use_answer_cache = st.sidebar.checkbox(
+        "Semantic answer cache", value=True
+    )
+    st.session_state.relevance_threshold = st.sidebar.slider(
+        "Relevance Threshold", 0.0, 1.0, RELEVANCE_THRESHOLD
+    )
+
+    st.session_state.reranker = st.sidebar.selectbox(
+        "Reranker", ["lexical", "cross-encoder", "none"], index=0
+    )
 
     st.sidebar.markdown("---")
 
+    # Parallel ingestion: number of processes used to parse and chunk uploads
+    st.session_state.ingest_workers = st.sidebar.slider(
+        "Ingestion Workers", 1, max(os.cpu_count() or 1, INGEST_WORKERS), INGEST_WORKERS
+    )
+
     # Upload multiple files
     uploaded_files = st.sidebar.file_uploader(
         "Upload documents", 
@@ -41,7 +81,7 @@ def sidebar_and_documentChooser():
     )
 
     if uploaded_files:
-        delte_temp_files()
+        lazy_import("utils.file_loader").delte_temp_files()
         uploaded_paths = []
         for uploaded_file in uploaded_files:
             temp_path = f"data/tmp/{uploaded_file.name}"
@@ -52,30 +92,151 @@ def sidebar_and_documentChooser():
         
         st.session_state.uploaded_file_paths = uploaded_paths
 
+    # What the persisted index already contains (reopened automatically, no rebuild needed)
+    render_index_panel()
+
     # Button to build vectorstore and RAG chain
     if st.sidebar.button("🛠️ Build Vectorstore"):
-        vectorstore = create_vectorstore_from_uploaded_documents()
+        progress = st.sidebar.progress(0.0, text="Indexing documents...")
+        vectorstore = lazy_import("service.assistant").index_documents(
+            st.session_state,
+            st.session_state.get("uploaded_file_paths", []),
+            on_progress=lambda fraction, text: progress.progress(min(fraction, 1.0), text=text)
+        )
         if vectorstore:
-            st.session_state.retriever = vectorstore.as_retriever(search_kwargs={"k": 10})
-
-            # Build LLM
-            llm = ChatOpenAI(
-                model=st.session_state.selected_model,
-                api_key=st.session_state.openai_api_key,
-                temperature=st.session_state.temperature,
-                max_tokens=st.session_state.max_tokens,
-                model_kwargs={"top_p": st.session_state.top_p}
+            st.sidebar.success("✅ RAG chain is ready!")
+
+    # Per-stage timings of the last retrieval (retrieve wide → rerank)
+    last_timings = getattr(st.session_state.get("retriever"), "last_timings", None)
+    if last_timings:
+        with st.sidebar.expander("🔬 Last retrieval"):
+            st.caption(
+                f"Retrieve {last_timings['retrieve_ms']:.0f} ms ({last_timings['candidates']} candidates) → "
+                f"rerank {last_timings['rerank_ms']:.0f} ms ({last_timings['kept']} kept, "
+                f"{last_timings['context_tokens']} context tokens)"
             )
 
-            # Build memory
-            memory = create_memory(
-                model_name=st.session_state.selected_model,
-                api_key=st.session_state.openai_api_key
+    # Semantic answer cache statistics (shared by all sessions using this embedding model)
+    answer_caches = registry.instances("answer_cache")
+    if answer_caches:
+        with st.sidebar.expander("⚡ Answer cache"):
+            for cache in answer_caches:
+                report = cache.report()
+                st.caption(
+                    f"Hit rate {report['hit_rate']:.0%} ({report['hits']}/{report['hits'] + report['misses']}), "
+                    f"{report['entries']} entries, ~{report['latency_saved_s']:.0f}s saved"
+                )
+
+    # Process-wide LLM gateway: queueing, retries and coalesced duplicate prompts
+    for gateway in registry.instances("llm_gateway"):
+        report = gateway.report()
+        with st.sidebar.expander("🚦 LLM gateway"):
+            st.caption(
+                f"{report['upstream_calls']} API calls for {report['requests']} requests "
+                f"({report['coalesced']} coalesced), {report['retries']} retries "
+                f"({report['throttled']} throttled), {report['errors']} errors"
+            )
+            st.caption(
+                f"Queue {report['avg_queue_ms']:.0f} ms avg / {report['max_queue_ms']:.0f} ms max, "
+                f"{report['in_flight']} in flight"
             )
 
-            # Build the full chain
-            st.session_state.chain = chain_RAG_blocks(llm, st.session_state.retriever, memory)
-            st.sidebar.success("✅ RAG chain is ready!")
+    # Per-stage waterfall of recent turns and ingestions
+    render_trace_panel()
+
+    if profile.enabled:
+        render_startup_panel()
+
+def render_index_panel():
+    """
+    Companies and files in the persisted index, and whether this session can use it.
+    """
+    if has_legacy_index(CHROMA_PATH):
+        st.sidebar.warning(
+            "📚 The saved index was built by an older version and cannot be reopened. "
+            "Upload its documents again and build the vectorstore: the build deletes the old index."
+        )
+        return
+    summary = manifest_summary(CHROMA_PATH)
+    if not summary:
+        return
+    label = f"📚 Saved index · {len(summary['companies'])} companies, {summary['files']} files"
+    with st.sidebar.expander(label):
+        if summary["embeddings_model"] != st.session_state.embeddings_model:
+            st.warning(
+                f"Built with {summary['embeddings_model']} embeddings: select them to use it, or rebuild."
+            )
+        elif st.session_state.get("chain") is not None:
+            st.caption("✅ Attached to this session")
+        for company, entry in summary["companies"].items():
+            st.caption(f"**{company}** · {entry['chunks']} chunks · {', '.join(entry['files'])}")
+        files = sorted(name for entry in summary["companies"].values() for name in entry["files"])
+        removed = st.multiselect("Remove documents", files, key="removed_documents")
+        if removed and st.button("🗑️ Remove from index"):
+            lazy_import("service.assistant").index_documents(st.session_state, [], removed_files=removed)
+
+def render_startup_panel():
+    """
+    Cold-start timings of this process (STARTUP_PROFILE=1): lazy imports, warm-up steps, milestones.
+    """
+    report = profile.report()
+    with st.sidebar.expander("🚀 Startup"):
+        for group, label in (("milestones", "since start"), ("imports", "import"), ("warmup", "warm-up"),
+                             ("latency", "latency")):
+            for name, duration_ms in report[group].items():
+                st.caption(f"{name} ({label}): {duration_ms:.0f} ms")
+
+def render_trace_panel():
+    """
+    Collapsible per-run waterfall (turns and ingestions) plus running totals for the session.
+    """
+    history = st.session_state.get("trace_history")
+    if not history:
+        return
+
+    alt = lazy_import("altair")
+    with st.sidebar.expander("⏱️ Traces"):
+        runs = list(reversed(history))
+        labels = [
+            f"{run['name']} · {run['duration_ms'] / 1000:.1f}s"
+            + (f" · {run['attributes']['route']}" if run["attributes"].get("route") else "")
+            for run in runs
+        ]
+        selected = st.selectbox("Run", range(len(runs)), format_func=lambda i: labels[i])
+        run = runs[selected]
+
+        # One bar per span, in start order; the label index keeps repeated span names on separate rows
+        data = [
+            dict(
+                row,
+                end_ms=row["start_ms"] + row["duration_ms"],
+                label=f"{i:02d} {'· ' * row['depth']}{row['name']}"
+            )
+            for i, row in enumerate(run["rows"])
+        ]
+        chart = alt.Chart(alt.Data(values=data)).mark_bar().encode(
+            x=alt.X("start_ms:Q", title="ms since start"),
+            x2="end_ms:Q",
+            y=alt.Y("label:N", sort=None, title=None),
+            color=alt.Color("stage:N", legend=None),
+            tooltip=["name:N", "stage:N", alt.Tooltip("duration_ms:Q", format=".1f")]
+        )
+        st.altair_chart(chart, use_container_width=True)
+        st.caption(
+            f"{run['llm_calls']} LLM calls ({run['prompt_tokens']} prompt / "
+            f"{run['completion_tokens']} completion tokens), {run['tool_calls']} tool calls"
+        )
+
+        for name, totals in st.session_state.get("trace_totals", {}).items():
+            stage_ms = ", ".join(
+                f"{stage} {duration_ms / 1000:.1f}s"
+                for stage, duration_ms in sorted(totals["stage_ms"].items(), key=lambda item: -item[1])
+            )
+            st.caption(
+                f"**{name}** × {totals['runs']}: {totals['duration_ms'] / 1000:.1f}s total, "
+                f"{totals['llm_calls']} LLM calls, {totals['prompt_tokens'] + totals['completion_tokens']} tokens, "
+                f"{totals['tool_calls']} tool calls — {stage_ms}"
+            )
 
 def clear_chat_history():
     st.session_state.chat_history = []
@@ -0,0 +1,28 @@
+import streamlit as st
+
+
+class ChatStreamRenderer:
+    """
+    Sink for StreamEventHandler: renders status lines and the token preview incrementally
+    inside the current chat message.
+    """
+    def __init__(self):
+        self.status = st.empty()
+        self.preview = st.empty()
+        self.text = ""
+
+    def __call__(self, event):
+        if event["type"] == "llm_start":
+            self.text = ""
+        elif event["type"] == "token":
+            self.text += event["text"]
+            self.preview.markdown(self.text + "▌")
+        elif event["type"] == "status":
+            self.status.caption(event["text"])
+
+    def finish(self):
+        """
+        Clears the live preview once the final answer is rendered.
+        """
+        self.status.empty()
+        self.preview.empty()
@@ -0,0 +1,158 @@
+import re
+import zlib
+import hashlib
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+")
+DIGIT_PATTERN = re.compile(r"\d")
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+def normalize_chunk(text):
+    """
+    Lowercased words without punctuation or extra whitespace. Numbers are kept: chunks differing
+    only in an amount, a date or an ID carry different facts.
+    E.g., "ACME Corp — Invoice  INV-2041" → "acme corp invoice inv 2041"
+    """
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def numeric_tokens(normalized):
+    """
+    Tokens of a normalized chunk that contain a digit (amounts, dates, IDs, codes).
+    """
+    return frozenset(token for token in normalized.split() if DIGIT_PATTERN.search(token))
+
+
+def source_reference(doc):
+    """
+    Where a chunk came from: source file plus page (PDF) or row (CSV).
+    """
+    return {
+        key: doc.metadata[key]
+        for key in ("source_file", "page", "row")
+        if doc.metadata.get(key) is not None
+    }
+
+
+class ChunkDeduplicator:
+    """
+    Keeps one representative of each group of exact or near-duplicate chunks, per company.
+    Exact duplicates share the hash of their normalized text; near duplicates are found with
+    MinHash signatures of word shingles, bucketed by LSH bands and confirmed when the estimated
+    Jaccard similarity reaches threshold and both chunks contain the same numbers, so only
+    boilerplate wording may differ (rows or invoices differing by an amount or ID are all kept).
+    Every dropped chunk is kept as a back-reference (source file, page/row) on its representative.
+    """
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=3, seed=1):
+        rng = np.random.default_rng(seed)
+        # 32-bit shingle hashes times 32-bit coefficients stay below 2^64
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self._companies = {}
+
+    def settings(self):
+        """
+        What decides which chunks are dropped; stored in the chunking signature so a change re-indexes.
+        """
+        return {
+            "threshold": self.threshold,
+            "num_perm": len(self._a),
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "numbers": "kept",
+        }
+
+    def _company(self, company):
+        return self._companies.setdefault(company, {
+            "exact": {}, "signatures": {}, "numbers": {}, "buckets": {}, "references": {}
+        })
+
+    def _signature(self, normalized):
+        words = normalized.split()
+        if len(words) <= self.shingle_size:
+            shingles = {normalized}
+        else:
+            shingles = {
+                " ".join(words[i:i + self.shingle_size])
+                for i in range(len(words) - self.shingle_size + 1)
+            }
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        return ((hashes[:, None] * self._a + self._b) % MERSENNE_PRIME).min(axis=0)
+
+    def _band_keys(self, signature):
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def check(self, company, text):
+        """
+        Returns (representative chunk id or None, fingerprint). Pass the fingerprint to add()
+        when the chunk is kept.
+        """
+        index = self._company(company)
+        normalized = normalize_chunk(text)
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        representative = index["exact"].get(digest)
+        if representative is not None:
+            self.exact_duplicates += 1
+            return representative, None
+
+        signature = self._signature(normalized)
+        band_keys = self._band_keys(signature)
+        numbers = numeric_tokens(normalized)
+        best, best_similarity = None, self.threshold
+        candidates = {chunk_id for key in band_keys for chunk_id in index["buckets"].get(key, ())}
+        for chunk_id in candidates:
+            if index["numbers"][chunk_id] != numbers:
+                continue
+            similarity = float(np.mean(index["signatures"][chunk_id] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = chunk_id, similarity
+        if best is not None:
+            self.near_duplicates += 1
+        return best, (digest, signature, numbers, band_keys)
+
+    def add(self, company, chunk_id, fingerprint):
+        index = self._company(company)
+        digest, signature, numbers, band_keys = fingerprint
+        index["exact"][digest] = chunk_id
+        index["signatures"][chunk_id] = signature
+        index["numbers"][chunk_id] = numbers
+        for key in band_keys:
+            index["buckets"].setdefault(key, []).append(chunk_id)
+
+    def add_reference(self, company, representative, reference):
+        self._company(company)["references"].setdefault(representative, []).append(reference)
+
+    def forget_file(self, company, source_file, chunk_ids):
+        """
+        Undoes a file that failed midway: its representatives and its back-references are removed.
+        """
+        index = self._company(company)
+        removed = set(chunk_ids)
+        index["exact"] = {digest: cid for digest, cid in index["exact"].items() if cid not in removed}
+        for chunk_id in removed:
+            index["signatures"].pop(chunk_id, None)
+            index["numbers"].pop(chunk_id, None)
+            index["references"].pop(chunk_id, None)
+        for key, chunk_ids_in_bucket in list(index["buckets"].items()):
+            index["buckets"][key] = [cid for cid in chunk_ids_in_bucket if cid not in removed]
+        for representative, references in index["references"].items():
+            references[:] = [ref for ref in references if ref.get("source_file") != source_file]
+
+    def references(self, company):
+        """
+        {representative chunk id: [back-references of the chunks dropped in its favour]}
+        """
+        references = self._companies.get(company, {}).get("references", {})
+        return {chunk_id: refs for chunk_id, refs in references.items() if refs}
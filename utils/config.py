@@ -9,3 +9,62 @@ TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 COHERE_API_KEY = os.getenv("COHERE_API_KEY")
 CHROMA_PATH = os.getenv("CHROMA_PATH", "./data/vectorstore")
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4o")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache/embeddings.sqlite3")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200_000))
+RELEVANCE_THRESHOLD = float(os.getenv("RELEVANCE_THRESHOLD", 0.35))
+TOOL_TIMEOUT_S = float(os.getenv("TOOL_TIMEOUT_S", 20))
+TURN_LATENCY_BUDGET_S = float(os.getenv("TURN_LATENCY_BUDGET_S", 45))
+WEB_CACHE_PATH = os.getenv("WEB_CACHE_PATH", "./data/web_cache/results.sqlite3")
+WEB_CACHE_TTL_S = float(os.getenv("WEB_CACHE_TTL_S", 3600))
+WEB_CACHE_MAX_ENTRIES = int(os.getenv("WEB_CACHE_MAX_ENTRIES", 5000))
+OFFLINE_MODE = os.getenv("OFFLINE_MODE", "0").lower() in ("1", "true", "yes")
+FIXTURES_DIR = os.getenv("FIXTURES_DIR", "./data/fixtures")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 500))
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", 6))
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", 20))
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 20))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 4))
+RERANK_MAX_CONTEXT_TOKENS = int(os.getenv("RERANK_MAX_CONTEXT_TOKENS", 1500))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL") or None
+DEFERRED_SUMMARY = os.getenv("DEFERRED_SUMMARY", "1").lower() in ("1", "true", "yes")
+TRACE_PATH = os.getenv("TRACE_PATH", "./data/traces/spans.jsonl")
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", 20))
+# The span file is rotated at this size (0 = never), keeping this many older files (spans.jsonl.1, ...)
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", 50 * 1024 * 1024))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", 3))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or None
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 256))
+INGEST_MAX_PENDING_BATCHES = int(os.getenv("INGEST_MAX_PENDING_BATCHES", 4))
+STREAM_INGEST_MIN_BYTES = int(os.getenv("STREAM_INGEST_MIN_BYTES", 5 * 1024 * 1024))
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", 3600))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 200))
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./data/uploads")
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", 8000))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", 16))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 4))
+BATCH_RPM = int(os.getenv("BATCH_RPM", 0))
+BATCH_TPM = int(os.getenv("BATCH_TPM", 0))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+MMAP_VECTOR_DTYPE = os.getenv("MMAP_VECTOR_DTYPE", "float16")
+MMAP_RESCORE = os.getenv("MMAP_RESCORE", "1").lower() in ("1", "true", "yes")
+MMAP_RESCORE_FACTOR = int(os.getenv("MMAP_RESCORE_FACTOR", 4))
+# Published generations kept on disk (the current one plus older ones other processes may still map)
+MMAP_KEEP_GENERATIONS = int(os.getenv("MMAP_KEEP_GENERATIONS", 2))
+CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", 128))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 16))
+CHUNK_TOKENIZER_MODEL = os.getenv("CHUNK_TOKENIZER_MODEL", "text-embedding-ada-002")
+DEDUP_CHUNKS = os.getenv("DEDUP_CHUNKS", "1").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.8))
+WARMUP = os.getenv("WARMUP", "1").lower() in ("1", "true", "yes")
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0").lower() in ("1", "true", "yes")
+LLM_RPM = int(os.getenv("LLM_RPM", 0))
+LLM_TPM = int(os.getenv("LLM_TPM", 0))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", 0.5))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", 20))
+LLM_COALESCE = os.getenv("LLM_COALESCE", "1").lower() in ("1", "true", "yes")
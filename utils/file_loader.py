@@ -1,8 +1,17 @@
 import os
+import time
+import queue
 import shutil
+import threading
 import re
+from concurrent.futures import ProcessPoolExecutor
+import pypdf
 from langchain.document_loaders import PyPDFLoader, CSVLoader
+from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils.tracing import record_span
+from memory.memory import get_encoding
+from utils.config import CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_TOKENIZER_MODEL
 
 def delte_temp_files(path="data/tmp"):
     """
@@ -23,6 +32,20 @@ def langchain_document_loader(file_path):
     else:
         raise ValueError(f"Unsupported file type: {file_path}")
 
+def lazy_document_loader(file_path):
+    """
+    Yields a document's pages (PDF) or rows (CSV) one at a time instead of loading them all.
+    Produces the same documents and metadata as langchain_document_loader.
+    """
+    if file_path.endswith(".pdf"):
+        reader = pypdf.PdfReader(file_path)
+        for page_number, page in enumerate(reader.pages):
+            yield Document(page_content=page.extract_text(), metadata={"source": file_path, "page": page_number})
+    elif file_path.endswith(".csv"):
+        yield from CSVLoader(file_path).lazy_load()
+    else:
+        raise ValueError(f"Unsupported file type: {file_path}")
+
 def extract_company_from_filename(file_path):
     """
     Dynamically extracts company name from filename using common delimiters.
@@ -33,25 +56,173 @@ def extract_company_from_filename(file_path):
     company_name = " ".join(parts[:2]).strip().title()
     return company_name if company_name else "Unknown"
 
-def split_documents_to_chunks(documents, chunk_size=512, chunk_overlap=64):
+def count_tokens(text):
     """
-    Splits loaded documents into manageable chunks for embedding.
+    Length of text in embedding-model tokens (tiktoken).
+    """
+    return len(get_encoding(CHUNK_TOKENIZER_MODEL).encode(text, disallowed_special=()))
+
+def make_splitter(chunk_size=CHUNK_SIZE_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS):
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    Recursive splitter whose chunk_size and chunk_overlap are counted in model tokens, not characters.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=count_tokens
     )
-    return splitter.split_documents(documents)
 
-def load_and_split_all_documents(file_paths):
+def split_documents_to_chunks(documents, chunk_size=CHUNK_SIZE_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS):
+    """
+    Splits loaded documents into manageable chunks for embedding.
+    """
+    return make_splitter(chunk_size, chunk_overlap).split_documents(documents)
+
+def load_and_split_file(file_path, chunk_size=CHUNK_SIZE_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS):
+    """
+    Loads, tags and chunks a single document. Runs inside pool workers, so it must stay picklable.
+    """
+    return timed_load_and_split_file(file_path, chunk_size, chunk_overlap)[0]
+
+def timed_load_and_split_file(file_path, chunk_size=CHUNK_SIZE_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS):
+    """
+    Same as load_and_split_file, also returning the wall-clock (start_ns, end_ns) of the load
+    and split steps so the parent process can record them as spans.
+    """
+    load_started = time.time_ns()
+    docs = langchain_document_loader(file_path)
+    company_name = extract_company_from_filename(file_path)
+    for doc in docs:
+        doc.metadata["company"] = company_name
+        doc.metadata["source_file"] = os.path.basename(file_path)
+    split_started = time.time_ns()
+    chunks = split_documents_to_chunks(docs, chunk_size, chunk_overlap)
+    timings = {"load": (load_started, split_started), "split": (split_started, time.time_ns()), "pages": len(docs)}
+    return chunks, timings
+
+def _record_file_spans(file_path, chunks, timings):
+    name = os.path.basename(file_path)
+    record_span("load", "load", *timings["load"], file=name, pages=timings["pages"])
+    record_span("split", "split", *timings["split"], file=name, chunks=len(chunks))
+
+def iter_load_and_split_documents(file_paths, chunk_size=CHUNK_SIZE_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS,
+                                  max_workers=1):
+    """
+    Yields (file_path, chunks, error) for each file, in the order of file_paths.
+    With max_workers > 1 files are parsed and chunked in a process pool.
+    A failing file yields its exception instead of aborting the batch.
+    """
+    file_paths = list(file_paths)
+    if not max_workers or max_workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            try:
+                chunks, timings = timed_load_and_split_file(file_path, chunk_size, chunk_overlap)
+            except Exception as e:
+                yield file_path, [], e
+                continue
+            _record_file_spans(file_path, chunks, timings)
+            yield file_path, chunks, None
+        return
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(file_paths))) as pool:
+        futures = [
+            pool.submit(timed_load_and_split_file, file_path, chunk_size, chunk_overlap)
+            for file_path in file_paths
+        ]
+        for file_path, future in zip(file_paths, futures):
+            try:
+                chunks, timings = future.result()
+            except Exception as e:
+                yield file_path, [], e
+                continue
+            _record_file_spans(file_path, chunks, timings)
+            yield file_path, chunks, None
+
+def iter_file_chunk_batches(file_path, chunk_size=CHUNK_SIZE_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS,
+                            batch_size=256, stats=None):
+    """
+    Streams one file as lists of at most batch_size chunks. Pages/rows are loaded, tagged and
+    split as they arrive, so memory is bounded by a batch instead of the whole document.
+    stats (optional dict) accumulates pages, load_ns and split_ns.
+    """
+    splitter = make_splitter(chunk_size, chunk_overlap)
+    company_name = extract_company_from_filename(file_path)
+    stats = stats if stats is not None else {}
+    stats.update(pages=0, load_ns=0, split_ns=0)
+
+    pages = lazy_document_loader(file_path)
+    batch = []
+    while True:
+        load_started = time.perf_counter_ns()
+        page = next(pages, None)
+        stats["load_ns"] += time.perf_counter_ns() - load_started
+        if page is None:
+            break
+        page.metadata["company"] = company_name
+        page.metadata["source_file"] = os.path.basename(file_path)
+
+        split_started = time.perf_counter_ns()
+        batch.extend(splitter.split_documents([page]))
+        stats["split_ns"] += time.perf_counter_ns() - split_started
+        stats["pages"] += 1
+
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
+
+def iter_with_backpressure(iterable, max_pending=4):
+    """
+    Consumes iterable in a background thread, at most max_pending items ahead of the caller.
+    The producer blocks while the consumer (e.g. embedding) falls behind, so memory stays bounded.
+    Exceptions raised by the producer are re-raised to the caller.
+    """
+    pending = queue.Queue(maxsize=max_pending)
+    stopped = threading.Event()
+    finished = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((finished, None))
+        except Exception as e:
+            put((finished, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = pending.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # Consumer stopped early (or failed): release the producer
+        stopped.set()
+        thread.join()
+
+def load_and_split_all_documents(file_paths, chunk_size=CHUNK_SIZE_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS,
+                                 max_workers=1):
     """
     Loads and chunks all uploaded documents with automatic metadata.
     """
-    all_docs = []
-    for file_path in file_paths:
-        docs = langchain_document_loader(file_path)
-        company_name = extract_company_from_filename(file_path)
-        for doc in docs:
-            doc.metadata["company"] = company_name
-            doc.metadata["source_file"] = os.path.basename(file_path)
-        all_docs.extend(docs)
-    return split_documents_to_chunks(all_docs)
\ No newline at end of file
+    all_chunks = []
+    for file_path, chunks, error in iter_load_and_split_documents(
+        file_paths, chunk_size, chunk_overlap, max_workers
+    ):
+        if error:
+            raise error
+        all_chunks.extend(chunks)
+    return all_chunks
@@ -0,0 +1,191 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+
+MANIFEST_FILENAME = "ingestion_manifest.json"
+
+
+def file_content_hash(file_path, block_size=1 << 20):
+    """
+    Returns the sha256 hex digest of a file's content, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunking_signature(chunk_size, chunk_overlap, embeddings_model, dedup=None):
+    """
+    Parameters that change the stored chunks. If any of them changes, every file is re-indexed.
+    Chunk sizes are counted in model tokens; dedup holds the deduplicator's settings (None when off).
+    """
+    return {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "unit": "tokens",
+        "embeddings_model": embeddings_model,
+        "dedup": dedup,
+    }
+
+
+def make_chunk_id(source_file, content_hash, index):
+    """
+    Deterministic vectorstore id for the index-th chunk of a given file version.
+    """
+    file_key = hashlib.sha1(f"{source_file}:{content_hash}".encode("utf-8")).hexdigest()[:16]
+    return f"{file_key}-{index}"
+
+
+def load_manifest(persist_dir):
+    """
+    Loads the ingestion manifest stored next to the vectorstore (empty manifest if missing).
+    """
+    path = os.path.join(persist_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {"chunking": None, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(persist_dir, manifest):
+    """
+    Atomically writes the ingestion manifest next to the vectorstore.
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, MANIFEST_FILENAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def has_legacy_index(persist_dir):
+    """
+    True when persist_dir holds the single corpus-wide collection written before per-company
+    partitions (a manifest without a layout, or no manifest at all next to a Chroma database).
+    It cannot be reopened: the next build deletes it and indexes only the documents uploaded then.
+    """
+    manifest = load_manifest(persist_dir)
+    if manifest.get("layout"):
+        return False
+    return bool(manifest.get("files")) or os.path.exists(os.path.join(persist_dir, "chroma.sqlite3"))
+
+
+def indexed_embeddings_model(manifest):
+    """
+    Embeddings model the stored vectors were computed with (None for an empty index).
+    """
+    return (manifest.get("chunking") or {}).get("embeddings_model")
+
+
+@lru_cache(maxsize=8)
+def _manifest_summary(path, modified_at):
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    companies = {}
+    for name, entry in sorted(manifest.get("files", {}).items()):
+        company = companies.setdefault(entry["company"], {"files": [], "chunks": 0})
+        company["files"].append(name)
+        company["chunks"] += len(entry["chunk_ids"])
+    return {
+        "embeddings_model": indexed_embeddings_model(manifest),
+        "vector_backend": manifest.get("vector_backend", "chroma"),
+        "files": sum(len(company["files"]) for company in companies.values()),
+        "chunks": sum(company["chunks"] for company in companies.values()),
+        "companies": dict(sorted(companies.items())),
+    }
+
+
+def manifest_summary(persist_dir):
+    """
+    Compact view of the persisted index: embeddings model, vector backend, totals and, per company,
+    its file names and chunk count. None when nothing is indexed. Re-read only when the manifest
+    changes, so it is cheap to call on every Streamlit rerun.
+    """
+    path = os.path.join(persist_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    summary = _manifest_summary(path, os.path.getmtime(path))
+    return summary if summary["files"] else None
+
+
+def indexed_companies(manifest):
+    """
+    Sorted list of the companies that have at least one indexed file.
+    """
+    return sorted({entry["company"] for entry in manifest.get("files", {}).values()})
+
+
+def plan_incremental_update(manifest, file_paths, chunking, removed_files=()):
+    """
+    Compares the uploaded files against the manifest. Indexing is additive: files indexed
+    earlier (possibly by another session) and absent from file_paths are kept, only the names
+    in removed_files are deleted.
+    Returns (files_to_index, stale_chunks, unchanged_files) where files_to_index maps
+    file path → content hash for new or changed files, stale_chunks maps company → ids of the
+    chunks belonging to its removed or replaced files, and unchanged_files are the names kept as-is.
+    """
+    indexed = manifest.get("files", {})
+    stale_chunks = {}
+
+    def mark_stale(entry):
+        stale_chunks.setdefault(entry["company"], []).extend(entry["chunk_ids"])
+
+    files_to_index = {}
+    unchanged_files = []
+    current_names = {os.path.basename(file_path) for file_path in file_paths}
+    if manifest.get("chunking") != chunking:
+        # Chunking or embedding settings changed: everything previously stored is stale, and the
+        # other files are re-indexed from their uploads when those are still on disk
+        for name, entry in indexed.items():
+            mark_stale(entry)
+            path = entry.get("path")
+            if name not in current_names and name not in removed_files and path and os.path.exists(path):
+                files_to_index[path] = file_content_hash(path)
+        indexed = {}
+
+    for file_path in file_paths:
+        name = os.path.basename(file_path)
+        content_hash = file_content_hash(file_path)
+        entry = indexed.get(name)
+        if entry and entry["hash"] == content_hash:
+            unchanged_files.append(name)
+            continue
+        if entry:
+            mark_stale(entry)
+        files_to_index[file_path] = content_hash
+
+    for name, entry in indexed.items():
+        if name in current_names:
+            continue
+        if name in removed_files:
+            mark_stale(entry)
+        else:
+            unchanged_files.append(name)
+
+    return files_to_index, stale_chunks, unchanged_files
+
+
+def widen_to_companies(manifest, file_paths, files_to_index, stale_chunks, unchanged_files, companies):
+    """
+    Moves the unchanged files of the given companies back into the plan, so their partitions are
+    rebuilt whole. Needed when chunks are deduplicated across a company's files: a changed file can
+    own the representative of a chunk dropped from an unchanged one. Files not in file_paths are
+    re-read from the path they were indexed from; those no longer on disk (or changed since) stay as-is.
+    Updates files_to_index, stale_chunks and unchanged_files in place.
+    """
+    indexed = manifest.get("files", {})
+    paths = {os.path.basename(path): path for path in file_paths}
+    for name in list(unchanged_files):
+        entry = indexed[name]
+        if entry["company"] not in companies:
+            continue
+        path = paths.get(name) or entry.get("path")
+        if name not in paths and not (path and os.path.exists(path) and file_content_hash(path) == entry["hash"]):
+            continue
+        files_to_index[path] = entry["hash"]
+        stale_chunks.setdefault(entry["company"], []).extend(entry["chunk_ids"])
+        unchanged_files.remove(name)
@@ -0,0 +1,340 @@
+import copy
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from functools import lru_cache
+from concurrent.futures import Future
+from langchain.schema import get_buffer_string, messages_to_dict
+from memory.memory import get_encoding
+from utils.rate_limiter import RateLimiter
+from utils.registry import registry
+from utils.config import (
+    LLM_RPM,
+    LLM_TPM,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE_S,
+    LLM_BACKOFF_MAX_S,
+    LLM_COALESCE
+)
+
+# Throttling, timeouts, transient conflicts and server errors are worth another attempt
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Completion budget assumed for a call without max_tokens when reserving tokens-per-minute
+COMPLETION_TOKEN_ESTIMATE = 512
+
+
+class LeaderCancelled(Exception):
+    """
+    Set on a coalesced request's future when the caller sending it was cancelled or interrupted;
+    the waiting callers send the request again instead (one of them becomes the new leader).
+    """
+
+
+def is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after_s(error):
+    """
+    Seconds the server asked to wait (Retry-After header of a 429/503), if any.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMGateway:
+    """
+    Single entry point for every LLM request of the process:
+    - requests/tokens-per-minute token buckets (RateLimiter) shared by all sessions and threads
+    - at most max_concurrency requests in flight upstream
+    - retries of throttled and transient failures with exponential backoff and full jitter
+      (never shorter than the server's Retry-After)
+    - single-flight: a request identical to one already in flight waits for that one's result
+      instead of being sent again (if its sender is cancelled, a waiter sends it instead)
+    Queue time (rate limit plus concurrency wait) and coalesced calls are reported by report().
+    """
+    def __init__(self, requests_per_minute=LLM_RPM, tokens_per_minute=LLM_TPM, max_concurrency=LLM_MAX_CONCURRENCY,
+                 max_retries=LLM_MAX_RETRIES, backoff_base_s=LLM_BACKOFF_BASE_S, backoff_max_s=LLM_BACKOFF_MAX_S,
+                 coalesce=LLM_COALESCE):
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.coalesce = coalesce
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "requests": 0,
+            "upstream_calls": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "throttled": 0,
+            "errors": 0,
+            "queue_s": 0.0,
+            "max_queue_s": 0.0,
+        }
+
+    def set_limits(self, requests_per_minute=None, tokens_per_minute=None):
+        """
+        Replaces the requests/tokens-per-minute budget (0/None = unlimited).
+        """
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._metrics[name] += value
+
+    def _queued(self, started_at):
+        waited = time.monotonic() - started_at
+        with self._lock:
+            self._metrics["upstream_calls"] += 1
+            self._metrics["queue_s"] += waited
+            self._metrics["max_queue_s"] = max(self._metrics["max_queue_s"], waited)
+
+    def _backoff_s(self, attempt, error):
+        delay = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+        return max(delay, retry_after_s(error) or 0.0)
+
+    def _failed(self, attempt, error):
+        """
+        Counts a failed attempt; returns the backoff before the next one, or None to give up.
+        """
+        if attempt >= self.max_retries or not is_retryable(error):
+            self._count("errors")
+            return None
+        self._count("retries")
+        if getattr(error, "status_code", None) == 429:
+            self._count("throttled")
+        return self._backoff_s(attempt, error)
+
+    def _join(self, key):
+        """
+        Returns (future, leader): the leader sends the request, the others wait on its future.
+        """
+        with self._lock:
+            if not self.coalesce or key is None:
+                return Future(), True
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._metrics["coalesced"] += 1
+                return future, False
+            future = self._in_flight[key] = Future()
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def call(self, key, estimated_tokens, send, usage=None):
+        """
+        Runs send() through the gateway and returns its result. Calls with the same key
+        (None = never coalesce) share one upstream request while it is in flight; every waiter gets
+        its own copy of the result. usage(result) returns the actual tokens spent, if known.
+        """
+        self._count("requests")
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return copy.deepcopy(future.result())
+            except LeaderCancelled:
+                continue
+        try:
+            result = self._send(estimated_tokens, send, usage)
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            # Interrupted, not failed: the waiters send the request themselves
+            self._finish(key, future, error=LeaderCancelled())
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def acall(self, key, estimated_tokens, send, usage=None):
+        """
+        call() for coroutines: send is an async callable.
+        """
+        self._count("requests")
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # Shielded: a cancelled waiter must not cancel the shared future
+                return copy.deepcopy(await asyncio.shield(asyncio.wrap_future(future)))
+            except LeaderCancelled:
+                continue
+        try:
+            result = await self._asend(estimated_tokens, send, usage)
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            self._finish(key, future, error=LeaderCancelled())
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def _send(self, estimated_tokens, send, usage):
+        attempt = 0
+        while True:
+            started_at = time.monotonic()
+            self.limiter.acquire(estimated_tokens)
+            self._slots.acquire()
+            self._queued(started_at)
+            try:
+                result = send()
+            except Exception as e:
+                # A rejected request spent no tokens
+                self.limiter.settle(estimated_tokens, 0)
+                backoff = self._failed(attempt, e)
+                if backoff is None:
+                    raise
+            else:
+                self._settle(estimated_tokens, result, usage)
+                return result
+            finally:
+                self._slots.release()
+            time.sleep(backoff)
+            attempt += 1
+
+    async def _asend(self, estimated_tokens, send, usage):
+        attempt = 0
+        while True:
+            started_at = time.monotonic()
+            await self.limiter.aacquire(estimated_tokens)
+            await self._aacquire_slot()
+            self._queued(started_at)
+            try:
+                result = await send()
+            except Exception as e:
+                self.limiter.settle(estimated_tokens, 0)
+                backoff = self._failed(attempt, e)
+                if backoff is None:
+                    raise
+            else:
+                self._settle(estimated_tokens, result, usage)
+                return result
+            finally:
+                self._slots.release()
+            await asyncio.sleep(backoff)
+            attempt += 1
+
+    async def _aacquire_slot(self):
+        """
+        Takes a concurrency slot from a coroutine. The slots are shared with threads, so a busy
+        gateway is waited for in an executor thread rather than on an asyncio primitive.
+        """
+        if self._slots.acquire(blocking=False):
+            return
+        acquire = asyncio.get_running_loop().run_in_executor(None, self._slots.acquire)
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The slot is granted once the thread gets it, even though nobody uses it: hand it back
+            acquire.add_done_callback(lambda _: self._slots.release())
+            raise
+
+    def _settle(self, estimated_tokens, result, usage):
+        actual_tokens = usage(result) if usage else None
+        if actual_tokens:
+            self.limiter.settle(estimated_tokens, actual_tokens)
+
+    def report(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            in_flight = len(self._in_flight)
+        upstream_calls = metrics["upstream_calls"]
+        return {
+            **metrics,
+            "in_flight": in_flight,
+            "avg_queue_ms": metrics["queue_s"] / upstream_calls * 1000 if upstream_calls else 0.0,
+            "max_queue_ms": metrics["max_queue_s"] * 1000,
+            "coalesced_ratio": metrics["coalesced"] / metrics["requests"] if metrics["requests"] else 0.0,
+        }
+
+
+def get_gateway():
+    """
+    The process-wide LLM gateway.
+    """
+    return registry.get("llm_gateway", "default", LLMGateway)
+
+
+def total_tokens(result):
+    return ((result.llm_output or {}).get("token_usage") or {}).get("total_tokens")
+
+
+class GatewayChatModelMixin:
+    """
+    Routes a LangChain chat model's requests through the process-wide LLMGateway. Requests are
+    identical when the model settings, messages, stop words and call arguments (functions/tools)
+    are; streaming is not part of the key, so a streamed and a plain call of the same prompt share
+    one request (only the caller that sent it receives the tokens as they arrive).
+    """
+    def _gateway_key(self, messages, stop, kwargs):
+        params = {
+            name: value for name, value in self._get_invocation_params(stop=stop, **kwargs).items()
+            if name not in ("stream", "streaming")
+        }
+        payload = json.dumps([params, messages_to_dict(messages)], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _gateway_tokens(self, gateway, messages):
+        if not gateway.limiter.tokens_per_minute:
+            return 0
+        encoding = get_encoding(getattr(self, "model_name", None) or "gpt-4o")
+        prompt_tokens = len(encoding.encode(get_buffer_string(messages), disallowed_special=()))
+        return prompt_tokens + (getattr(self, "max_tokens", None) or COMPLETION_TOKEN_ESTIMATE)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        base = super(GatewayChatModelMixin, self)
+        gateway = get_gateway()
+        return gateway.call(
+            self._gateway_key(messages, stop, kwargs),
+            self._gateway_tokens(gateway, messages),
+            lambda: base._generate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            usage=total_tokens
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        base = super(GatewayChatModelMixin, self)
+        gateway = get_gateway()
+        return await gateway.acall(
+            self._gateway_key(messages, stop, kwargs),
+            self._gateway_tokens(gateway, messages),
+            lambda: base._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            usage=total_tokens
+        )
+
+
+@lru_cache(maxsize=None)
+def gateway_chat_model(chat_model_class):
+    """
+    chat_model_class with its requests sent through the gateway, e.g. gateway_chat_model(ChatOpenAI).
+    """
+    return type(
+        f"Gateway{chat_model_class.__name__}",
+        (GatewayChatModelMixin, chat_model_class),
+        {"__module__": __name__}
+    )
@@ -1,43 +1,155 @@
-import streamlit as st
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.agents import Tool, AgentExecutor, create_openai_functions_agent
-from langchain_community.tools.tavily_search import TavilySearchResults
+import time
+from utils.session import get_state, get_secret, notify
+from opentelemetry import trace
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain.agents import (
+    Tool,
+    AgentExecutor,
+    create_openai_functions_agent,
+    create_openai_tools_agent
+)
 from tools.research_agent import create_company_research_tool
+from tools.internal_lookup import safe_internal_lookup, asafe_internal_lookup
+from tools.sales_pitch import generate_sales_pitch, agenerate_sales_pitch
+from tools.concurrency import with_timeout, run_async
+from chains.turn_context import start_turn, invoke_rag_chain
+from chains.answer_cache import get_answer_cache, detect_company_scope, GENERAL_SCOPE
+from retrievers.setup import passes_relevance_gate, select_embeddings_model
+from utils.ingestion_manifest import load_manifest, indexed_companies
+from tools.web_search import create_cached_web_search
+from utils.registry import registry, get_chat_llm
+from utils.tracing import trace_run, span, TracingCallbackHandler
+from utils.config import TOOL_TIMEOUT_S, TURN_LATENCY_BUDGET_S, CHROMA_PATH
+
+ENRICHMENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an assistant tasked with enriching internal document answers using external tools.\n"
+     "You are provided with the original user question and a RAG-based answer.\n\n"
+     "If the RAG answer is sufficient, return it as-is.\n"
+     "Otherwise, enhance it using tools like `web_search`, `company_research_web_agent`, or `draft_sales_proposal`.\n"
+     "Call independent tools together in a single step; they run concurrently.\n"
+     "Always include tool outputs directly in your final answer."),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad")
+])
+
+SALES_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a sales intelligence assistant.\n"
+     "- Use internal_customer_lookup for known clients.\n"
+     "- Use web_search if the client is unknown.\n"
+     "- Use draft_sales_proposal for custom pitches.\n"
+     "Always attempt to answer using these tools."
+     "If no internal information is found, you MUST try `web_search`.\n"
+     "Always include tool outputs in the final answer."),
+    ("human", "{input}"),
+    ("assistant", "{agent_scratchpad}")
+])
+
+BI_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", 
+        """You have access to three tools: \n
+        1. internal_customer_lookup (for internal documents and data)\n
+        2. web_search (for publicly available online information)\n
+        3. research_tool (for research on the company)\n
+
+        Call internal_customer_lookup, web_search and research_tool together in a single step;
+        they are independent and run concurrently.\n
+        If the company is found in internal sources, build on that and the research_tool output.\n
+        If no internal data is found or the company is unknown, rely on web_search and research_tool.\n
+        Base all responses strictly on tool outputs. Do not make up facts.\n
+        Clearly indicate the source."""),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad")
+])
+
+def build_executor(llm, tools, prompt, parallel=False):
+    """
+    parallel=True builds a tools agent: independent tool calls returned in one step are
+    executed concurrently by AgentExecutor.ainvoke, within the turn latency budget.
+    """
+    if parallel:
+        agent = create_openai_tools_agent(llm, tools=tools, prompt=prompt)
+        return AgentExecutor.from_agent_and_tools(
+            agent=agent,
+            tools=tools,
+            verbose=True,
+            max_execution_time=TURN_LATENCY_BUDGET_S,
+            output_keys=["output"]
+        )
 
-def safe_internal_lookup(query):
-    result = st.session_state.chain.invoke({"question": query})
-    answer = result.get("answer", "")
-    if "I do not know" in answer or "context does not" in answer:
-        return "No relevant internal data found."
-    return answer
-
-def generate_sales_pitch(company_name: str) -> str:
-    try:
-        internal_summary = safe_internal_lookup(f"What do we know about {company_name}?")
-    except:
-        internal_summary = "No internal data available."
-
-    prompt = f"""
-    You are preparing a 3-slide sales pitch for {company_name}.
-    Use this internal knowledge (if any):  
-    {internal_summary}
+    agent = create_openai_functions_agent(llm, tools=tools, prompt=prompt)
+    return AgentExecutor.from_agent_and_tools(
+        agent=agent,
+        tools=tools,
+        verbose=True,
+        output_keys=["output"]
+    )
 
-    ---
+def make_tool(name, func, coroutine, description):
+    """
+    Tool with a sync implementation and a timeout-bounded async one.
+    """
+    timeout = min(TOOL_TIMEOUT_S, TURN_LATENCY_BUDGET_S)
+    return Tool(
+        name=name,
+        func=func,
+        coroutine=with_timeout(coroutine, timeout, name),
+        description=description
+    )
 
-    Slide 1: Company overview and strategic challenges 
-    Slide 2: Relevant AI/Data Science use cases tailored to their industry and pain points  
-    Slide 3: Proposal summary and next steps
+def get_agent_executors(openai_api_key, tavily_api_key, top_p, streaming=False):
     """
+    Returns the shared (enrichment, sales, BI) agent executors for the current settings.
+    Built once per settings key and reused across turns.
+    """
+    def build():
+        search, asearch = create_cached_web_search(tavily_api_key)
+        research_tool = create_company_research_tool()
 
-    llm = ChatOpenAI(
-        api_key=st.secrets["OPENAI_API_KEY"],
-        model="gpt-4o",
-        temperature=0.1,
-        model_kwargs={"top_p": st.session_state.top_p}
-    )
+        sales_tools = [
+            make_tool(
+                "internal_customer_lookup",
+                safe_internal_lookup,
+                asafe_internal_lookup,
+                "Retrieve info about known clients"
+            ),
+            make_tool("web_search", search, asearch, "Search online for unknown companies"),
+            make_tool(
+                "draft_sales_proposal",
+                generate_sales_pitch,
+                agenerate_sales_pitch,
+                "Create a 3-slide sales proposal"
+            )
+        ]
+        enrichment_tools = sales_tools + [make_tool(
+            "company_research_web_agent",
+            research_tool.func,
+            research_tool.coroutine,
+            "Use this to retrieve structured company research from the web."
+        )]
+        bi_tools = [sales_tools[0], sales_tools[1], make_tool(
+            research_tool.name,
+            research_tool.func,
+            research_tool.coroutine,
+            research_tool.description
+        )]
+
+        llm = get_chat_llm(
+            model="gpt-4o",
+            api_key=openai_api_key,
+            temperature=0.1,
+            top_p=top_p,
+            streaming=streaming
+        )
+
+        return (
+            build_executor(llm, enrichment_tools, ENRICHMENT_PROMPT, parallel=True),
+            build_executor(llm, sales_tools, SALES_PROMPT),
+            build_executor(llm, bi_tools, BI_PROMPT, parallel=True)
+        )
 
-    return "### 🧾 Sales Proposal\n\n" + llm.invoke(prompt).content
+    return registry.get("agent_executors", (openai_api_key, tavily_api_key, top_p, streaming), build)
 
 def is_low_relevance(source_docs):
     return all(len(doc.page_content.strip()) < 30 for doc in source_docs)
@@ -50,10 +162,108 @@ def is_question_covered_by_docs(question, source_docs):
         for doc in source_docs
     )
 
-def get_response_from_LLM(prompt):
+def get_known_companies():
+    if get_state().get("indexed_companies") is None:
+        get_state().indexed_companies = indexed_companies(load_manifest(CHROMA_PATH))
+    return get_state().indexed_companies
+
+def answer_cache_scope(mentioned):
+    """
+    Answer cache scope of a question: the companies it names, else the session's current company
+    (the one its retrieval is routed to). A question resolving to no company is GENERAL_SCOPE
+    when it opens the conversation, and None (not cacheable) when it is a follow-up: its answer
+    depends on the earlier turns.
+    """
+    if mentioned:
+        return tuple(mentioned)
+    current = get_state().get("current_company")
+    if current:
+        return (current,)
+    chain = get_state().get("chain")
+    if chain is not None and chain.memory and chain.memory.chat_memory.messages:
+        return None
+    return GENERAL_SCOPE
+
+def remember_cached_turn(prompt, answer):
+    """
+    Saves a turn answered from the answer cache to the conversation memory, as the RAG chain
+    does for the turns it answers, so follow-ups can refer to it.
+    """
+    chain = get_state().get("chain")
+    if chain is not None and chain.memory:
+        chain.memory.save_context({"question": prompt}, {"answer": answer})
+
+@trace_run("turn")
+def get_response_from_LLM(prompt, callbacks=None):
+    """
+    Answers a user question, serving near-identical questions (same company scope)
+    from the semantic answer cache and routing everything else.
+    Every step of the turn is recorded as a span (see utils.tracing).
+    """
+    started_at = time.perf_counter()
+    turn_span = trace.get_current_span()
+    get_state().answer_cache_hit = False
+
+    # Retrieval is routed to the partitions of the companies named; follow-ups naming none
+    # stay with the last single company asked about
+    mentioned = detect_company_scope(prompt, get_known_companies())
+    if len(mentioned) == 1:
+        get_state().current_company = mentioned[0]
+    turn_span.set_attribute("companies", list(mentioned))
+
+    cache = vector = None
+    scope = answer_cache_scope(mentioned)
+    if get_state().get("use_answer_cache", True):
+        with span("router.answer_cache", "router") as decision:
+            if scope is None:
+                # Follow-up naming no company: its answer depends on the conversation
+                decision.set_attribute("decision", "skip_follow_up")
+            else:
+                try:
+                    embeddings = select_embeddings_model()
+                    cache = get_answer_cache(embeddings.model_key)
+                    vector = embeddings.embed_query(prompt)
+                    entry = cache.lookup(scope, vector)
+                    decision.set_attribute("decision", "hit" if entry else "miss")
+                    if entry:
+                        get_state().answer_cache_hit = True
+                        get_state().turn_context = None
+                        turn_span.set_attribute("route", "answer_cache")
+                        remember_cached_turn(prompt, entry["answer"])
+                        return entry["answer"], entry["sources"], entry["source_type"]
+                except Exception as e:
+                    # The cache is an optimization: never fail the turn because of it
+                    cache = None
+                    decision.set_attribute("decision", "unavailable")
+                    decision.set_attribute("error", f"{type(e).__name__}: {e}")
+
+    callbacks = list(callbacks or []) + [TracingCallbackHandler()]
+    answer, sources, source_type = route_question(prompt, callbacks)
+    turn_span.set_attribute("route", source_type)
+
+    if cache is not None and source_type != "error":
+        cache.store(scope, prompt, vector, answer, sources, source_type, time.perf_counter() - started_at)
+    return answer, sources, source_type
+
+def route_question(prompt, callbacks=None):
+    """
+    Routes a user question through RAG → enrichment / sales agent → BI agent.
+    callbacks (e.g. a StreamEventHandler) receive tokens and tool events as they happen.
+    """
+    run_config = {"callbacks": callbacks or []}
     try:
-        # === 1. Try RAG chain ===
-        rag_result = st.session_state.chain.invoke({"question": prompt})
+        # === 1. Relevance gate, then RAG chain (memoized for the rest of the turn) ===
+        start_turn(callbacks)
+        with span("router.relevance_gate", "router") as decision:
+            passed = passes_relevance_gate(prompt)
+            decision.set_attribute("decision", "pass" if passed else "skip_rag")
+        if passed:
+            with span("router.rag_chain", "router"):
+                rag_result = invoke_rag_chain(prompt)
+        else:
+            # Out-of-corpus question: skip the RAG generation and go straight to the agents
+            notify("info", "🔎 No relevant internal documents, skipping internal answer...")
+            rag_result = {}
         rag_answer = rag_result.get("answer", "")
         source_docs = rag_result.get("source_documents", [])
 
@@ -86,130 +296,42 @@ def get_response_from_LLM(prompt):
             not is_low_relevance(source_docs) and
             is_question_covered_by_docs(prompt, source_docs)
         )
-
-        # === 2. Setup agent tools ===
-        search_tool = TavilySearchResults(tavily_api_key=st.secrets["TAVILY_API_KEY"])
-        from tools.research_agent import create_company_research_tool
-        research_tool = create_company_research_tool()
-
-        sales_tools = [
-            Tool("internal_customer_lookup", safe_internal_lookup, "Retrieve info about known clients"),
-            Tool("web_search", search_tool.run, "Search online for unknown companies"),
-            Tool("draft_sales_proposal", generate_sales_pitch, "Create a 3-slide sales proposal")
-        ]
+        trace.get_current_span().add_event("router.rag_helpful", {"helpful": bool(rag_helpful)})
+
+        # === 2. Shared agent executors (built once per settings) ===
+        enrich_executor, sales_executor, bi_executor = get_agent_executors(
+            get_secret("OPENAI_API_KEY"),
+            get_secret("TAVILY_API_KEY"),
+            get_state().top_p,
+            get_state().get("stream_responses", False)
+        )
 
         # === 3. RAG Helpful → Agent Enhancement ===
         if rag_helpful:
-            # Agent to enhance existing RAG response
-            enrichment_tools = sales_tools + [Tool(
-                name="company_research_web_agent",
-                func=research_tool.func,
-                description="Use this to retrieve structured company research from the web."
-            )]
-
-            agent_prompt = ChatPromptTemplate.from_messages([
-                ("system",
-                 "You are an assistant tasked with enriching internal document answers using external tools.\n"
-                 "You are provided with the original user question and a RAG-based answer.\n\n"
-                 "If the RAG answer is sufficient, return it as-is.\n"
-                 "Otherwise, enhance it using tools like `web_search`, `company_research_web_agent`, or `draft_sales_proposal`.\n"
-                 "Always include tool outputs directly in your final answer."),
-                ("human", "{input}"),
-                ("assistant", "{agent_scratchpad}")
-            ])
-
-            agent_llm = ChatOpenAI(
-                api_key=st.secrets["OPENAI_API_KEY"],
-                model="gpt-4o",
-                temperature=0.1,
-                model_kwargs={"top_p": st.session_state.top_p}
-            )
-
-            enrich_agent = create_openai_functions_agent(agent_llm, tools=enrichment_tools, prompt=agent_prompt)
-
-            enrich_executor = AgentExecutor.from_agent_and_tools(
-                agent=enrich_agent,
-                tools=enrichment_tools,
-                verbose=True,
-                output_keys=["output"]
-            )
-
             agent_input = f"""User question: {prompt}
 RAG answer: {rag_answer}"""
 
-            st.info("🧠 Enhancing internal answer with external tools...")
-            enhanced = enrich_executor.invoke({"input": agent_input})
+            notify("info", "🧠 Enhancing internal answer with external tools...")
+            with span("router.enrichment_agent", "router"):
+                enhanced = run_async(enrich_executor.ainvoke({"input": agent_input}, config=run_config))
             return f"*RAG + Enriched Answer*\n\n{enhanced['output']}", source_docs, "internal+agent"
 
         # === 4. Sales Agent Fallback ===
-        sales_prompt = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are a sales intelligence assistant.\n"
-             "- Use internal_customer_lookup for known clients.\n"
-             "- Use web_search if the client is unknown.\n"
-             "- Use draft_sales_proposal for custom pitches.\n"
-             "Always attempt to answer using these tools."
-             "If no internal information is found, you MUST try `web_search`.\n"
-             "Always include tool outputs in the final answer."),
-            ("human", "{input}"),
-            ("assistant", "{agent_scratchpad}")
-        ])
-
-        sales_llm = ChatOpenAI(
-            api_key=st.secrets["OPENAI_API_KEY"],
-            model="gpt-4o",
-            temperature=0.1,
-            model_kwargs={"top_p": st.session_state.top_p}
-        )
-
-        sales_agent = create_openai_functions_agent(sales_llm, tools=sales_tools, prompt=sales_prompt)
-
-        sales_executor = AgentExecutor.from_agent_and_tools(
-            agent=sales_agent,
-            tools=sales_tools,
-            verbose=True,
-            output_keys=["output"]
-        )
-
-        response = sales_executor.invoke({"input": prompt})
-        sales_answer = response.get("output", "")
-        sales_answer_text = sales_answer.lower().strip()
-        fallback_detected = any(phrase in sales_answer_text for phrase in fallback_phrases)
+        with span("router.sales_agent", "router") as decision:
+            response = sales_executor.invoke({"input": prompt}, config=run_config)
+            sales_answer = response.get("output", "")
+            sales_answer_text = sales_answer.lower().strip()
+            fallback_detected = any(phrase in sales_answer_text for phrase in fallback_phrases)
+            decision.set_attribute("decision", "fallback_to_bi" if fallback_detected else "answered")
 
         if not fallback_detected:
             return f"*Using Sales Agent*\n\n{sales_answer}", [], "internal"
 
         # === 5. BI Agent Final Fallback ===
-        bi_tools = [sales_tools[0], sales_tools[1], research_tool]
-
-        bi_prompt = ChatPromptTemplate.from_messages([
-            ("system", 
-                """You have access to three tools: \n
-                1. internal_customer_lookup (for internal documents and data)\n
-                2. web_search (for publicly available online information)\n
-                3. research_tool (for research on the company)\n
-
-                Always attempt to retrieve information using internal_customer_lookup first.\n
-                If the company is found in internal sources, use that and research_tool to gather more info.\n
-                If no internal data is found or the company is unknown, use web_search and research_tool.\n
-                Base all responses strictly on tool outputs. Do not make up facts.\n
-                Clearly indicate the source."""),
-            ("human", "{input}"),
-            ("assistant", "{agent_scratchpad}")
-        ])
-
-        bi_agent = create_openai_functions_agent(sales_llm, tools=bi_tools, prompt=bi_prompt)
-
-        bi_executor = AgentExecutor.from_agent_and_tools(
-            agent=bi_agent,
-            tools=bi_tools,
-            verbose=True,
-            output_keys=["output"]
-        )
-
-        bi_result = bi_executor.invoke({"input": prompt})
+        with span("router.bi_agent", "router"):
+            bi_result = run_async(bi_executor.ainvoke({"input": prompt}, config=run_config))
         return f"*Using Business Intelligence Agent + Web Research*\n\n{bi_result['output']}", [], "web"
 
     except Exception as e:
-        st.error(f"LLM Handler Error: {str(e)}")
+        notify("error", f"LLM Handler Error: {str(e)}")
         return f"❌ LLM Error: {e}", [], "error"
\ No newline at end of file
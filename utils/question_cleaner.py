@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 def clean_retriever_question(question: str, company_name: str) -> str:
     """
@@ -15,4 +16,83 @@ def clean_retriever_question(question: str, company_name: str) -> str:
     # Remove redundant prepositions (like "with") if left behind
     cleaned = re.sub(r"\bwith\b\s*$", "", cleaned).strip()
 
-    return cleaned
\ No newline at end of file
+    return cleaned
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+LEGAL_SUFFIXES = {"inc", "corp", "corporation", "co", "company", "ltd", "llc", "gmbh", "plc", "group"}
+
+
+class CompanyGazetteer:
+    """
+    Finds the known companies a question mentions in one pass over its words.
+    Names are matched as whole word sequences, case and punctuation insensitive
+    ("boli-ai" matches "Boli Ai"), longest name first; a name with a legal suffix
+    also matches without it ("Acme Corp" → "acme").
+    """
+    def __init__(self, companies):
+        self.companies = tuple(sorted(set(companies)))
+        self._names = {}
+        for company in self.companies:
+            for alias in self._aliases(company):
+                self._names.setdefault(alias[0], []).append((alias, company))
+        for candidates in self._names.values():
+            candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+
+    def _aliases(self, company):
+        words = tuple(WORD_PATTERN.findall(company.lower()))
+        if not words:
+            return []
+        aliases = [words]
+        if len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+            aliases.append(words[:-1])
+        return aliases
+
+    def find(self, question):
+        """
+        Returns [(company, matched text)] in order of appearance.
+        """
+        return [(company, question[start:end]) for company, start, end in self._spans(question)]
+
+    def _spans(self, question):
+        words = [(m.group(), m.start(), m.end()) for m in WORD_PATTERN.finditer(question.lower())]
+        matches = []
+        i = 0
+        while i < len(words):
+            for alias, company in self._names.get(words[i][0], ()):
+                end = i + len(alias)
+                if tuple(word for word, _, _ in words[i:end]) == alias:
+                    matches.append((company, words[i][1], words[end - 1][2]))
+                    i = end
+                    break
+            else:
+                i += 1
+        return matches
+
+    def detect(self, question):
+        """
+        Sorted tuple of the companies mentioned in the question (empty if none).
+        """
+        return tuple(sorted({company for company, _ in self.find(question)}))
+
+    def strip(self, question):
+        """
+        The question without the company names it mentions (the original if nothing is left).
+        """
+        cleaned, last = [], 0
+        for _, start, end in self._spans(question):
+            cleaned.append(question[last:start])
+            last = end
+        cleaned.append(question[last:])
+        cleaned = re.sub(r"\s+", " ", "".join(cleaned)).strip()
+        # Remove redundant prepositions (like "with") if left behind
+        cleaned = re.sub(r"\bwith\b\s*[?!.]?$", "", cleaned).strip()
+        return cleaned or question
+
+
+@lru_cache(maxsize=8)
+def get_gazetteer(companies):
+    """
+    Shared gazetteer for a tuple of company names (rebuilt only when the indexed companies change).
+    """
+    return CompanyGazetteer(companies)
@@ -0,0 +1,80 @@
+import time
+import asyncio
+import threading
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets shared by all threads.
+    acquire() blocks until both buckets have room; settle() corrects a call's token estimate
+    once its actual usage is known. A limit of 0/None disables that bucket.
+    """
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self._requests = float(self.requests_per_minute or 0)
+        self._tokens = float(self.tokens_per_minute or 0)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_s = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed_min = (now - self._updated_at) / 60
+        self._updated_at = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed_min * self.requests_per_minute)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed_min * self.tokens_per_minute)
+
+    def _reserve(self, tokens):
+        """
+        Takes one request and tokens from the buckets if both have room; otherwise returns the
+        seconds to wait before trying again.
+        """
+        with self._lock:
+            self._refill()
+            waits = [0.0]
+            if self.requests_per_minute and self._requests < 1:
+                waits.append((1 - self._requests) / self.requests_per_minute * 60)
+            if self.tokens_per_minute and self._tokens < tokens:
+                waits.append((tokens - self._tokens) / self.tokens_per_minute * 60)
+            wait = max(waits)
+            if not wait:
+                if self.requests_per_minute:
+                    self._requests -= 1
+                if self.tokens_per_minute:
+                    self._tokens -= tokens
+            return wait
+
+    def _capped(self, tokens):
+        if self.tokens_per_minute:
+            # A single call larger than the whole budget still goes through once the bucket is full
+            return min(tokens, self.tokens_per_minute)
+        return tokens
+
+    def acquire(self, tokens=0):
+        tokens = self._capped(tokens)
+        started_at = time.monotonic()
+        while wait := self._reserve(tokens):
+            time.sleep(min(wait, 1.0))
+        with self._lock:
+            self.waited_s += time.monotonic() - started_at
+
+    async def aacquire(self, tokens=0):
+        """
+        acquire() for coroutines: waits without blocking the event loop.
+        """
+        tokens = self._capped(tokens)
+        started_at = time.monotonic()
+        while wait := self._reserve(tokens):
+            await asyncio.sleep(min(wait, 1.0))
+        with self._lock:
+            self.waited_s += time.monotonic() - started_at
+
+    def settle(self, estimated_tokens, actual_tokens):
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens + estimated_tokens - actual_tokens)
+
@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+
+
+class ComponentRegistry:
+    """
+    Process-wide cache of expensive objects (LLM clients, tools, agent executors).
+    Each slot keeps the few most recently used instances keyed by the settings they were
+    built with, so a changed sidebar setting builds a new instance and the stale one ages out.
+    """
+    def __init__(self, max_per_slot=4):
+        self.max_per_slot = max_per_slot
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def get(self, slot, key, factory):
+        with self._lock:
+            entries = self._slots.setdefault(slot, OrderedDict())
+            if key in entries:
+                entries.move_to_end(key)
+                return entries[key]
+
+        instance = factory()
+
+        with self._lock:
+            entries = self._slots.setdefault(slot, OrderedDict())
+            # Another thread may have built it meanwhile: keep the first one
+            instance = entries.setdefault(key, instance)
+            entries.move_to_end(key)
+            while len(entries) > self.max_per_slot:
+                entries.popitem(last=False)
+        return instance
+
+    def instances(self, slot):
+        """
+        All live instances of a slot.
+        """
+        with self._lock:
+            return list(self._slots.get(slot, {}).values())
+
+    def invalidate(self, slot=None):
+        """
+        Drops one slot, or everything when no slot is given.
+        """
+        with self._lock:
+            if slot is None:
+                self._slots.clear()
+            else:
+                self._slots.pop(slot, None)
+
+
+registry = ComponentRegistry()
+
+
+def get_chat_llm(model, api_key, temperature, top_p=1.0, max_tokens=None, streaming=False):
+    """
+    Returns a shared ChatOpenAI client for the given settings. Its requests go through the
+    process-wide LLM gateway, which owns rate limiting and retries (the client itself never retries).
+    """
+    key = (model, api_key, temperature, top_p, max_tokens, streaming)
+
+    def build():
+        # Imported on first use: the registry itself is needed before the first render
+        from langchain.chat_models import ChatOpenAI
+        from utils.llm_gateway import gateway_chat_model
+        return gateway_chat_model(ChatOpenAI)(
+            model=model,
+            api_key=api_key,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            streaming=streaming,
+            max_retries=0,
+            model_kwargs={"top_p": top_p}
+        )
+
+    return registry.get("chat_llm", key, build)
+
+
+def get_search_tool(tavily_api_key):
+    """
+    Returns a shared Tavily search tool for the given API key.
+    """
+    def build():
+        from langchain_community.tools.tavily_search import TavilySearchResults
+        return TavilySearchResults(tavily_api_key=tavily_api_key)
+
+    return registry.get("tavily_search", tavily_api_key, build)
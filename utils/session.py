@@ -0,0 +1,71 @@
+import os
+import contextvars
+from contextlib import contextmanager
+import streamlit as st
+
+_active_session = contextvars.ContextVar("active_session", default=None)
+
+
+class SessionState(dict):
+    """
+    Per-session state for API clients, with the same attribute/key access as st.session_state.
+    """
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        self.pop(name, None)
+
+
+def get_state():
+    """
+    State of the session being served: the session bound with use_session() in this context
+    (API requests, benchmarks), otherwise the Streamlit session of the current script run.
+    """
+    state = _active_session.get()
+    return st.session_state if state is None else state
+
+
+@contextmanager
+def use_session(state):
+    """
+    Binds state to the current context (and to asyncio tasks / to_thread calls started from it).
+    """
+    token = _active_session.set(state)
+    try:
+        yield state
+    finally:
+        _active_session.reset(token)
+
+
+def get_secret(name):
+    """
+    API key for the current session: the session's own (e.g. "openai_api_key"), then Streamlit
+    secrets, then the environment.
+    """
+    value = get_state().get(name.lower())
+    if value:
+        return value
+    try:
+        return st.secrets[name]
+    except (KeyError, FileNotFoundError):
+        return os.getenv(name)
+
+
+def notify(level, message):
+    """
+    User-facing progress or error message ("info", "success", "warning", "error").
+    Passed to the session's on_notice(level, message) listener when it has one (API clients),
+    otherwise rendered by Streamlit.
+    """
+    listener = get_state().get("on_notice")
+    if listener:
+        listener(level, message)
+    else:
+        getattr(st, level)(message)
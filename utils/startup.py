@@ -0,0 +1,129 @@
+import sys
+import time
+import importlib
+import threading
+from utils.registry import registry
+from utils.config import STARTUP_PROFILE, WARMUP, CHROMA_PATH, DEFAULT_MODEL, CHUNK_TOKENIZER_MODEL
+
+
+class StartupProfile:
+    """
+    Process-wide cold-start timings in ms: imports of lazily loaded subsystems, warm-up steps,
+    milestones since the process started (first render, first response) and the latency of the
+    first answered question.
+    Streamlit re-runs the script on every interaction; this module, like every imported one,
+    is loaded once per process, so the timings cover the process lifetime.
+    """
+    def __init__(self, enabled=STARTUP_PROFILE):
+        self.enabled = enabled
+        self.started_at = time.perf_counter()
+        self.imports = {}
+        self.warmup = {}
+        self.milestones = {}
+        self.latency = {}
+        self._lock = threading.Lock()
+
+    def record(self, group, name, duration_ms):
+        """
+        Keeps the first timing of name in group ("imports", "warmup", "milestones" or "latency").
+        """
+        with self._lock:
+            timings = getattr(self, group)
+            if name in timings:
+                return
+            timings[name] = duration_ms
+        if self.enabled:
+            print(f"[startup] {group} {name}: {duration_ms:.0f} ms", file=sys.stderr)
+
+    def mark(self, name):
+        """
+        Records the first time a milestone is reached, in ms since process start.
+        """
+        self.record("milestones", name, (time.perf_counter() - self.started_at) * 1000)
+
+    def report(self):
+        with self._lock:
+            return {
+                group: dict(getattr(self, group)) for group in ("imports", "warmup", "milestones", "latency")
+            }
+
+
+profile = StartupProfile()
+
+
+def lazy_import(module_name):
+    """
+    Imports a heavy subsystem on first use and times it; later calls return the loaded module.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    started_at = time.perf_counter()
+    module = importlib.import_module(module_name)
+    profile.record("imports", module_name, (time.perf_counter() - started_at) * 1000)
+    return module
+
+
+def _warm_up(embeddings_provider, api_key, persist_dir):
+    def step(name, action):
+        started_at = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            # Best effort: whatever failed here loads on first use instead
+            print(f"[startup] warm-up step {name} failed: {e}", file=sys.stderr)
+            return
+        profile.record("warmup", name, (time.perf_counter() - started_at) * 1000)
+
+    def open_vectorstore():
+        setup = lazy_import("retrievers.setup")
+        manifest_module = lazy_import("utils.ingestion_manifest")
+        manifest = manifest_module.load_manifest(persist_dir)
+        if not manifest["files"] or not lazy_import("retrievers.partitions").is_current_layout(manifest):
+            return
+        if manifest_module.indexed_embeddings_model(manifest) != embeddings_provider:
+            return
+        embeddings = setup.load_cached_embeddings(*setup.embeddings_args(embeddings_provider, api_key))
+        partitions = setup.get_partitions(persist_dir, embeddings)
+        for company in partitions.companies:
+            partitions.collection(company)
+            partitions.lexical_index(company)
+
+    def load_embeddings():
+        setup = lazy_import("retrievers.setup")
+        embeddings = setup.load_base_embeddings(*setup.embeddings_args(embeddings_provider, api_key))
+        if embeddings_provider != "openai":
+            # Loads the local model weights and runs one forward pass (no API call)
+            embeddings.embed_query("warm-up")
+
+    def load_encoders():
+        encoding = lazy_import("memory.memory").get_encoding
+        for model_name in {DEFAULT_MODEL, CHUNK_TOKENIZER_MODEL}:
+            encoding(model_name).encode("warm-up")
+
+    step("modules", lambda: lazy_import("service.assistant"))
+    step("tiktoken", load_encoders)
+    step("embeddings", load_embeddings)
+    step("vectorstore", open_vectorstore)
+    profile.mark("warmup_done")
+
+
+def start_warmup(embeddings_provider, api_key=None, persist_dir=CHROMA_PATH):
+    """
+    Preloads the agent/RAG modules, the tiktoken encoders, the embeddings model and the persisted
+    vectorstore in a background thread, once per process and embeddings settings, so the first
+    question does not pay for them. No-op unless WARMUP is on.
+    """
+    if not WARMUP:
+        return None
+    # The API key only matters to OpenAI embeddings: one warm-up per provider otherwise
+    api_key = api_key if embeddings_provider == "openai" else None
+
+    def start():
+        thread = threading.Thread(
+            target=_warm_up, args=(embeddings_provider, api_key, persist_dir), name="warmup", daemon=True
+        )
+        thread.start()
+        return thread
+
+    return registry.get("warmup", (embeddings_provider, api_key, persist_dir), start)
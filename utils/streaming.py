@@ -0,0 +1,48 @@
+import time
+from langchain.callbacks.base import BaseCallbackHandler
+
+
+class StreamEventHandler(BaseCallbackHandler):
+    """
+    Turns LangChain callbacks into a flat stream of events passed to sink(event):
+    - {"type": "llm_start"}                 a new LLM call begins (its tokens replace the previous preview)
+    - {"type": "token", "text": ...}        a generated token
+    - {"type": "status", "text": ...}       progress such as "retrieving" or "calling web_search"
+    Also records time-to-first-token for the turn.
+    """
+    # Streamlit elements can only be updated from the script thread, so never offload to an executor
+    run_inline = True
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.sink({"type": "llm_start"})
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.sink({"type": "llm_start"})
+
+    def on_llm_new_token(self, token, **kwargs):
+        if not token:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.sink({"type": "token", "text": token})
+
+    def on_retriever_start(self, serialized, query, **kwargs):
+        self.sink({"type": "status", "text": "🔎 Retrieving internal documents..."})
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        name = (serialized or {}).get("name", "tool")
+        self.sink({"type": "status", "text": f"🛠️ Calling {name}..."})
+
+    def on_tool_end(self, output, **kwargs):
+        self.sink({"type": "status", "text": "🧠 Thinking..."})
@@ -0,0 +1,328 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from utils.session import get_state
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.trace import Status, StatusCode
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider, SpanProcessor
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.schema import get_buffer_string
+from memory.memory import get_encoding
+from utils.config import TRACE_PATH, TRACE_HISTORY, TRACE_MAX_BYTES, TRACE_BACKUPS, OTLP_ENDPOINT
+
+
+class JsonlSpanExporter(SpanExporter):
+    """
+    Appends finished spans to a local JSONL file, one OpenTelemetry JSON span per line.
+    Once the file reaches max_bytes (0 = unbounded) it is rotated to path.1, path.1 to path.2 and so
+    on; only `backups` rotated files are kept.
+    """
+    def __init__(self, path, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def export(self, spans):
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock:
+                if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+class TraceCollector(SpanProcessor):
+    """
+    Keeps the finished spans of recent traces in memory so a run can be summarized when it ends.
+    """
+    def __init__(self, max_traces=200):
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_end(self, span):
+        with self._lock:
+            spans = self._traces.setdefault(span.context.trace_id, [])
+            spans.append(span)
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+    def pop(self, trace_id):
+        with self._lock:
+            return self._traces.pop(trace_id, [])
+
+
+@lru_cache(maxsize=None)
+def get_tracing():
+    """
+    Process-wide (tracer, collector). Spans go to the JSONL file at TRACE_PATH and, when
+    OTEL_EXPORTER_OTLP_ENDPOINT is set, to an OTLP collector as well.
+    """
+    provider = TracerProvider(resource=Resource.create({"service.name": "sales-assistant"}))
+    collector = TraceCollector()
+    provider.add_span_processor(collector)
+    if TRACE_PATH:
+        provider.add_span_processor(BatchSpanProcessor(JsonlSpanExporter(TRACE_PATH)))
+    if OTLP_ENDPOINT:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=OTLP_ENDPOINT)))
+    return provider.get_tracer("sales-assistant"), collector
+
+
+def get_tracer():
+    return get_tracing()[0]
+
+
+def _clean(attributes):
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(name, stage, **attributes):
+    """
+    Timed child span of the current span. stage groups spans in the totals (embed, retrieval, router, ...).
+    """
+    with get_tracer().start_as_current_span(name, attributes=_clean(dict(attributes, stage=stage))) as current:
+        yield current
+
+
+def record_span(name, stage, start_ns, end_ns, **attributes):
+    """
+    Records a span measured elsewhere (e.g. in an ingestion worker process) under the current span.
+    """
+    current = get_tracer().start_span(
+        name, attributes=_clean(dict(attributes, stage=stage)), start_time=start_ns
+    )
+    current.end(end_time=end_ns)
+
+
+def summarize_spans(name, spans):
+    """
+    Waterfall rows (offsets relative to the root span) and per-run totals for one trace.
+    """
+    if not spans:
+        return None
+    spans = sorted(spans, key=lambda s: s.start_time)
+    root = next((s for s in spans if s.parent is None), spans[0])
+    parents = {s.context.span_id: (s.parent.span_id if s.parent else None) for s in spans}
+
+    def depth(span_id):
+        level = 0
+        while parents.get(span_id) in parents:
+            span_id = parents[span_id]
+            level += 1
+        return level
+
+    rows, stages = [], {}
+    totals = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "tool_calls": 0}
+    for s in spans:
+        attributes = dict(s.attributes or {})
+        stage = attributes.get("stage", "other")
+        duration_ms = (s.end_time - s.start_time) / 1e6
+        rows.append({
+            "name": s.name,
+            "stage": stage,
+            "depth": depth(s.context.span_id),
+            "start_ms": (s.start_time - root.start_time) / 1e6,
+            "duration_ms": duration_ms,
+            "error": s.status.status_code == StatusCode.ERROR,
+        })
+        if s is root:
+            continue
+        stages[stage] = stages.get(stage, 0.0) + duration_ms
+        if stage == "llm":
+            totals["llm_calls"] += 1
+            totals["prompt_tokens"] += attributes.get("llm.prompt_tokens", 0)
+            totals["completion_tokens"] += attributes.get("llm.completion_tokens", 0)
+        elif stage == "tool":
+            totals["tool_calls"] += 1
+
+    return {
+        "name": name,
+        "trace_id": format(root.context.trace_id, "032x"),
+        "started_at": root.start_time / 1e9,
+        "duration_ms": (root.end_time - root.start_time) / 1e6,
+        "attributes": dict(root.attributes or {}),
+        "rows": rows,
+        "stage_ms": stages,
+        **totals,
+    }
+
+
+def _store_run(summary):
+    history = get_state().get("trace_history")
+    if history is None:
+        history = get_state().trace_history = deque(maxlen=TRACE_HISTORY)
+    history.append(summary)
+
+    totals = get_state().get("trace_totals")
+    if totals is None:
+        totals = get_state().trace_totals = {}
+    run_totals = totals.setdefault(summary["name"], {
+        "runs": 0, "duration_ms": 0.0, "llm_calls": 0, "prompt_tokens": 0,
+        "completion_tokens": 0, "tool_calls": 0, "stage_ms": {}
+    })
+    run_totals["runs"] += 1
+    run_totals["duration_ms"] += summary["duration_ms"]
+    for key in ("llm_calls", "prompt_tokens", "completion_tokens", "tool_calls"):
+        run_totals[key] += summary[key]
+    for stage, duration_ms in summary["stage_ms"].items():
+        run_totals["stage_ms"][stage] = run_totals["stage_ms"].get(stage, 0.0) + duration_ms
+
+
+@contextmanager
+def trace_run(name, **attributes):
+    """
+    Root span for a chat turn or an ingestion. When it ends, its waterfall is summarized into
+    get_state().trace_history (last TRACE_HISTORY runs) and get_state().trace_totals.
+    """
+    tracer, collector = get_tracing()
+    # Always a new trace, even when called under another span
+    root = tracer.start_span(name, context=Context(), attributes=_clean(dict(attributes, stage=name)))
+    try:
+        with trace.use_span(root, end_on_exit=False, record_exception=True, set_status_on_exception=True):
+            yield root
+    finally:
+        root.end()
+        summary = summarize_spans(name, collector.pop(root.get_span_context().trace_id))
+        if summary:
+            _store_run(summary)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns LangChain callbacks into spans: one per LLM call (with prompt and completion tokens),
+    tool call and retrieval. Spans nest under the closest traced ancestor run, so tool → LLM calls
+    made inside an agent step stay grouped; top-level runs go under the active span (or parent_span).
+    """
+    # Keep callbacks on the calling thread: spans are started and ended in order
+    run_inline = True
+
+    def __init__(self, parent_span=None):
+        self.parent_span = parent_span or trace.get_current_span()
+        self._spans = {}
+        self._parents = {}
+        self._prompts = {}
+
+    def _parent_context(self, parent_run_id):
+        while parent_run_id is not None and parent_run_id not in self._spans:
+            parent_run_id = self._parents.get(parent_run_id)
+        parent = self._spans.get(parent_run_id)
+        if parent is None:
+            # Top-level run: nest under the active router span when this thread has one
+            current = trace.get_current_span()
+            parent = current if current.get_span_context().is_valid else self.parent_span
+        return trace.set_span_in_context(parent)
+
+    def _start(self, run_id, parent_run_id, name, stage, **attributes):
+        self._parents[run_id] = parent_run_id
+        self._spans[run_id] = get_tracer().start_span(
+            name,
+            context=self._parent_context(parent_run_id),
+            attributes=_clean(dict(attributes, stage=stage))
+        )
+
+    def _end(self, run_id, error=None, **attributes):
+        current = self._spans.pop(run_id, None)
+        if current is None:
+            return
+        current.set_attributes(_clean(attributes))
+        if error is not None:
+            current.record_exception(error)
+            current.set_status(Status(StatusCode.ERROR, str(error)))
+        current.end()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        # Not traced itself, only remembered so nested runs find their traced ancestor
+        self._parents[run_id] = parent_run_id
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        model = self._model_name(serialized, kwargs)
+        # Only counted when the response reports no usage (see on_llm_end)
+        self._prompts[run_id] = prompts
+        self._start(run_id, parent_run_id, f"llm {model}", "llm", **{"llm.model": model})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        model = self._model_name(serialized, kwargs)
+        self._prompts[run_id] = messages
+        self._start(run_id, parent_run_id, f"llm {model}", "llm", **{"llm.model": model})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompts = self._prompts.pop(run_id, [])
+        if usage:
+            self._end(
+                run_id,
+                **{
+                    "llm.prompt_tokens": usage.get("prompt_tokens", 0),
+                    "llm.completion_tokens": usage.get("completion_tokens", 0),
+                    "llm.tokens_estimated": False,
+                }
+            )
+            return
+        # Streaming responses carry no usage: count with tiktoken instead
+        current = self._spans.get(run_id)
+        model = current.attributes.get("llm.model", "gpt-4o") if current is not None else "gpt-4o"
+        encoding = get_encoding(model)
+        text = "".join(g.text for generations in response.generations for g in generations)
+        self._end(
+            run_id,
+            **{
+                "llm.prompt_tokens": sum(
+                    len(encoding.encode(p if isinstance(p, str) else get_buffer_string(p))) for p in prompts
+                ),
+                "llm.completion_tokens": len(encoding.encode(text)),
+                "llm.tokens_estimated": True,
+            }
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompts.pop(run_id, None)
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name", "tool")
+        self._start(run_id, parent_run_id, f"tool {name}", "tool", **{"tool.name": name})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, **{"tool.output_chars": len(str(output))})
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "retrieval", "retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, **{"retrieval.documents": len(documents)})
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def _model_name(self, serialized, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        return params.get("model") or params.get("model_name") or (serialized or {}).get("name") or "llm"